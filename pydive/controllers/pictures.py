@@ -24,6 +24,8 @@ from PyQt5.QtCore import Qt
 from controllers.widgets.basetreewidget import BaseTreeWidget
 from controllers.widgets.iconbutton import IconButton
 from controllers.process_groups import ProcessGroupsController
+from models.repository_loader import RepositoryLoader
+from models.repository_watcher import RepositoryWatcher
 
 _ = gettext.gettext
 logger = logging.getLogger(__name__)
@@ -40,6 +42,8 @@ class PicturesTree(BaseTreeWidget):
         A reference to the parent controller
     repository: models.repository.Repository
         This program's picture repository
+    connections: list of signal/slot connections
+        The handlers for picture group signals
 
     Methods
     -------
@@ -65,6 +69,8 @@ class PicturesTree(BaseTreeWidget):
         Adds a single trip to the tree
     add_picture_group (trip_widget, picture_group, picture_group_widget)
         Adds a single picture group to the tree
+    add_picture_groups (picture_groups)
+        Adds new picture groups to the tree, in existing trips if possible
     remove_picture_group (picture_group_widget)
         Removes a picture group from display
     on_item_clicked (item)
@@ -94,6 +100,7 @@ class PicturesTree(BaseTreeWidget):
         self.parent_controller = parent_controller
         self.database = parent_controller.database
         self.repository = repository
+        self.connections = []
         self.itemSelectionChanged.connect(self.on_item_selected)
 
     def contextMenuEvent(self, event):
@@ -194,7 +201,7 @@ class PicturesTree(BaseTreeWidget):
         else:
             trip = tree_item.parent().text(0)
             picture_group_name = tree_item.text(0)
-            picture_group = self.repository.trips[trip][picture_group_name]
+            picture_group = self.repository.picture_group_get(trip, picture_group_name)
 
             # Copy actions
             for source in locations:
@@ -297,6 +304,7 @@ class PicturesTree(BaseTreeWidget):
                         target,
                         trip=trip,
                         source_location=source,
+                        priority="background",
                     )
                 except FileNotFoundError as e:
                     error_dialog = QtWidgets.QErrorMessage(self)
@@ -315,6 +323,7 @@ class PicturesTree(BaseTreeWidget):
                         methods,
                         trip=trip,
                         source_location=source,
+                        priority="background",
                     )
                 except FileNotFoundError as e:
                     error_dialog = QtWidgets.QErrorMessage(self)
@@ -338,9 +347,12 @@ class PicturesTree(BaseTreeWidget):
                         full_label + target_trip,
                         target_trip,
                         trip,
+                        priority="background",
                     )
+                    # Queued: the repository is updated after the last task's signal
                     process_group.finished.connect(
-                        lambda: self.change_trip_name(trip, target_trip)
+                        lambda: self.change_trip_name(trip, target_trip),
+                        Qt.QueuedConnection,
                     )
 
             action.triggered.connect(lambda: open_dialog(self.parent_controller))
@@ -377,9 +389,8 @@ class PicturesTree(BaseTreeWidget):
             # There should be at most 1 match
             target_trip_widget = widgets[0]
 
-        # Need to refresh the repository, otherwise it'll be missing pictures
-        self.repository.load_pictures()
-        picture_groups = self.repository.trips[target_trip].values()
+        # The repository is updated as pictures are moved, so it doesn't need to be reloaded
+        picture_groups = self.repository.trips.get(target_trip, {}).values()
         logger.debug(
             f"PicturesTree.change_trip_name: processing {len(picture_groups)} groups"
         )
@@ -521,11 +532,9 @@ class PicturesTree(BaseTreeWidget):
             # Widget exists ==> we need to add only the new picture group
             # There should be only 1 match
             target_trip_widget = widgets[0]
-            picture_groups = self.repository.trips[target_trip].values()
-            target_picture_group = [
-                pg for pg in picture_groups if pg.name == picture_group_name
+            picture_groups = [
+                self.repository.picture_group_get(target_trip, picture_group_name)
             ]
-            picture_groups = [target_picture_group[0]]
 
         for picture_group in picture_groups:
             self.add_picture_group(target_trip_widget, picture_group)
@@ -556,6 +565,10 @@ class PicturesTree(BaseTreeWidget):
     def fill_tree(self):
         """Adds all trips & pictures to the tree"""
         logger.info("PicturesTree.fill_tree")
+        # Picture groups may be kept by the repository, so the previous widgets must be disconnected
+        for connection in self.connections:
+            QtCore.QObject.disconnect(connection)
+        self.connections = []
         self.clear()
         for trip, picture_groups in self.repository.trips.items():
             trip_widget = self.add_trip(trip)
@@ -609,29 +622,36 @@ class PicturesTree(BaseTreeWidget):
                 picture_group_widget.setText(col, data[col])
         else:
             picture_group_widget = QtWidgets.QTreeWidgetItem(data)
-            picture_group.pictureAdded.connect(
-                lambda _a, _b: self.add_picture_group(
-                    trip_widget, picture_group, picture_group_widget
-                )
-            )
-            picture_group.pictureRemoved.connect(
-                lambda _a, _b: self.add_picture_group(
-                    trip_widget, picture_group, picture_group_widget
-                )
-            )
-            picture_group.pictureTasksDone.connect(
-                lambda: self.add_picture_group(
-                    trip_widget, picture_group, picture_group_widget
-                )
-            )
-            picture_group.pictureTasksStart.connect(
-                lambda: self.add_picture_group(
-                    trip_widget, picture_group, picture_group_widget
-                )
-            )
-            picture_group.pictureGroupDeleted.connect(
-                lambda: self.remove_picture_group(picture_group_widget)
-            )
+            self.connections += [
+                picture_group.pictureAdded.connect(
+                    lambda _a, _b: self.add_picture_group(
+                        trip_widget, picture_group, picture_group_widget
+                    )
+                ),
+                picture_group.pictureRemoved.connect(
+                    lambda _a, _b: self.add_picture_group(
+                        trip_widget, picture_group, picture_group_widget
+                    )
+                ),
+                picture_group.pictureGroupChanged.connect(
+                    lambda: self.add_picture_group(
+                        trip_widget, picture_group, picture_group_widget
+                    )
+                ),
+                picture_group.pictureTasksDone.connect(
+                    lambda: self.add_picture_group(
+                        trip_widget, picture_group, picture_group_widget
+                    )
+                ),
+                picture_group.pictureTasksStart.connect(
+                    lambda: self.add_picture_group(
+                        trip_widget, picture_group, picture_group_widget
+                    )
+                ),
+                picture_group.pictureGroupDeleted.connect(
+                    lambda: self.remove_picture_group(picture_group_widget)
+                ),
+            ]
             trip_widget.addChild(picture_group_widget)
 
         # Add tooltips
@@ -661,6 +681,24 @@ class PicturesTree(BaseTreeWidget):
         else:
             picture_group_widget.setData(0, Qt.DecorationRole, QtCore.QVariant())
 
+    def add_picture_groups(self, picture_groups):
+        """Adds new picture groups to the tree, in existing trips if possible
+
+        Parameters
+        ----------
+        picture_groups : list of models.picturegroup.PictureGroup
+            The picture groups to add to the tree
+        """
+        logger.info(f"PicturesTree.add_picture_groups: {len(picture_groups)} groups")
+        trip_widgets = {
+            self.topLevelItem(i).data(0, Qt.DisplayRole): self.topLevelItem(i)
+            for i in range(self.topLevelItemCount())
+        }
+        for picture_group in picture_groups:
+            if picture_group.trip not in trip_widgets:
+                trip_widgets[picture_group.trip] = self.add_trip(picture_group.trip)
+            self.add_picture_group(trip_widgets[picture_group.trip], picture_group)
+
     def remove_picture_group(self, picture_group_widget):
         """Removes a picture group from the tree
 
@@ -701,7 +739,7 @@ class PicturesTree(BaseTreeWidget):
         # Get selected picture group
         trip = item.parent().text(0)
         picture_group_name = item.text(0)
-        picture_group = self.repository.trips[trip][picture_group_name]
+        picture_group = self.repository.picture_group_get(trip, picture_group_name)
 
         self.parent_controller.display_picture_group(picture_group)
 
@@ -751,6 +789,8 @@ class PictureGrid:
         Adds a picture on display (used for signal processing)
     picture_removed (conversion_type, location)
         Removes a picture from display (used for signal processing)
+    picture_group_changed
+        Displays the picture group again after a bulk update (used for signal processing)
     clear_display
         Removes all widgets from the display & deletes them properly
     generate_image (row, column)
@@ -806,6 +846,7 @@ class PictureGrid:
         self.picture_group = picture_group
         self.picture_group.pictureAdded.connect(self.picture_added)
         self.picture_group.pictureRemoved.connect(self.picture_removed)
+        self.picture_group.pictureGroupChanged.connect(self.picture_group_changed)
         self.picture_group.pictureGroupDeleted.connect(self.clear_display)
 
         # Include locations from the DB + "" for the header
@@ -941,6 +982,11 @@ class PictureGrid:
         )
         self.display_picture_group(self.picture_group)
 
+    def picture_group_changed(self):
+        """Receives the signal from the picture_group, after a bulk update"""
+        logger.debug(f"PictureGrid.picture_group_changed {self.picture_group.name}")
+        self.display_picture_group(self.picture_group)
+
     def clear_display(self):
         """Removes all widgets from the display & deletes them properly"""
         logger.info("PictureGrid.clear_display")
@@ -963,6 +1009,9 @@ class PictureGrid:
         if self.picture_group:
             self.picture_group.pictureAdded.disconnect(self.picture_added)
             self.picture_group.pictureRemoved.disconnect(self.picture_removed)
+            self.picture_group.pictureGroupChanged.disconnect(
+                self.picture_group_changed
+            )
             self.picture_group.pictureGroupDeleted.disconnect(self.clear_display)
             self.picture_group = None
 
@@ -992,7 +1041,11 @@ class PictureGrid:
         )
         # Updated data will be displayed through the signals directly
         self.repository.generate_pictures(
-            label, target_location, [method], picture_group=self.picture_group
+            label,
+            target_location,
+            [method],
+            picture_group=self.picture_group,
+            priority="interactive",
         )
 
     def copy_image(self, row, column, category=None):
@@ -1030,6 +1083,7 @@ class PictureGrid:
                 picture_group=self.picture_group,
                 conversion_method=method,
                 target_category=category,
+                priority="interactive",
             )
             # Updated data will be displayed through the signals directly
         except FileNotFoundError as e:
@@ -1060,7 +1114,9 @@ class PictureGrid:
             logger.info(
                 f"PictureGrid.delete_image {self.picture_group.trip}/{self.picture_group.name}/{picture.filename} in {picture.location.name}"
             )
-            self.repository.remove_pictures(label, None, self.picture_group, picture)
+            self.repository.remove_pictures(
+                label, None, self.picture_group, picture, priority="interactive"
+            )
         if delete_pictures == pictures:
             self.picture_containers[row][column].set_empty_picture()
         else:
@@ -1810,6 +1866,14 @@ class PicturesController:
         This program's database
     repository: models.repository.Repository
         This program's picture repository
+    watcher: models.repository_watcher.RepositoryWatcher
+        Updates the repository when files change in the storage locations
+    loader: models.repository_loader.RepositoryLoader
+        Loads pictures in the background
+    initial_load_pending : bool
+        Whether pictures should be loaded when this screen is first displayed
+    resume_pending : bool
+        Whether to offer resuming the tasks interrupted in the previous session (after the first load)
     ui : dict of QtWidgets.QWidget
         The different widgets displayed on the screen
 
@@ -1825,7 +1889,13 @@ class PicturesController:
     __init__ (parent_window)
         Stores reference to parent window & defines UI elements.
     on_load_pictures
-        Refreshes the tree of images (left part)
+        Loads pictures in the background (or cancels the ongoing load)
+    on_load_progress (folders_read, pictures_found)
+        Displays the progress of the load
+    on_load_finished (completed)
+        Restores the load button & watches the folders found
+    offer_resume
+        Offers to resume the tasks interrupted when PyDive stopped
     refresh_folders
         Reloads the paths displayed at the top left
     refresh_display
@@ -1855,6 +1925,11 @@ class PicturesController:
         self.repository = parent_window.repository
         self.folders = []
         self.process_group_controller = ProcessGroupsController(self.parent_window)
+        self.watcher = RepositoryWatcher(self.repository)
+        self.loader = RepositoryLoader(self.repository)
+        # Lazy repositories are loaded only when this screen is displayed
+        self.initial_load_pending = self.repository.configuration is None
+        self.resume_pending = True
 
         self.ui = {}
         self.ui["main"] = QtWidgets.QWidget()
@@ -1924,6 +1999,16 @@ class PicturesController:
         self.ui["tasks_dialog_layout"] = QtWidgets.QVBoxLayout()
         self.ui["tasks_dialog"].setLayout(self.ui["tasks_dialog_layout"])
 
+        # Display pictures added while the application runs
+        self.watcher.pictureGroupsAdded.connect(
+            self.ui["picture_tree"].add_picture_groups
+        )
+        self.loader.pictureGroupsAdded.connect(
+            self.ui["picture_tree"].add_picture_groups
+        )
+        self.loader.loadProgress.connect(self.on_load_progress)
+        self.loader.loadFinished.connect(self.on_load_finished)
+
         # Trigger handlers with default values
         self.on_display_raw_images(False)
         self.on_display_absent_images(False)
@@ -1952,14 +2037,85 @@ class PicturesController:
         return button
 
     def on_load_pictures(self):
-        """User clicks 'load pictures' => reload the tree of pictures"""
+        """User clicks 'load pictures' => reload the tree of pictures
+
+        Pictures are loaded in the background & added to the tree as they are found
+        If a load is already in progress, it is cancelled instead
+        """
         logger.debug(
             f"PicturesController.on_load_pictures on {len(self.folders)} folders"
         )
-        self.repository.load_pictures()
+        if self.loader.loading:
+            self.loader.cancel()
+            return
+        self.loader.load()
+        self.ui["load_button"].setText(_("Cancel loading"))
 
         self.ui["picture_tree"].fill_tree()
 
+    def on_load_progress(self, folders_read, pictures_found):
+        """Displays the progress of the load
+
+        Parameters
+        ----------
+        folders_read : int
+            The number of folders read so far
+        pictures_found : int
+            The number of pictures found so far
+        """
+        self.ui["load_button"].setText(
+            _(
+                "Cancel loading ({folders_read} folders read, {pictures_found} pictures found)"
+            ).format(folders_read=folders_read, pictures_found=pictures_found)
+        )
+
+    def on_load_finished(self, completed):
+        """Restores the load button & watches the folders found
+
+        Parameters
+        ----------
+        completed : bool
+            Whether all folders were read (False if the load was cancelled)
+        """
+        logger.info(f"PicturesController.on_load_finished (completed: {completed})")
+        self.ui["load_button"].setText(_("Load pictures"))
+        self.watcher.watch_locations()
+        if completed and self.resume_pending:
+            self.resume_pending = False
+            self.offer_resume()
+
+    def offer_resume(self):
+        """Offers to resume the tasks interrupted when PyDive stopped
+
+        Tasks already done are skipped (see Repository.resume_process_groups)
+        If the user refuses, the interrupted tasks are forgotten
+        """
+        journal_groups = self.repository.journal.unfinished()
+        if not journal_groups:
+            return
+        tasks_interrupted = sum(
+            len([t for t in group.tasks if t.status != "Stopped"])
+            for group in journal_groups
+        )
+        logger.info(f"PicturesController.offer_resume: {tasks_interrupted} tasks")
+
+        dialog = QtWidgets.QMessageBox(self.ui["main"])
+        dialog.setWindowTitle(_("Resume tasks"))
+        dialog.setText(
+            _(
+                "{tasks_interrupted} tasks were interrupted when PyDive stopped. Do you want to resume them?"
+            ).format(tasks_interrupted=tasks_interrupted)
+        )
+        dialog.setStandardButtons(QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        dialog.setIcon(QtWidgets.QMessageBox.Question)
+        button = dialog.exec()
+
+        if button == QtWidgets.QMessageBox.Yes:
+            self.repository.resume_process_groups(journal_groups)
+            self.refresh_progress_bar()
+        else:
+            self.repository.journal.discard(journal_groups)
+
     def refresh_folders(self):
         """Refreshes the list of folders from DB"""
         logger.debug("PicturesController.refresh_folders")
@@ -2005,9 +2161,14 @@ class PicturesController:
         # Refresh image tree
         self.ui["picture_tree"].set_folders(self.folders)
         self.ui["picture_tree"].fill_tree()
+        self.watcher.watch_locations()
 
         self.refresh_progress_bar()
 
+        if self.initial_load_pending:
+            self.initial_load_pending = False
+            self.on_load_pictures()
+
     def refresh_progress_bar(self):
         """Refreshes the progress bar"""
         logger.debug("PicturesController.refresh_progress_bar")
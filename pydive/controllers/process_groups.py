@@ -8,9 +8,14 @@ ProgressBarItemDelegate
     Delegate to display a progress bar rather than simple number
 ProcessGroupsTableView
     QTableView for display of process groups
+StatisticsTableModel
+    QAbstractModel for display of task statistics
+StatisticsTableView
+    QTableView for display of task statistics
 ProcessGroupsController
     ProcessGroups screen: Displays in-progress background process groups / tasks
 """
+
 import gettext
 import logging
 import os
@@ -112,14 +117,9 @@ class ProcessGroupsTableModel(QtCore.QAbstractTableModel):
 
         col = index.column()
         process_group = self.process_groups[index.row()]
-        errors = [
-            t["error_details"] for t in process_group.tasks if "error_details" in t
-        ]
         if role == Qt.DisplayRole:
-            if len(errors) == 0:
-                error_text = ""
-            if len(errors) <= 1:
-                error_text = "".join(errors)
+            if process_group.count_errors <= 1:
+                error_text = "".join(process_group.error_details)
             else:
                 error_text = _("Hover for error details")
             return [
@@ -142,7 +142,7 @@ class ProcessGroupsTableModel(QtCore.QAbstractTableModel):
                 )
 
         if role == Qt.ToolTipRole and col == 6:
-            return "\n".join(errors)
+            return "\n".join(process_group.error_details)
 
         if role == Qt.TextAlignmentRole:
             return self.columns[index.column()]["alignment"]
@@ -329,6 +329,164 @@ class ProcessGroupsTableView(QtWidgets.QTableView, autoresize.AutoResize):
         self.viewport().update()
 
 
+class StatisticsTableModel(QtCore.QAbstractTableModel):
+    """Model for display of task statistics
+
+    Attributes
+    ----------
+    columns : list of dicts
+        Columns to display. Each column needs a name & alignment key
+    rows : list of lists
+        The values to display (already formatted)
+
+    Methods
+    -------
+    __init__ (columns)
+        Stores the provided parameters for future use
+    columnCount (index)
+        Returns the number of columns
+    rowCount (index)
+        Returns the number of rows
+    data (index)
+        Returns which data to display (or how to display it) for the corresponding cell
+    headerData (index)
+        Returns the table headers
+    set_rows (rows)
+        Replaces the values displayed
+    """
+
+    def __init__(self, columns):
+        """Stores the provided parameters for future use
+
+        Parameters
+        ----------
+        columns : list of dicts
+            Columns to display. Each column needs a name & alignment key
+        """
+        super().__init__()
+        self.columns = columns
+        self.rows = []
+
+    def columnCount(self, index):
+        """Returns the number of columns
+
+        Parameters
+        ----------
+        index : QtCore.QModelIndex
+            A reference to the cell to display (not used in this method)
+        """
+        return len(self.columns)
+
+    def rowCount(self, index):
+        """Returns the number of rows
+
+        Parameters
+        ----------
+        index : QtCore.QModelIndex
+            A reference to the cell to display (not used in this method)
+        """
+        return len(self.rows)
+
+    def data(self, index, role):
+        """Returns the data or formatting to display in table contents
+
+        Parameters
+        ----------
+        index : QtCore.QModelIndex
+            A reference to the cell to display
+        role : Qt.DisplayRole
+            The required role (display, decoration, ...)
+
+        Returns
+        -------
+        QtCore.QVariant
+            If role = Qt.DisplayRole: the data to display
+            If role = Qt.TextAlignmentRole: the proper alignment
+        """
+        if not index.isValid():
+            return False
+
+        if role == Qt.DisplayRole:
+            return self.rows[index.row()][index.column()]
+
+        if role == Qt.TextAlignmentRole:
+            return self.columns[index.column()]["alignment"]
+
+        return QtCore.QVariant()
+
+    def headerData(self, column, orientation, role):
+        """Returns the data or formatting to display in headers
+
+        Parameters
+        ----------
+        column : int
+            The column number
+        orientation : Qt.Orientation
+            Whether headers are horizontal or vertical
+        role : Qt.DisplayRole
+            The required role (display, decoration, ...)
+
+        Returns
+        -------
+        QtCore.QVariant
+            If role = Qt.DisplayRole and orientation == Qt.Horizontal: the header name
+            Else: QtCore.QVariant
+        """
+        if role != Qt.DisplayRole:
+            return QtCore.QVariant()
+
+        if orientation == Qt.Horizontal:
+            return QtCore.QVariant(_(self.columns[column]["name"]))
+        return QtCore.QVariant()
+
+    def set_rows(self, rows):
+        """Replaces the values displayed
+
+        Parameters
+        ----------
+        rows : list of lists
+            The values to display (already formatted)
+        """
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+
+class StatisticsTableView(QtWidgets.QTableView, autoresize.AutoResize):
+    """Table for display of task statistics
+
+    Attributes
+    ----------
+    columns : list of dicts
+        Columns to display. Each column should have a name, size & alignment key
+    parent_controller : ProcessGroupsController
+        The controller in which this class is displayed
+    model : StatisticsTableModel
+        The model holding the statistics
+
+    Methods
+    -------
+    __init__ (parent_controller, columns)
+        Stores parameters & connects with the model
+    """
+
+    def __init__(self, parent_controller, columns):
+        """Stores parameters & connects with the model
+
+        Parameters
+        ----------
+        parent_controller : ProcessGroupsController
+            The controller in which this table is displayed
+        columns : list of dicts
+            Columns to display. Each column should have a name, size & alignment key
+        """
+        super().__init__()
+        self.parent_controller = parent_controller
+        self.columns = columns
+        self.model = StatisticsTableModel(columns)
+        self.setModel(self.model)
+
+
 class ProcessGroupsController:
     """ProcessGroups screen: Displays in-progress background process groups
 
@@ -354,11 +512,34 @@ class ProcessGroupsController:
         Stores reference to parent window & defines UI elements.
     refresh_display
         Updates the list of in-progress process groups
+    refresh_statistics
+        Updates the statistics of conversion methods & storage locations
+    format_duration (seconds)
+        Returns a duration, formatted for display
+    format_size (nb_bytes)
+        Returns a size, formatted for display
     """
 
     name = _("In-progress tasks")
     code = "ProcessGroups"
 
+    conversion_method_columns = [
+        {"name": _("Conversion method"), "size": 0.3, "alignment": Qt.AlignLeft},
+        {"name": _("Conversions"), "size": 0.1, "alignment": Qt.AlignCenter},
+        {"name": _("Errors"), "size": 0.1, "alignment": Qt.AlignCenter},
+        {"name": _("Average duration"), "size": 0.15, "alignment": Qt.AlignCenter},
+        {"name": _("Average CPU time"), "size": 0.15, "alignment": Qt.AlignCenter},
+        {"name": _("Peak memory"), "size": 0.2, "alignment": Qt.AlignCenter},
+    ]
+    storage_location_columns = [
+        {"name": _("Storage location"), "size": 0.3, "alignment": Qt.AlignLeft},
+        {"name": _("Tasks"), "size": 0.1, "alignment": Qt.AlignCenter},
+        {"name": _("Read"), "size": 0.15, "alignment": Qt.AlignCenter},
+        {"name": _("Written"), "size": 0.15, "alignment": Qt.AlignCenter},
+        {"name": _("Total duration"), "size": 0.15, "alignment": Qt.AlignCenter},
+        {"name": _("Throughput"), "size": 0.15, "alignment": Qt.AlignCenter},
+    ]
+
     def __init__(self, parent_window):
         """Stores reference to parent window & defines UI elements
 
@@ -384,6 +565,27 @@ class ProcessGroupsController:
         self.ui["process_groups_list"] = self.process_groups_list
         self.ui["layout"].addWidget(self.ui["process_groups_list"])
 
+        # Statistics: to find which converter or disk is the slowest
+        self.ui["conversion_methods_label"] = QtWidgets.QLabel(
+            _("Statistics by conversion method")
+        )
+        self.ui["conversion_methods_label"].setProperty("class", "title")
+        self.ui["layout"].addWidget(self.ui["conversion_methods_label"])
+        self.ui["conversion_methods_statistics"] = StatisticsTableView(
+            self, self.conversion_method_columns
+        )
+        self.ui["layout"].addWidget(self.ui["conversion_methods_statistics"])
+
+        self.ui["storage_locations_label"] = QtWidgets.QLabel(
+            _("Statistics by storage location")
+        )
+        self.ui["storage_locations_label"].setProperty("class", "title")
+        self.ui["layout"].addWidget(self.ui["storage_locations_label"])
+        self.ui["storage_locations_statistics"] = StatisticsTableView(
+            self, self.storage_location_columns
+        )
+        self.ui["layout"].addWidget(self.ui["storage_locations_statistics"])
+
     @property
     def display_widget(self):
         """Returns the QtWidgets.QWidget for display of this screen"""
@@ -394,3 +596,79 @@ class ProcessGroupsController:
         """Updates the process groups displayed on screen"""
         logger.debug("ProcessGroupsController.refresh_display")
         self.process_groups_list.refresh_display()
+        self.refresh_statistics()
+
+    def refresh_statistics(self):
+        """Updates the statistics of conversion methods & storage locations"""
+        logger.debug("ProcessGroupsController.refresh_statistics")
+        statistics = self.repository.statistics
+
+        methods = {m.id: m.name for m in self.database.conversionmethods_get()}
+        rows = []
+        for method in statistics.by_conversion_method():
+            rows.append(
+                [
+                    methods.get(method["conversion_method_id"], _("Deleted")),
+                    method["tasks"],
+                    method["errors"],
+                    self.format_duration(method["wall_time"]),
+                    self.format_duration(method["cpu_time"]),
+                    self.format_size(method["peak_memory"]),
+                ]
+            )
+        self.ui["conversion_methods_statistics"].model.set_rows(rows)
+
+        locations = {l.id: l.name for l in self.database.storagelocations_get()}
+        rows = []
+        for location in statistics.by_storage_location():
+            nb_bytes = location["bytes_read"] + location["bytes_written"]
+            throughput = ""
+            if location["wall_time"]:
+                throughput = self.format_size(nb_bytes / location["wall_time"]) + "/s"
+            rows.append(
+                [
+                    locations.get(location["location_id"], _("Deleted")),
+                    location["tasks"],
+                    self.format_size(location["bytes_read"]),
+                    self.format_size(location["bytes_written"]),
+                    self.format_duration(location["wall_time"]),
+                    throughput,
+                ]
+            )
+        self.ui["storage_locations_statistics"].model.set_rows(rows)
+
+    @staticmethod
+    def format_duration(seconds):
+        """Returns a duration, formatted for display
+
+        Parameters
+        ----------
+        seconds : float
+            The duration in seconds (None if unknown)
+
+        Returns
+        -------
+        duration : str
+            The formatted duration
+        """
+        if seconds is None:
+            return ""
+        return _("{seconds:.1f} s").format(seconds=seconds)
+
+    @staticmethod
+    def format_size(nb_bytes):
+        """Returns a size, formatted for display
+
+        Parameters
+        ----------
+        nb_bytes : float
+            The size in bytes (None if unknown)
+
+        Returns
+        -------
+        size : str
+            The formatted size
+        """
+        if nb_bytes is None:
+            return ""
+        return _("{size:.1f} MB").format(size=nb_bytes / 2**20)
@@ -11,6 +11,7 @@ ConversionMethodsList
 CategoriesList
     Displays categories & allows to modify them
 """
+
 import gettext
 import logging
 import os
@@ -22,6 +23,7 @@ from controllers.widgets.pathselectbutton import PathSelectButton
 from controllers.widgets.iconbutton import IconButton
 import models.storagelocation
 import models.conversionmethod
+from models.repository_executor import ConversionExecutor
 import models.category
 from models.base import ValidationException
 
@@ -58,6 +60,8 @@ class LocationsList:
         Saves the storage location name
     on_validate_path_change (location_id, path)
         Saves the storage location path
+    on_change_hardlinks (location_id, state)
+        Saves whether copies within the location may be hard links
     on_click_new_location
         Displays all the fields to create a new location
     on_validate_new_location
@@ -97,6 +101,12 @@ class LocationsList:
             "name": None,  # Delete (for picture folders)
             "stretch": 1,
         },
+        {
+            "name": _("Hard links"),  # For picture folders
+            "stretch": 2,
+            "alignment": Qt.AlignCenter,
+            "picture_folder": True,
+        },
     ]
 
     def __init__(self, parent_controller, location_type):
@@ -119,6 +129,8 @@ class LocationsList:
 
         # Add headers
         for i, col in enumerate(self.columns):
+            if col.get("picture_folder") and location_type != "picture_folder":
+                continue
             # Note: _ is added here again because, otherwise, it doesn't translate
             header = QtWidgets.QLabel(_(col["name"]), self.ui["main"])
             header.setProperty("class", "grid_header")
@@ -293,6 +305,23 @@ class LocationsList:
             )
             self.ui["layout"].addWidget(location["delete"], row, 4)
 
+            # Hard links for copies within the location
+            location["hardlinks"] = QtWidgets.QCheckBox(self.ui["main"])
+            location["hardlinks"].setToolTip(
+                _(
+                    "Copies within this folder (for example, in a category) are hard links: they use no disk space, but modifying one modifies the other"
+                )
+            )
+            location["hardlinks"].setChecked(bool(location_model.hardlinks))
+            location["hardlinks"].stateChanged.connect(
+                lambda state, location=location: self.on_change_hardlinks(
+                    location["model"].id, state
+                )
+            )
+            self.ui["layout"].addWidget(
+                location["hardlinks"], row, 5, QtCore.Qt.AlignCenter
+            )
+
     def on_click_name_change(self, location_id):
         """Displays fields to modify the location name
 
@@ -365,6 +394,22 @@ class LocationsList:
         # Update display
         location["path_edit"].setText(path)
 
+    def on_change_hardlinks(self, location_id, state):
+        """Saves whether copies within the location may be hard links
+
+        Parameters
+        ----------
+        location_id : int
+            The ID of the location to modify
+        state : Qt.CheckState
+            The state of the checkbox
+        """
+        logger.debug(f"LocationsList.on_change_hardlinks {location_id}: {state}")
+        location = self.ui["locations"][location_id]
+        location["model"].hardlinks = state == Qt.Checked
+        self.database.session.add(location["model"])
+        self.database.session.commit()
+
     def on_click_new_location(self):
         """Displays all the fields to create a new location"""
         logger.debug("LocationsList.on_click_new_location")
@@ -597,6 +642,8 @@ class ConversionMethodsList:
         Stores reference to parent controller & defines UI elements.
     add_method_ui (method_model)
         Adds the fields for the provided conversion method
+    field_text (method_model, field)
+        Returns the text displayed for a field of a conversion method
     on_click_field_change
         Displays fields to modify the conversion method name
     on_validate_field_change (field, method_id)
@@ -645,6 +692,15 @@ class ConversionMethodsList:
             "name": None,  # Command change
             "stretch": 1,
         },
+        {
+            "name": _("Timeout (seconds)"),
+            "stretch": 2,
+            "alignment": Qt.AlignLeft,
+        },
+        {
+            "name": None,  # Timeout change
+            "stretch": 1,
+        },
         {
             "name": None,  # Delete
             "stretch": 1,
@@ -655,9 +711,17 @@ class ConversionMethodsList:
         """Enter the command to run to generate the target file (from a raw file)
 %SOURCE_FILE% will be replaced by the source file's full path
 %TARGET_FILE% will be replaced by the target file's full path
-%TARGET_FOLDER% will be replaced by the target file's folder path"""
+%TARGET_FOLDER% will be replaced by the target file's folder path
+To convert several pictures at once, use %SOURCE_FILES% and %TARGET_FOLDER% instead
+Each converted picture must then be named after its source file, with a .jpg extension
+%WORKER_FOLDER% will be replaced by a folder used only by this conversion (for its configuration)
+Conversions using it run in parallel"""
     )
 
+    timeout_help = _("""Enter the maximum duration of a conversion, in seconds
+Conversions still running after that are stopped
+Leave empty to use the default timeout ({timeout} seconds)""")
+
     def __init__(self, parent_controller):
         """Stores reference to parent window & defines UI elements
 
@@ -730,7 +794,7 @@ class ConversionMethodsList:
         method["error"] = {}
 
         row = len(self.ui["methods"])
-        for column, field in enumerate(["name", "suffix", "command"]):
+        for column, field in enumerate(["name", "suffix", "command", "timeout"]):
             # Layout for the grid cell
             method[field + "_wrapper"] = QtWidgets.QWidget(self.ui["main"])
             method[field + "_wrapper_layout"] = QtWidgets.QVBoxLayout()
@@ -808,7 +872,25 @@ class ConversionMethodsList:
         method["delete"].clicked.connect(
             lambda a, method=method: self.on_click_delete_method(method["model"].id)
         )
-        self.ui["layout"].addWidget(method["delete"], len(self.ui["methods"]), 6)
+        self.ui["layout"].addWidget(method["delete"], len(self.ui["methods"]), 8)
+
+    def field_text(self, method_model, field):
+        """Returns the text displayed for a field of a conversion method
+
+        Parameters
+        ----------
+        method_model : models.conversionmethod.ConversionMethod
+            The conversion method to display
+        field : str
+            The field name to display (name, suffix, command or timeout)
+
+        Returns
+        ----------
+        text : str
+            The value of the field (empty if it has none)
+        """
+        value = getattr(method_model, field)
+        return "" if value is None else str(value)
 
     def on_click_field_change(self, field, method_id):
         """Displays widgets to modify a given field the conversion method
@@ -826,10 +908,14 @@ class ConversionMethodsList:
         method = self.ui["methods"][method_id]
 
         # Update display
-        method[field + "_edit"].setText(getattr(method["model"], field))
+        method[field + "_edit"].setText(self.field_text(method["model"], field))
         if field == "command":
             # Note: _ is added here again because, otherwise, it doesn't translate
             method[field + "_edit"].setToolTip(_(self.conversion_method_help))
+        elif field == "timeout":
+            method[field + "_edit"].setToolTip(
+                _(self.timeout_help).format(timeout=ConversionExecutor.default_timeout)
+            )
 
         # Make widgets visible
         method[field + "_stack_layout"].setCurrentIndex(1)
@@ -860,7 +946,7 @@ class ConversionMethodsList:
             return
 
         # Update display
-        method[field + "_label"].setText(getattr(method["model"], field))
+        method[field + "_label"].setText(self.field_text(method["model"], field))
 
         # Make widgets visible
         method[field + "_stack_layout"].setCurrentIndex(0)
@@ -879,7 +965,7 @@ class ConversionMethodsList:
         method["error"] = {}
 
         # Add all modifiable fields
-        for column, field in enumerate(["name", "suffix", "command"]):
+        for column, field in enumerate(["name", "suffix", "command", "timeout"]):
             method[field + "_wrapper"] = QtWidgets.QWidget()
             method[field + "_wrapper_layout"] = QtWidgets.QVBoxLayout()
             method[field + "_wrapper"].setLayout(method[field + "_wrapper_layout"])
@@ -892,6 +978,9 @@ class ConversionMethodsList:
 
         # Note: _ is added here again because, otherwise, it doesn't translate
         method["command"].setToolTip(_(self.conversion_method_help))
+        method["timeout"].setToolTip(
+            _(self.timeout_help).format(timeout=ConversionExecutor.default_timeout)
+        )
 
         # Validate button
         method["validate_new"] = IconButton(
@@ -903,7 +992,7 @@ class ConversionMethodsList:
             self.ui["main"],
         )
         method["validate_new"].clicked.connect(self.on_validate_new_method)
-        self.ui["layout"].addWidget(method["validate_new"], len(self.ui["methods"]), 6)
+        self.ui["layout"].addWidget(method["validate_new"], len(self.ui["methods"]), 8)
 
         # Move the New button to another row
         self.ui["layout"].addWidget(self.ui["add_new"], len(self.ui["methods"]) + 1, 1)
@@ -917,12 +1006,12 @@ class ConversionMethodsList:
             self.new_method = models.conversionmethod.ConversionMethod()
 
         # Clear previous errors
-        for field in ["name", "suffix", "command"]:
+        for field in ["name", "suffix", "command", "timeout"]:
             self.clear_error(0, field)
         method["error"] = {}
 
         # Apply values in each field
-        for field in ["name", "suffix", "command"]:
+        for field in ["name", "suffix", "command", "timeout"]:
             try:
                 setattr(self.new_method, field, method[field].text())
                 self.clear_error(0, field)
@@ -1029,7 +1118,7 @@ class ConversionMethodsList:
         if "model" in method:
             del method["model"]
 
-        for field in ["name", "suffix", "command"]:
+        for field in ["name", "suffix", "command", "timeout"]:
             self.clear_error(method_id, field)
         del method["error"]
         for field in method:
@@ -1043,8 +1132,10 @@ class ConversionMethodsList:
         logger.debug("ConversionMethodsList.refresh_display")
         # Refresh list of methods
         for method in self.ui["methods"].values():
-            for field in ["name", "suffix", "command"]:
-                method[field + "_label"].setText(getattr(method["model"], field))
+            for field in ["name", "suffix", "command", "timeout"]:
+                method[field + "_label"].setText(
+                    self.field_text(method["model"], field)
+                )
 
 
 class CategoriesList:
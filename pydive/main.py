@@ -1,8 +1,10 @@
 """Main application module"""
+
 import gettext
 import logging
 import sys
 import os
+import time
 import platformdirs
 import PyQt5
 
@@ -10,8 +12,12 @@ import models
 import controllers.mainwindow
 import models.database
 import models.repository
+from models.repository_scheduler import ProcessScheduler
+from models.repository_cache import ConversionCache
 
 logger = logging.getLogger(__name__)
+# Not silenced by --real, so the startup time remains visible in real use
+startup_logger = logging.getLogger("pydive.startup")
 logging.basicConfig(level=logging.INFO)
 
 
@@ -21,8 +27,11 @@ class PyDive:
         os.path.dirname(os.path.realpath(__file__)) + "/assets/style/app.css"
     )
     DATABASE_FILE = "sandbox.sqlite"
+    CONVERSION_CACHE_FOLDER = "sandbox_conversions"
+    WORKER_FOLDER = "sandbox_workers"
 
     def __init__(self, database_file=None):
+        self.start_time = time.perf_counter()
         if database_file:
             self.DATABASE_FILE = database_file
         elif "--real" in sys.argv:
@@ -34,6 +43,14 @@ class PyDive:
                 platformdirs.user_data_dir("piratjack-pydive", "PiratJack")
                 + "/prod.sqlite"
             )
+            self.CONVERSION_CACHE_FOLDER = os.path.join(
+                platformdirs.user_cache_dir("piratjack-pydive", "PiratJack"),
+                "conversions",
+            )
+            self.WORKER_FOLDER = os.path.join(
+                platformdirs.user_cache_dir("piratjack-pydive", "PiratJack"),
+                "workers",
+            )
             logger.setLevel(logging.ERROR)
 
         # Setup translation
@@ -43,8 +60,17 @@ class PyDive:
         ).install()
 
         # Connect to database & repository
+        # Pictures are loaded when the Pictures screen is displayed, so startup doesn't depend on their number
         self.database = models.database.Database(self.DATABASE_FILE)
-        self.repository = models.repository.Repository(self.database)
+        self.repository = models.repository.Repository(
+            self.database,
+            lazy=True,
+            conversion_cache=ConversionCache(self.CONVERSION_CACHE_FOLDER),
+        )
+        # Converters keep their configuration between runs in those folders
+        ProcessScheduler.global_instance().worker_root = os.path.abspath(
+            self.WORKER_FOLDER
+        )
 
         # Change platform to avoid Wayland-related warning messages
         if sys.platform == "linux":
@@ -55,12 +81,21 @@ class PyDive:
         with open(self.STYLESHEET_FILE, "r", encoding="UTF-8") as stylesheet:
             app.setStyleSheet(stylesheet.read())
 
-        app.aboutToQuit.connect(PyQt5.QtCore.QThreadPool.globalInstance().clear)
+        app.aboutToQuit.connect(ProcessScheduler.global_instance().clear)
+        app.aboutToQuit.connect(self.repository.shutdown)
 
         window = controllers.mainwindow.MainWindow(self.database, self.repository)
         window.showMaximized()
+        # Triggered once the event loop runs, so after the window is displayed
+        PyQt5.QtCore.QTimer.singleShot(0, self.log_startup_time)
         app.exec_()
 
+    def log_startup_time(self):
+        duration = time.perf_counter() - self.start_time
+        startup_logger.info(
+            f"PyDive.run: window displayed {duration * 1000:.0f} ms after start"
+        )
+
 
 if __name__ == "__main__":
     app = PyDive()
@@ -7,6 +7,7 @@ Classes
 ConversionMethod
     A way to convert images from one format to another
 """
+
 import gettext
 import sqlalchemy.orm
 
@@ -30,9 +31,18 @@ class ConversionMethod(Base):
         The suffix to add to the filename, for example "DT" for darktherapee
     command : str
         A command to execute for the conversion
+        With %SOURCE_FILES%, several pictures are converted by a single command (see batch)
+    timeout : int
+        The maximum duration of a conversion, in seconds (empty for the default timeout)
+    peak_memory : int
+        The memory used by a conversion, in bytes (learned from previous conversions, see ResourceMonitor)
 
     Methods
     -------
+    batch
+        Whether the command converts several pictures at once
+    isolated
+        Whether the command gets a separate folder for each running conversion
     validate_* (self, key, value)
         Validator for the corresponding field
 
@@ -45,6 +55,8 @@ class ConversionMethod(Base):
     name = Column(String(250), nullable=False)
     suffix = Column(String(50), nullable=True)
     command = Column(String(1000), nullable=False)
+    timeout = Column(Integer, nullable=True)
+    peak_memory = Column(Integer, nullable=True)
 
     @sqlalchemy.orm.validates("name")
     def validate_name(self, key, value):
@@ -85,8 +97,79 @@ class ConversionMethod(Base):
                 key,
                 value,
             )
+        if "%SOURCE_FILES%" in value:
+            if "%SOURCE_FILE%" in value or "%TARGET_FILE%" in value:
+                raise ValidationException(
+                    _(
+                        "Conversion method {field} can't use %SOURCE_FILES% with %SOURCE_FILE% or %TARGET_FILE%"
+                    ).format(field=key),
+                    self,
+                    key,
+                    value,
+                )
+            if "%TARGET_FOLDER%" not in value:
+                raise ValidationException(
+                    _(
+                        "Conversion method {field} must use %TARGET_FOLDER% with %SOURCE_FILES%"
+                    ).format(field=key),
+                    self,
+                    key,
+                    value,
+                )
         return value
 
+    @sqlalchemy.orm.validates("timeout")
+    def validate_timeout(self, key, value):
+        # Values entered in the settings screen are text (empty for the default timeout)
+        if value is None or value == "":
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationException(
+                _("Conversion method {field} must be a number of seconds").format(
+                    field=key
+                ),
+                self,
+                key,
+                value,
+            )
+        if value <= 0:
+            raise ValidationException(
+                _("Conversion method {field} must be positive").format(field=key),
+                self,
+                key,
+                value,
+            )
+        return value
+
+    @property
+    def batch(self):
+        """Whether the command converts several pictures at once
+
+        Batch commands get all source files at once (%SOURCE_FILES%) & write in a folder (%TARGET_FOLDER%)
+        Each converted picture is named after its source file, with a .jpg extension
+
+        Returns
+        ----------
+        batch : bool
+            True if the command uses %SOURCE_FILES%
+        """
+        return "%SOURCE_FILES%" in self.command
+
+    @property
+    def isolated(self):
+        """Whether the command gets a separate folder for each running conversion
+
+        Those commands can then run in parallel (see ProcessScheduler.worker_folder)
+
+        Returns
+        ----------
+        isolated : bool
+            True if the command uses %WORKER_FOLDER%
+        """
+        return "%WORKER_FOLDER%" in self.command
+
     def validate_missing_field(self, key, value):
         if value == "" or value is None:
             message = _("Missing conversion method {field}").format(field=key)
@@ -5,11 +5,17 @@ Classes
 Database
     Holds different methods for most queries used in the rest of the application
 """
+
+import os
 import sqlalchemy
 
 from . import storagelocation
 from . import conversionmethod
 from . import category
+from . import scannedfolder
+from . import filefingerprint
+from . import processjournal
+from . import taskstatistic
 
 from .base import Base
 
@@ -32,7 +38,7 @@ class Database:
         Loads (or creates) the database from the provided file
 
     create_tables
-        Creates all the DB tables
+        Creates all the DB tables & adds the columns missing in older databases
 
     storagelocations_get
         Returns a list of all storage locations
@@ -53,14 +59,48 @@ class Database:
         Returns a conversion method based on its suffix
     conversionmethods_get_by_name (name)
         Returns a conversion method based on its name
+    conversionmethods_update_peak_memory (peak_memory)
+        Stores the peak memory use measured for conversion methods
 
     categories_get
         Returns all categories
     category_get_by_name (name)
         Returns a category based on its name
 
+    scanindex_get (root)
+        Returns the scan index of a folder and all its subfolders
+    scanindex_folders (root)
+        Returns the paths of a folder and all its subfolders, as found during the last scan
+    scanindex_folder_filter (root)
+        Returns the filter matching a folder and all its subfolders in the scan index
+    scanindex_update (folders, removed)
+        Replaces the scan index of the provided folders
+
+    fingerprints_get (paths)
+        Returns the stored fingerprints of the provided files
+    fingerprints_update (fingerprints)
+        Stores (or replaces) the fingerprints of the provided files
+
+    journal_add (label, created, tasks, priority)
+        Stores a new process group & its tasks in the journal
+    journal_update (group_id, positions, status)
+        Changes the status of some tasks of a process group
+    journal_get
+        Returns the process groups stored in the journal
+    journal_delete (group_ids)
+        Removes process groups from the journal
+
+    taskstatistics_add (statistics)
+        Stores the resources used by finished tasks
+    taskstatistics_by_conversion_method
+        Returns the resources used by conversions, for each conversion method
+    taskstatistics_by_storage_location
+        Returns the resources used by tasks, for each storage location
+
     delete (self, item)
         Deletes the provided item
+    commit_keeping_objects
+        Commits without expiring the loaded objects (for commits made while processes run)
     """
 
     def __init__(self, database_file):
@@ -72,9 +112,23 @@ class Database:
         self.session = sqlalchemy.orm.sessionmaker(bind=self.engine)()
 
     def create_tables(self):
-        """Creates all the DB tables"""
+        """Creates all the DB tables & adds the columns missing in older databases"""
         Base.metadata.create_all(self.engine)
 
+        inspector = sqlalchemy.inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            existing = [c["name"] for c in inspector.get_columns(table.name)]
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(self.engine.dialect)
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        sqlalchemy.text(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                        )
+                    )
+
     # Storage locations
     def storagelocations_get(self):
         """Returns a list of all storage locations"""
@@ -158,6 +212,25 @@ class Database:
             .one()
         )
 
+    def conversionmethods_update_peak_memory(self, peak_memory):
+        """Stores the peak memory use measured for conversion methods
+
+        Parameters
+        ----------
+        peak_memory : dict of form method_id: int
+            The peak memory use of each conversion method (in bytes)
+        """
+        changed = False
+        for method in self.conversionmethods_get():
+            if (
+                method.id in peak_memory
+                and method.peak_memory != peak_memory[method.id]
+            ):
+                method.peak_memory = peak_memory[method.id]
+                changed = True
+        if changed:
+            self.commit_keeping_objects()
+
     # Categories
     def categories_get(self):
         """Returns a list of all categories"""
@@ -179,6 +252,418 @@ class Database:
             .one()
         )
 
+    # Scan index
+    def scanindex_get(self, root):
+        """Returns the scan index of a folder and all its subfolders
+
+        Parameters
+        ----------
+        root : str
+            The path of the folder
+
+        Returns
+        ----------
+        index : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The folders found during the last scan
+        """
+        folder_filter = self.scanindex_folder_filter(root)
+
+        index = {}
+        folder_paths = {}
+        folders = self.session.query(
+            scannedfolder.ScannedFolder.id,
+            scannedfolder.ScannedFolder.path,
+            scannedfolder.ScannedFolder.mtime,
+        ).filter(folder_filter)
+        for folder_id, path, mtime in folders:
+            index[path] = (mtime, {}, [])
+            folder_paths[folder_id] = path
+
+        # Subfolders are not stored, they're deduced from the folder paths
+        for path in index:
+            parent = os.path.dirname(path)
+            if parent != path and parent in index:
+                index[parent][2].append(os.path.basename(path))
+
+        files = (
+            self.session.query(
+                scannedfolder.ScannedFile.folder_id,
+                scannedfolder.ScannedFile.name,
+                scannedfolder.ScannedFile.size,
+                scannedfolder.ScannedFile.mtime,
+            )
+            .join(scannedfolder.ScannedFolder)
+            .filter(folder_filter)
+        )
+        for folder_id, name, size, mtime in files:
+            index[folder_paths[folder_id]][1][name] = (size, mtime)
+
+        return index
+
+    def scanindex_folders(self, root):
+        """Returns the paths of a folder and all its subfolders, as found during the last scan
+
+        Unlike scanindex_get, files are not read
+
+        Parameters
+        ----------
+        root : str
+            The path of the folder
+
+        Returns
+        ----------
+        folders : list of str
+            The paths of the folders
+        """
+        query = sqlalchemy.select(scannedfolder.ScannedFolder.path).where(
+            self.scanindex_folder_filter(root)
+        )
+        return list(self.session.execute(query).scalars())
+
+    def scanindex_folder_filter(self, root):
+        """Returns the filter matching a folder and all its subfolders in the scan index
+
+        Parameters
+        ----------
+        root : str
+            The path of the folder
+
+        Returns
+        ----------
+        folder_filter : sqlalchemy.sql.expression.ColumnElement
+            The filter to apply on models.scannedfolder.ScannedFolder
+        """
+        root = root.rstrip(os.path.sep) or os.path.sep
+        return sqlalchemy.or_(
+            scannedfolder.ScannedFolder.path == root,
+            scannedfolder.ScannedFolder.path.startswith(
+                os.path.join(root, ""), autoescape=True
+            ),
+        )
+
+    def scanindex_update(self, folders, removed):
+        """Replaces the scan index of the provided folders
+
+        Parameters
+        ----------
+        folders : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The folders to store in the index
+        removed : list of str
+            The paths of the folders to remove from the index
+        """
+        paths = list(folders) + list(removed)
+        # Chunks avoid reaching SQLite's limit on the number of variables
+        for start in range(0, len(paths), 500):
+            chunk = paths[start : start + 500]
+            folder_ids = sqlalchemy.select(scannedfolder.ScannedFolder.id).where(
+                scannedfolder.ScannedFolder.path.in_(chunk)
+            )
+            self.session.execute(
+                sqlalchemy.delete(scannedfolder.ScannedFile)
+                .where(scannedfolder.ScannedFile.folder_id.in_(folder_ids))
+                .execution_options(synchronize_session=False)
+            )
+            self.session.execute(
+                sqlalchemy.delete(scannedfolder.ScannedFolder)
+                .where(scannedfolder.ScannedFolder.path.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+
+        files = []
+        for path, (mtime, folder_files, _subfolders) in folders.items():
+            result = self.session.execute(
+                sqlalchemy.insert(scannedfolder.ScannedFolder).values(
+                    path=path, mtime=mtime
+                )
+            )
+            folder_id = result.inserted_primary_key[0]
+            files += [
+                {
+                    "folder_id": folder_id,
+                    "name": name,
+                    "size": size,
+                    "mtime": file_mtime,
+                }
+                for name, (size, file_mtime) in folder_files.items()
+            ]
+        if files:
+            self.session.execute(sqlalchemy.insert(scannedfolder.ScannedFile), files)
+        self.commit_keeping_objects()
+
+    # File fingerprints
+    def fingerprints_get(self, paths):
+        """Returns the stored fingerprints of the provided files
+
+        Parameters
+        ----------
+        paths : list of str
+            The paths of the files
+
+        Returns
+        ----------
+        fingerprints : dict of form path: (size, mtime, digest)
+            The fingerprints found (files without fingerprint are not included)
+        """
+        paths = list(paths)
+        fingerprints = {}
+        # Chunks avoid reaching SQLite's limit on the number of variables
+        for start in range(0, len(paths), 500):
+            rows = self.session.query(
+                filefingerprint.FileFingerprint.path,
+                filefingerprint.FileFingerprint.size,
+                filefingerprint.FileFingerprint.mtime,
+                filefingerprint.FileFingerprint.digest,
+            ).filter(
+                filefingerprint.FileFingerprint.path.in_(paths[start : start + 500])
+            )
+            for path, size, mtime, digest in rows:
+                fingerprints[path] = (size, mtime, digest)
+        return fingerprints
+
+    def fingerprints_update(self, fingerprints):
+        """Stores (or replaces) the fingerprints of the provided files
+
+        Parameters
+        ----------
+        fingerprints : dict of form path: (size, mtime, digest)
+            The fingerprints to store
+        """
+        paths = list(fingerprints)
+        for start in range(0, len(paths), 500):
+            self.session.execute(
+                sqlalchemy.delete(filefingerprint.FileFingerprint)
+                .where(
+                    filefingerprint.FileFingerprint.path.in_(paths[start : start + 500])
+                )
+                .execution_options(synchronize_session=False)
+            )
+        if fingerprints:
+            self.session.execute(
+                sqlalchemy.insert(filefingerprint.FileFingerprint),
+                [
+                    {"path": path, "size": size, "mtime": mtime, "digest": digest}
+                    for path, (size, mtime, digest) in fingerprints.items()
+                ],
+            )
+        self.commit_keeping_objects()
+
+    # Process journal
+    def journal_add(self, label, created, tasks, priority="normal"):
+        """Stores a new process group & its tasks in the journal
+
+        Parameters
+        ----------
+        label : str
+            The name of the process group
+        created : int
+            When the process group was started, in nanoseconds since the epoch
+        tasks : list of dict
+            The tasks to store (keys are the columns of processjournal.JournalTask)
+        priority : str
+            The priority class of the tasks
+
+        Returns
+        ----------
+        group_id : int
+            The ID of the new process group
+        """
+        result = self.session.execute(
+            sqlalchemy.insert(processjournal.JournalGroup).values(
+                label=label, created=created, priority=priority
+            )
+        )
+        group_id = result.inserted_primary_key[0]
+        if tasks:
+            self.session.execute(
+                sqlalchemy.insert(processjournal.JournalTask),
+                [{**task, "group_id": group_id} for task in tasks],
+            )
+        self.commit_keeping_objects()
+        return group_id
+
+    def journal_update(self, group_id, positions, status="Stopped"):
+        """Changes the status of some tasks of a process group
+
+        Parameters
+        ----------
+        group_id : int
+            The ID of the process group
+        positions : list of int
+            The positions of the tasks in the process group
+        status : str
+            The new status of the tasks
+        """
+        positions = list(positions)
+        # Chunks avoid reaching SQLite's limit on the number of variables
+        for start in range(0, len(positions), 500):
+            self.session.execute(
+                sqlalchemy.update(processjournal.JournalTask)
+                .where(
+                    processjournal.JournalTask.group_id == group_id,
+                    processjournal.JournalTask.position.in_(
+                        positions[start : start + 500]
+                    ),
+                )
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+        self.commit_keeping_objects()
+
+    def journal_get(self):
+        """Returns the process groups stored in the journal
+
+        Returns
+        ----------
+        groups : list of processjournal.JournalGroup
+            The process groups, oldest first
+        """
+        return (
+            self.session.query(processjournal.JournalGroup)
+            .options(sqlalchemy.orm.selectinload(processjournal.JournalGroup.tasks))
+            .order_by(processjournal.JournalGroup.id)
+            .populate_existing()
+            .all()
+        )
+
+    def journal_delete(self, group_ids):
+        """Removes process groups from the journal
+
+        Parameters
+        ----------
+        group_ids : list of int
+            The IDs of the process groups to remove
+        """
+        group_ids = list(group_ids)
+        self.session.execute(
+            sqlalchemy.delete(processjournal.JournalTask)
+            .where(processjournal.JournalTask.group_id.in_(group_ids))
+            .execution_options(synchronize_session=False)
+        )
+        self.session.execute(
+            sqlalchemy.delete(processjournal.JournalGroup)
+            .where(processjournal.JournalGroup.id.in_(group_ids))
+            .execution_options(synchronize_session=False)
+        )
+        self.commit_keeping_objects()
+
+    # Task statistics
+    def taskstatistics_add(self, statistics):
+        """Stores the resources used by finished tasks
+
+        Parameters
+        ----------
+        statistics : list of dict
+            The values to store for each task (see models.taskstatistic.TaskStatistic)
+        """
+        if not statistics:
+            return
+        self.session.execute(
+            sqlalchemy.insert(taskstatistic.TaskStatistic), list(statistics)
+        )
+        self.commit_keeping_objects()
+
+    def taskstatistics_by_conversion_method(self):
+        """Returns the resources used by conversions, for each conversion method
+
+        Durations & CPU times are averaged over successful conversions only
+
+        Returns
+        ----------
+        statistics : list of dict
+            For each conversion method: conversion_method_id, tasks, errors, wall_time, cpu_time, peak_memory
+        """
+        statistic = taskstatistic.TaskStatistic
+        success = statistic.error == sqlalchemy.false()
+        query = (
+            sqlalchemy.select(
+                statistic.conversion_method_id,
+                sqlalchemy.func.count().label("tasks"),
+                sqlalchemy.func.sum(
+                    sqlalchemy.cast(statistic.error, sqlalchemy.Integer)
+                ).label("errors"),
+                sqlalchemy.func.avg(
+                    sqlalchemy.case((success, statistic.wall_time))
+                ).label("wall_time"),
+                sqlalchemy.func.avg(
+                    sqlalchemy.case(
+                        (success, statistic.user_time + statistic.system_time)
+                    )
+                ).label("cpu_time"),
+                sqlalchemy.func.max(statistic.peak_memory).label("peak_memory"),
+            )
+            .where(statistic.type == "generate")
+            .group_by(statistic.conversion_method_id)
+        )
+        return [row._asdict() for row in self.session.execute(query)]
+
+    def taskstatistics_by_storage_location(self):
+        """Returns the resources used by tasks, for each storage location
+
+        Each task is counted once, with its duration, for its target location (or its source if it has none)
+        Bytes read are counted for the source location, bytes written for the target location
+
+        Returns
+        ----------
+        statistics : list of dict
+            For each storage location: location_id, tasks, bytes_read, bytes_written, wall_time
+        """
+        statistic = taskstatistic.TaskStatistic
+        task_location = sqlalchemy.func.coalesce(
+            statistic.target_location_id, statistic.source_location_id
+        )
+        locations = {}
+
+        def location(location_id):
+            return locations.setdefault(
+                location_id,
+                {
+                    "location_id": location_id,
+                    "tasks": 0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                    "wall_time": 0.0,
+                },
+            )
+
+        query = (
+            sqlalchemy.select(
+                task_location,
+                sqlalchemy.func.count(),
+                sqlalchemy.func.sum(statistic.wall_time),
+            )
+            .where(task_location.is_not(None))
+            .group_by(task_location)
+        )
+        for location_id, tasks, wall_time in self.session.execute(query):
+            location(location_id)["tasks"] = tasks
+            location(location_id)["wall_time"] = wall_time or 0.0
+
+        for column, bytes_column, key in [
+            (statistic.source_location_id, statistic.bytes_read, "bytes_read"),
+            (statistic.target_location_id, statistic.bytes_written, "bytes_written"),
+        ]:
+            query = (
+                sqlalchemy.select(column, sqlalchemy.func.sum(bytes_column))
+                .where(column.is_not(None))
+                .group_by(column)
+            )
+            for location_id, nb_bytes in self.session.execute(query):
+                location(location_id)[key] = nb_bytes or 0
+        return list(locations.values())
+
     def delete(self, item):
         self.session.delete(item)
         self.session.commit()
+
+    def commit_keeping_objects(self):
+        """Commits without expiring the loaded objects (for commits made while processes run)
+
+        Running processes read storage locations & conversion methods from their own thread
+        If a commit expired them, they would be reloaded from that thread, which SQLite doesn't allow
+        This happens for scan index, journal, fingerprint & statistics updates
+        """
+        self.session.expire_on_commit = False
+        try:
+            self.session.commit()
+        finally:
+            self.session.expire_on_commit = True
@@ -0,0 +1,39 @@
+"""Content fingerprints of picture files, used to detect identical copies
+
+Classes
+----------
+FileFingerprint
+    The content hash of a file, valid as long as its size & modification time don't change
+"""
+
+from sqlalchemy import Column, Integer, String
+
+from .base import Base
+
+
+class FileFingerprint(Base):
+    """The content hash of a file, valid as long as its size & modification time don't change
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    path : str
+        The path of the file
+    size : int
+        The file size, in bytes
+    mtime : int
+        The modification time of the file, in nanoseconds
+    digest : str
+        The hash of the file contents (hexadecimal)
+    """
+
+    __tablename__ = "file_fingerprints"
+    id = Column(Integer, primary_key=True)
+    path = Column(String(1000), nullable=False, unique=True, index=True)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Integer, nullable=False)
+    digest = Column(String(128), nullable=False)
+
+    def __repr__(self):
+        return f"{self.path} ({self.size} bytes) @ {self.mtime}: {self.digest}"
@@ -5,10 +5,14 @@ Classes
 StorageLocationCollision
     Exception raised with a storage location is within another
 
+PictureResolver
+    Determines the storage location, trip & category of picture files
+
 Picture
     A single picture, corresponding to 1 image file on disk
 """
 import os
+import sys
 import gettext
 import logging
 
@@ -24,6 +28,138 @@ class StorageLocationCollision(ValueError):
         self.path = path
 
 
+class PictureResolver:
+    """Determines the storage location, trip & category of picture files
+
+    It is built once for a given set of storage locations & categories (typically, once per scan)
+    Then, each folder is resolved in a time that doesn't depend on the number of locations & categories:
+    - Storage locations are found by looking up the folder & its parents
+    - Categories are found by looking up the end of the trip, for each length of category path
+
+    Attributes
+    ----------
+    storage_locations : dict of form path: StorageLocation
+        The storage locations, based on their path (without final separator)
+    categories : dict of form relative_path: [Category]
+        The categories, based on their relative path
+    category_lengths : list of int
+        The lengths of the categories' relative paths
+    folders : dict of form folder: (location, trip, category)
+        The folders resolved so far
+
+    Methods
+    -------
+    __init__ (storage_locations, categories)
+        Prepares the lookups. Raises StorageLocationCollision if a location is within another
+    find_location (folder)
+        Returns the storage location containing a given folder (None if there is none)
+    resolve (folder, path)
+        Returns the storage location, trip & category of a given folder
+    """
+
+    def __init__(self, storage_locations, categories):
+        """Prepares the lookups. Raises StorageLocationCollision if a location is within another
+
+        Parameters
+        -------
+        storage_locations : list of StorageLocation
+            The available storage locations
+        categories : list of Category
+            The available categories
+        """
+        self.storage_locations = {}
+        for location in storage_locations:
+            folder = location.path.rstrip(os.path.sep) or os.path.sep
+            if folder in self.storage_locations:
+                logger.warning(
+                    f"Picture recognition failed: location {location.name} has the same path as {self.storage_locations[folder].name}"
+                )
+                raise StorageLocationCollision("recognition failed", location.path)
+            self.storage_locations[folder] = location
+        for folder, location in self.storage_locations.items():
+            parent = None
+            if os.path.dirname(folder) != folder:
+                parent = self.find_location(os.path.dirname(folder))
+            if parent:
+                logger.warning(
+                    f"Picture recognition failed: location {location.name} is within {parent.name}"
+                )
+                raise StorageLocationCollision("recognition failed", location.path)
+
+        self.categories = {}
+        for category in categories:
+            self.categories.setdefault(category.relative_path, []).append(category)
+        self.category_lengths = sorted(set(len(path) for path in self.categories))
+        self.folders = {}
+
+    def find_location(self, folder):
+        """Returns the storage location containing a given folder (None if there is none)
+
+        Parameters
+        -------
+        folder : str
+            The folder to find
+        """
+        while folder not in self.storage_locations:
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                return None
+            folder = parent
+        return self.storage_locations[folder]
+
+    def resolve(self, folder, path):
+        """Returns the storage location, trip & category of a given folder
+
+        Raises StorageLocationCollision if the folder can't be recognized
+
+        Parameters
+        -------
+        folder : str
+            The folder to resolve
+        path : str
+            The picture being resolved (used in error messages)
+
+        Returns
+        ----------
+        location : StorageLocation
+            The storage location of the folder
+        trip : str
+            The trip of the folder
+        category : Category
+            The category of the folder ("" if there is none)
+        """
+        if folder in self.folders:
+            return self.folders[folder]
+
+        # In which folder / storage location is the picture?
+        location = self.find_location(folder)
+        if not location:
+            logger.warning(
+                f"Picture recognition failed: found no match for {path} - Searched in {', '.join([s.name for s in self.storage_locations.values()])}"
+            )
+            raise StorageLocationCollision("recognition failed", path)
+
+        trip = folder[len(location.path) :].strip(os.path.sep)
+        category = ""
+        matching_categories = [
+            c
+            for length in self.category_lengths
+            if length <= len(trip)
+            for c in self.categories.get(trip[len(trip) - length :], [])
+        ]
+        if matching_categories:
+            if len(matching_categories) != 1:
+                logger.warning(
+                    f"Picture recognition failed: found categories {', '.join([c.name for c in matching_categories])} for {path}"
+                )
+                raise StorageLocationCollision("recognition failed", path)
+            category = matching_categories[0]
+            trip = trip.removesuffix(category.relative_path).strip(os.path.sep)
+
+        self.folders[folder] = (location, sys.intern(trip), category)
+        return self.folders[folder]
+
+
 class Picture:
     """A single picture, corresponding to 1 image file on disk
 
@@ -32,10 +168,17 @@ class Picture:
     - Trip (can span multiple folders)
     - Category (may be absent)
 
+    Large repositories hold a lot of pictures, so they're kept compact:
+    - No __dict__ (thanks to __slots__)
+    - Folders & trips are interned, hence shared with the other pictures in the same folder
+    - The path and name are calculated on demand
+
     Attributes
     ----------
     path : str
         The path to the image file
+    folder : str
+        The folder containing the image file
     trip : str
         The image's trip (leaf folder)
     location : StorageLocation
@@ -49,11 +192,13 @@ class Picture:
 
     Methods
     -------
-    __init__ (storage_locations, categories, path)
+    __init__ (storage_locations, categories, path, resolver)
         Stores information based on provided parameters & file path
     """
 
-    def __init__(self, storage_locations, categories, path):
+    __slots__ = ("folder", "filename", "trip", "location", "category")
+
+    def __init__(self, storage_locations, categories, path, resolver=None):
         """Stores information based on provided parameters & file path
 
         Matches the image to its storage location
@@ -69,40 +214,27 @@ class Picture:
             The available categories
         path : str
             Image's file path
+        resolver : PictureResolver
+            Resolver built from storage_locations & categories (avoids building one for each picture)
         """
-        logger.debug(f"Picture.init: {storage_locations}, {categories}, {path}")
+        logger.debug(f"Picture.init: {path}")
+        if resolver is None:
+            resolver = PictureResolver(storage_locations, categories)
         self.path = path
-        # In which folder / storage location is the picture?
-        storage_location = [
-            location
-            for location in storage_locations
-            if path[: len(location.path)] == location.path
-        ]
-        if len(storage_location) == 1:
-            location = storage_location[0]
-            self.trip = os.path.dirname(path)[len(location.path) :].strip(os.path.sep)
-            self.category = ""
-            matching_categories = [
-                c for c in categories if self.trip.endswith(c.relative_path)
-            ]
-            if matching_categories:
-                if len(matching_categories) != 1:
-                    logger.warning(
-                        f"Picture recognition failed: found categories {', '.join([c.name for c in matching_categories])} for {path}"
-                    )
-                    raise StorageLocationCollision("recognition failed", path)
-                self.category = matching_categories[0]
-                self.trip = self.trip.removesuffix(self.category.relative_path).strip(
-                    os.path.sep
-                )
-            self.location = location
-            self.name = os.path.basename(path).rsplit(".", 1)[-2]  # Remove extension
-            self.filename = os.path.basename(path)
-        else:
-            logger.warning(
-                f"Picture recognition failed: found matches {', '.join([s.name for s in storage_location])} for {path} - Searched in {', '.join([s.name for s in storage_locations])}"
-            )
-            raise StorageLocationCollision("recognition failed", path)
+        self.location, self.trip, self.category = resolver.resolve(self.folder, path)
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, self.filename)
+
+    @path.setter
+    def path(self, path):
+        self.folder = sys.intern(os.path.dirname(path))
+        self.filename = os.path.basename(path)
+
+    @property
+    def name(self):
+        return self.filename.rsplit(".", 1)[-2]  # Remove extension
 
     def __repr__(self):
         return " ".join(
@@ -29,6 +29,10 @@ class PictureGroup(QtCore.QObject):
         Emitted with a new image is added
     pictureRemoved : pyqtSignal
         Emitted with an image is deleted
+    pictureGroupRenamed : pyqtSignal
+        Emitted with the previous name when the group's name changes
+    pictureGroupChanged : pyqtSignal
+        Emitted at the end of a bulk update, if pictures were added or removed
     name : str
         The name of the picture group (= the common part of the pictures' file names)
     trip : str
@@ -36,7 +40,13 @@ class PictureGroup(QtCore.QObject):
     pictures : dict of form conversion_type: picture
         The pictures belonging to this group, organized by conversion type
     locations : dict of form location.name: picture
-        The pictures belonging to this group, organized by location
+        The pictures belonging to this group, organized by location (calculated on demand)
+    categories : dict of form location.name: {category.name: picture}
+        The pictures belonging to this group, organized by location & category (calculated on demand)
+    bulk_update : bool
+        Whether pictureAdded & pictureRemoved are replaced by a single pictureGroupChanged
+    bulk_changed : bool
+        Whether pictures were added or removed during the bulk update
 
     Methods
     -------
@@ -46,11 +56,17 @@ class PictureGroup(QtCore.QObject):
         Adds a new picture to the group, after checking that it matches the group
     remove_picture (picture)
         Removes a picture from the group, after checking that it matches the group
+    begin_bulk_update
+        Stops emitting signals for each picture added or removed
+    end_bulk_update
+        Emits a single pictureGroupChanged if pictures changed since begin_bulk_update
     """
 
     pictureAdded = QtCore.pyqtSignal(PictureModel, str)
     pictureRemoved = QtCore.pyqtSignal(str, StorageLocation)
     pictureGroupDeleted = QtCore.pyqtSignal(str, str)
+    pictureGroupRenamed = QtCore.pyqtSignal(str)
+    pictureGroupChanged = QtCore.pyqtSignal()
     pictureTasksDone = QtCore.pyqtSignal()
     pictureTasksStart = QtCore.pyqtSignal()
 
@@ -67,9 +83,9 @@ class PictureGroup(QtCore.QObject):
         self.name = group_name
         self.trip = None
         self.pictures = {}  # Structure is conversion_type: picture model
-        self.locations = {}
-        self.categories = {}
         self.tasks = []
+        self.bulk_update = False
+        self.bulk_changed = False
 
     def add_picture(self, picture):
         """Adds a new picture to the group, after checking that it matches the group
@@ -78,7 +94,7 @@ class PictureGroup(QtCore.QObject):
         May recalculate all images' conversion types if the new image is a RAW one
 
         Raises ValueError if the picture's trip or name do not match the group
-        Emits pictureAdded once done
+        Emits pictureAdded once done (except during bulk updates)
 
         Parameters
         -------
@@ -98,6 +114,7 @@ class PictureGroup(QtCore.QObject):
 
         # The picture name starts with the group name ==> easy
         conversion_type = ""
+        old_name = self.name
         if picture.name.startswith(self.name):
             conversion_type = picture.name.replace(self.name, "")
             if conversion_type.startswith("_"):
@@ -121,16 +138,15 @@ class PictureGroup(QtCore.QObject):
                 "Picture " + picture.name + " does not belong to group " + self.name
             )
 
-        # Update locations & categories
-        location = picture.location.name
-        self.locations[location] = self.locations.get(location, []) + [picture]
-        if location not in self.categories:
-            self.categories[location] = {}
-        category = picture.category.name if picture.category else ""
-        self.categories[location][category] = self.categories[location].get(
-            category, []
-        ) + [picture]
+        if self.name != old_name:
+            logger.debug(
+                f"PictureGroup.add_picture: emit pictureGroupRenamed: {old_name} to {self.name} during {self.trip}"
+            )
+            self.pictureGroupRenamed.emit(old_name)
 
+        if self.bulk_update:
+            self.bulk_changed = True
+            return
         logger.debug(
             f"PictureGroup.add_picture: emit pictureAdded: {picture.filename} to {self.name} during {self.trip}"
         )
@@ -142,7 +158,7 @@ class PictureGroup(QtCore.QObject):
         Deletes the actual image file
 
         Raises ValueError if the picture's trip do not match the group
-        Emits pictureRemoved once done
+        Emits pictureRemoved once done (except during bulk updates)
 
         Parameters
         -------
@@ -166,15 +182,13 @@ class PictureGroup(QtCore.QObject):
         if not self.pictures[conversion_type]:
             del self.pictures[conversion_type]
 
-        # Update locations
-        self.locations[picture.location.name].remove(picture)
-        if not self.locations[picture.location.name]:
-            del self.locations[picture.location.name]
-
-        logger.debug(
-            f"PictureGroup.remove_picture: emit pictureRemoved: {picture.filename} from {self.name} during {self.trip}"
-        )
-        self.pictureRemoved.emit(conversion_type, picture.location)
+        if self.bulk_update:
+            self.bulk_changed = True
+        else:
+            logger.debug(
+                f"PictureGroup.remove_picture: emit pictureRemoved: {picture.filename} from {self.name} during {self.trip}"
+            )
+            self.pictureRemoved.emit(conversion_type, picture.location)
         del picture
 
         if not self.pictures and not self.tasks:
@@ -183,6 +197,59 @@ class PictureGroup(QtCore.QObject):
             )
             self.pictureGroupDeleted.emit(self.trip, self.name)
 
+    def begin_bulk_update(self):
+        """Stops emitting signals for each picture added or removed
+
+        pictureGroupRenamed & pictureGroupDeleted are still emitted
+        """
+        self.bulk_update = True
+
+    def end_bulk_update(self):
+        """Emits a single pictureGroupChanged if pictures changed since begin_bulk_update
+
+        Nothing is emitted if the group has been deleted in the meantime
+        """
+        self.bulk_update = False
+        if self.bulk_changed and (self.pictures or self.tasks):
+            logger.debug(
+                f"PictureGroup.end_bulk_update: emit pictureGroupChanged for {self.name} during {self.trip}"
+            )
+            self.pictureGroupChanged.emit()
+        self.bulk_changed = False
+
+    @property
+    def locations(self):
+        """Returns the pictures of this group, organized by location
+
+        Returns
+        ----------
+        locations : dict of form location.name: [picture]
+            The pictures belonging to this group, organized by location
+        """
+        locations = {}
+        for pictures in self.pictures.values():
+            for picture in pictures:
+                locations.setdefault(picture.location.name, []).append(picture)
+        return locations
+
+    @property
+    def categories(self):
+        """Returns the pictures of this group, organized by location & category
+
+        Returns
+        ----------
+        categories : dict of form location.name: {category.name: [picture]}
+            The pictures belonging to this group, organized by location & category
+        """
+        categories = {}
+        for pictures in self.pictures.values():
+            for picture in pictures:
+                category = picture.category.name if picture.category else ""
+                categories.setdefault(picture.location.name, {}).setdefault(
+                    category, []
+                ).append(picture)
+        return categories
+
     def add_process(self, process):
         logger.debug(
             f"PictureGroup.add_process {process} for {self.name} during {self.trip}"
@@ -191,6 +258,7 @@ class PictureGroup(QtCore.QObject):
         self.pictureTasksStart.emit()
         process.signals.taskFinished.connect(lambda: self.task_done(process))
         process.signals.taskError.connect(lambda: self.task_done(process))
+        process.signals.taskSkipped.connect(lambda: self.task_done(process))
 
     def task_done(self, process):
         logger.debug(
@@ -0,0 +1,144 @@
+"""An index of picture groups, to quickly find the groups matching a picture
+
+Classes
+----------
+PictureGroupIndex
+    Picture groups organized by trip & name, to quickly find the groups matching a picture
+"""
+
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PictureGroupIndex:
+    """Picture groups organized by trip & name, to quickly find the groups matching a picture
+
+    A picture matches a group if its name starts with the group's name, or the other way around
+    For each trip, group names are kept sorted, so that:
+    - groups whose name starts with the picture's name are found by bisection
+    - groups whose name is the start of the picture's name are found by looking up each prefix
+
+    Attributes
+    ----------
+    groups : dict of form trip: {name: PictureGroup}
+        The picture groups, organized by trip & name
+    names : dict of form trip: [name]
+        The sorted names of the picture groups of each trip
+
+    Methods
+    -------
+    __init__
+        Initializes values to defaults
+    add (picture_group)
+        Adds a picture group to the index
+    remove (picture_group, name)
+        Removes a picture group from the index
+    rename (picture_group, old_name)
+        Updates the index after a picture group's name changed
+    find_matching (trip, name)
+        Returns the picture groups matching a given picture name
+    clear
+        Removes all picture groups from the index
+    """
+
+    def __init__(self):
+        """Initializes values to defaults"""
+        self.groups = {}
+        self.names = {}
+
+    def add(self, picture_group):
+        """Adds a picture group to the index
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The picture group to add
+        """
+        logger.debug(
+            f"PictureGroupIndex.add {picture_group.name} during {picture_group.trip}"
+        )
+        trip_groups = self.groups.setdefault(picture_group.trip, {})
+        if picture_group.name not in trip_groups:
+            bisect.insort(
+                self.names.setdefault(picture_group.trip, []), picture_group.name
+            )
+        trip_groups[picture_group.name] = picture_group
+
+    def remove(self, picture_group, name=None):
+        """Removes a picture group from the index
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The picture group to remove
+        name : str
+            The name under which the group is indexed (defaults to the group's name)
+        """
+        logger.debug(
+            f"PictureGroupIndex.remove {picture_group.name} during {picture_group.trip}"
+        )
+        name = picture_group.name if name is None else name
+        trip_groups = self.groups.get(picture_group.trip, {})
+        if trip_groups.get(name) is not picture_group:
+            return
+        del trip_groups[name]
+        names = self.names[picture_group.trip]
+        del names[bisect.bisect_left(names, name)]
+        if not trip_groups:
+            del self.groups[picture_group.trip]
+            del self.names[picture_group.trip]
+
+    def rename(self, picture_group, old_name):
+        """Updates the index after a picture group's name changed
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The renamed picture group
+        old_name : str
+            The previous name of the group
+        """
+        self.remove(picture_group, old_name)
+        self.add(picture_group)
+
+    def find_matching(self, trip, name):
+        """Returns the picture groups matching a given picture name
+
+        Parameters
+        ----------
+        trip : str
+            The trip of the picture
+        name : str
+            The name of the picture (without extension)
+
+        Returns
+        ----------
+        picture_groups : list of PictureGroup
+            The groups whose name is the start of the picture's name, then the ones starting with the picture's name
+        """
+        trip_groups = self.groups.get(trip)
+        if not trip_groups:
+            return []
+
+        # Groups whose name is the start of the picture's name (excluding the name itself)
+        matching_groups = [
+            trip_groups[name[:i]]
+            for i in range(1, len(name))
+            if name[:i] in trip_groups
+        ]
+
+        # Groups whose name starts with the picture's name are next to each other once sorted
+        names = self.names[trip]
+        position = bisect.bisect_left(names, name)
+        while position < len(names) and names[position].startswith(name):
+            matching_groups.append(trip_groups[names[position]])
+            position += 1
+
+        return matching_groups
+
+    def clear(self):
+        """Removes all picture groups from the index"""
+        self.groups = {}
+        self.names = {}
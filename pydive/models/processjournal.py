@@ -0,0 +1,106 @@
+"""Process journal: the process groups & tasks in progress, so they can be resumed after a restart
+
+Classes
+----------
+JournalGroup
+    A process group in progress
+JournalTask
+    A task of a process group in progress
+"""
+import sqlalchemy.orm
+
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+
+from .base import Base
+
+
+class JournalGroup(Base):
+    """A process group in progress
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    label : str
+        The name of the process group
+    created : int
+        When the process group was started, in nanoseconds since the epoch
+    priority : str
+        The priority class of the tasks (see ProcessScheduler.priorities)
+    tasks : list of JournalTask
+        The tasks of the group
+    """
+
+    __tablename__ = "journal_groups"
+    id = Column(Integer, primary_key=True)
+    label = Column(String(1000), nullable=False)
+    created = Column(Integer, nullable=False)
+    priority = Column(String(50), nullable=True)
+
+    tasks = sqlalchemy.orm.relationship(
+        "JournalTask",
+        back_populates="group",
+        cascade="all, delete-orphan",
+        order_by="JournalTask.position",
+    )
+
+    def __repr__(self):
+        return f"{self.label} ({len(self.tasks)} tasks)"
+
+
+class JournalTask(Base):
+    """A task of a process group in progress
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    group_id : int
+        The ID of the process group
+    group : JournalGroup
+        The process group
+    position : int
+        The position of the task in its process group
+    type : str
+        The type of task ("copy", "generate", "remove", "change_trip" or "change_trip_folder")
+    status : str
+        The status of the task ("Queued" or "Stopped")
+    source_path : str
+        The path of the source picture (or of the trip folder, to rename one)
+    target_path : str
+        The path of the file (or folder) to create
+    location_id : int
+        [Copy, Generate or Change trip folder] The ID of the target storage location
+    category_id : int
+        [Copy] The ID of the target category
+    conversion_method_id : int
+        [Generate] The ID of the conversion method
+    source_trip : str
+        [Change trip folder] The trip to rename
+    target_trip : str
+        [Change trip or Change trip folder] The new trip
+    verify : bool
+        [Copy] Whether to check the copy against the source picture
+    """
+
+    __tablename__ = "journal_tasks"
+    id = Column(Integer, primary_key=True)
+    group_id = Column(
+        Integer, ForeignKey("journal_groups.id"), nullable=False, index=True
+    )
+    position = Column(Integer, nullable=False)
+    type = Column(String(50), nullable=False)
+    status = Column(String(50), nullable=False, default="Queued")
+    source_path = Column(String(1000), nullable=False)
+    target_path = Column(String(1000), nullable=True)
+    location_id = Column(Integer, nullable=True)
+    category_id = Column(Integer, nullable=True)
+    conversion_method_id = Column(Integer, nullable=True)
+    source_trip = Column(String(250), nullable=True)
+    target_trip = Column(String(250), nullable=True)
+    verify = Column(Boolean, nullable=False, default=False)
+
+    group = sqlalchemy.orm.relationship("JournalGroup", back_populates="tasks")
+
+    def __repr__(self):
+        return f"{self.type} {self.source_path} to {self.target_path} ({self.status})"
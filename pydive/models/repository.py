@@ -10,19 +10,32 @@ ProcessGroup
 """
 
 import os
+import stat
+import time
+import concurrent.futures
+import contextlib
 import gettext
 import logging
 
 from PyQt5 import QtCore
-from .picture import Picture as PictureModel
+from .picture import Picture as PictureModel, PictureResolver
 from .picturegroup import PictureGroup
+from .picturegroupindex import PictureGroupIndex
 from .conversionmethod import ConversionMethod
 from .repository_processes import (
     CopyProcess,
     GenerateProcess,
+    GenerateBatchProcess,
     RemoveProcess,
     ChangeTripProcess,
+    ChangeTripFolderProcess,
 )
+from .repository_scheduler import ProcessScheduler
+from .repository_fingerprints import FingerprintIndex
+from .repository_journal import ProcessJournal
+from .repository_statistics import TaskStatistics
+from .repository_copier import FileCopier
+from .repository_tasks import TaskTable
 
 _ = gettext.gettext
 logger = logging.getLogger(__name__)
@@ -33,152 +46,564 @@ class Repository:
 
     Attributes
     ----------
-    allowed_extensions : list of str
+    allowed_extensions : tuple of str
         List of picture extensions that can be displayed
+    racy_delay : int
+        Folders modified less than racy_delay ns before a scan will be read again in the next one
+    scan_threads : int
+        The number of folders read in parallel during a scan
 
     Methods
     -------
-    __init__
-        Defines default attributes
+    __init__ (database, lazy, conversion_cache)
+        Defines default attributes & loads pictures (unless lazy is set)
     load_pictures (folders)
         Loads all pictures from the provided storage locations (folders)
-    read_folder (pictures, location_name, path)
-        Reads a given folder recursively to find pictures
+    load_pictures_prepare
+        Prepares the loading of pictures: reads configuration & scan index from the database
+    load_pictures_finish (configuration, new_picture_groups)
+        Finalizes the loading of pictures, once all folders are read
+    refresh_folders (folders)
+        Reads given folders again & updates pictures accordingly
+    update_pictures (index, paths, scan, full_reload)
+        Updates the scan index & pictures based on a scan of some folders
+    link_processes (picture_groups)
+        Links new picture groups to the in-progress tasks
+    add_picture_to_groups (picture)
+        Adds a picture to the matching picture group (which is created if needed)
+    add_picture_group (picture_group)
+        Adds a picture group to the repository
+    remove_picture_group (picture_group)
+        Removes a picture group from the repository (not hard drive)
+    read_locations (indexes)
+        Reads all storage locations in parallel to find pictures
+    read_folder (path, index, scan, recursive, scan_start)
+        Reads a given folder (recursively by default) to find pictures
     add_picture (picture_group, location, path)
         Adds a single picture to a given picture_group
     remove_picture (picture_group, location, path)
         Removes a picture from memory (not hard drive)
-    copy_pictures (label, target_location, source_location, trip, picture_group, conversion_method)
+    bulk_update
+        Groups the changes made to picture groups, to avoid emitting signals for each picture
+    bulk_update_include (picture_group)
+        Includes a picture group in the ongoing bulk update (if any)
+    copy_pictures (label, target_location, source_location, trip, picture_group, conversion_method, target_category, verify, priority)
         Copies pictures between folders
-    generate_pictures (label, target_location, conversion_methods, source_location, trip, picture_group)
+    preload_fingerprints (process_group)
+        Reads the stored hash of the files copied by a process group (see CopyProcess)
+    generate_pictures (label, target_location, conversion_methods, source_location, trip, picture_group, priority)
         Generates pictures by converting between different formats
-    change_trip_pictures (label, target_trip, source_trip, picture_group)
+    change_trip_pictures (label, target_trip, source_trip, picture_group, priority)
         Moves pictures between folders (trips)
+    change_trip_folder_locations (picture_groups, source_trip, target_trip)
+        Returns the locations where a trip can be renamed through its folder
+    change_trip_folder_finished (location, source_trip, target_trip, source_folder, target_folder)
+        Moves all pictures of a location to the new trip, after its folder has been renamed
     change_trip_pictures_finished (source_picture_group, picture, target_picture_group)
         Triggers memory updates after a picture has been moved
+    start_process_group (process_group)
+        Stores a process group in the journal & starts it
+    process_group_finished
+        Stores what was learned from a finished process group (memory use & fingerprints)
+    store_peak_memory
+        Stores the memory use learned from conversions, for the next runs of PyDive
+    shutdown
+        Stops following process groups & writes pending changes to the database
+    resume_process_groups (journal_groups)
+        Resumes the process groups interrupted when PyDive stopped
+    resume_task (process_group, journal_group, journal_task, pictures)
+        Adds an interrupted task to a process group (unless it was already done)
+    picture_group_get (trip, name)
+        Returns a picture group based on its trip & name
+    trips
+        Returns all trips & their picture groups
     """
 
-    allowed_extensions = [".cr2", ".jpg", ".jpeg"]
+    allowed_extensions = (".cr2", ".jpg", ".jpeg")
+    racy_delay = 2 * 10**9  # In nanoseconds
+    scan_threads = 8
 
-    def __init__(self, database):
-        """Defines default attributes"""
-        logger.debug("Repository.init")
+    def __init__(self, database, lazy=False, conversion_cache=None):
+        """Defines default attributes & loads pictures (unless lazy is set)
+
+        Parameters
+        ----------
+        database : models.database.Database
+            A reference to the application database
+        lazy : bool
+            Whether to wait for an explicit load_pictures call before reading storage locations
+        conversion_cache : models.repository_cache.ConversionCache
+            The cache of converted pictures (None to always run conversions)
+        """
+        logger.debug(f"Repository.init (lazy: {lazy})")
         self.storage_locations = []
         self.categories = []
         self.picture_groups = []
+        self.picture_group_index = PictureGroupIndex()
         self.process_groups = []
         self.database = database
-        self.load_pictures()
-        # TODO: Darktherapee prevents multithreading, hence this (ugly) workaround
-        QtCore.QThreadPool.globalInstance().setMaxThreadCount(1)
+        self.configuration = None
+        self.resolver = None
+        self.scan_start = 0
+        self.bulk_update_depth = 0
+        self.bulk_update_groups = {}  # Used as an ordered set
+        self.fingerprints = FingerprintIndex(database)
+        self.journal = ProcessJournal(database)
+        self.statistics = TaskStatistics(database)
+        self.conversion_cache = conversion_cache
+        if conversion_cache:
+            # Pictures hashed for copies don't need to be hashed again for conversions
+            conversion_cache.fingerprints = self.fingerprints
+        if not lazy:
+            self.load_pictures()
 
     def load_pictures(self):
         """Loads all pictures from the provided storage locations (folders)
 
         Pictures are added in the corresponding picture_group
+        Folders that did not change since the previous scan are not read again
+        If the storage locations & categories did not change either, only the picture groups impacted by changes are updated
 
         Parameters
         ----------
         storage_locations : list of StorageLocation
             The storage locations
         """
-        # Find all pictures
         logger.info("Repository.load_pictures")
+        indexes, configuration, full_reload = self.load_pictures_prepare()
+        new_picture_groups = []
+        for location, index, paths, scan in self.read_locations(indexes):
+            new_picture_groups += self.update_pictures(index, paths, scan, full_reload)
+        self.load_pictures_finish(configuration, new_picture_groups)
+
+    def load_pictures_prepare(self):
+        """Prepares the loading of pictures: reads configuration & scan index from the database
+
+        If storage locations or categories changed since the last load, all picture groups are removed
+        Until load_pictures_finish is called, the next load will be a full reload
+
+        Returns
+        ----------
+        indexes : dict of form location.id: scan index
+            The scan index of each location from the previous scan (see Database.scanindex_get)
+        configuration : tuple
+            The storage locations & categories used for this load
+        full_reload : bool
+            Whether all pictures will be loaded (otherwise, only changes are applied)
+        """
+        logger.debug("Repository.load_pictures_prepare")
         self.storage_locations = self.database.storagelocations_get_picture_folders()
         self.categories = self.database.categories_get()
-        self.picture_groups = []
-        for location in self.storage_locations:
-            pictures = self.read_folder([], location.path)
-            for picture in pictures:
-                matching_groups = [
-                    group
-                    for group in self.picture_groups
-                    if (
-                        picture.name.startswith(group.name)
-                        or group.name.startswith(picture.name)
-                    )
-                    and picture.trip == group.trip
-                ]
+        self.resolver = PictureResolver(self.storage_locations, self.categories)
+        configuration = (
+            [(location.id, location.path) for location in self.storage_locations],
+            [(category.id, category.relative_path) for category in self.categories],
+        )
+        full_reload = configuration != self.configuration
+        self.configuration = None
+        if full_reload:
+            self.picture_groups = []
+            self.picture_group_index.clear()
+
+        self.scan_start = time.time_ns()
+        indexes = {
+            location.id: self.database.scanindex_get(location.path)
+            for location in self.storage_locations
+        }
+        return indexes, configuration, full_reload
+
+    def load_pictures_finish(self, configuration, new_picture_groups):
+        """Finalizes the loading of pictures, once all folders are read
+
+        Parameters
+        ----------
+        configuration : tuple
+            The storage locations & categories used for this load (see load_pictures_prepare)
+        new_picture_groups : list of PictureGroup
+            The picture groups created during the load
+        """
+        logger.info(
+            f"Repository.load_pictures_finish: {len(self.picture_groups)} picture groups, {len(new_picture_groups)} new"
+        )
+        self.link_processes(new_picture_groups)
+        self.configuration = configuration
 
-                # Group doesn't exist yet
-                if len(matching_groups) == 0:
-                    group = PictureGroup(picture.name)
-                    self.picture_groups.append(group)
+    def refresh_folders(self, folders):
+        """Reads given folders again & updates pictures accordingly
 
-                    def remove(picture_groups, g):
-                        if g in picture_groups:
-                            picture_groups.remove(g)
+        The folders are always read again, their subfolders only if they changed since the last scan
+        Folders outside of the storage locations are ignored
 
-                    group.pictureGroupDeleted.connect(
-                        lambda _a, _b, g=group: remove(self.picture_groups, g)
-                    )
-                    group.add_picture(picture)
-                elif len(matching_groups) == 1:
-                    matching_groups[0].add_picture(picture)
-                else:
-                    # If there are multiple groups, then they should be merged together
-                    # This can happen if, for example, the pictures are processed in this order:
-                    # IMG_0001_DT, then IMG_0001_RT then IMG_0001
-                    # First 2 images will generate a group, the third one will match both of them
-
-                    # We first add the new picture to the first group
-                    # This will rename the first group to "IMG_0001"
-                    group = matching_groups[0]
-                    group.add_picture(picture)
-                    # Then we merge
-                    for g in matching_groups[1:]:
-                        pictures_in_group = []
-                        for conversion_type in g.pictures:
-                            pictures_in_group += g.pictures[conversion_type]
-                        for pic in pictures_in_group:
-                            g.remove_picture(pic)
-                            group.add_picture(pic)
-
-            logger.info(
-                f"Repository.load_pictures: found {len(pictures)} images in {location.name}"
+        Parameters
+        ----------
+        folders : list of str
+            The paths of the folders to read
+
+        Returns
+        ----------
+        new_picture_groups : list of PictureGroup
+            The picture groups created
+        """
+        logger.info(f"Repository.refresh_folders on {len(folders)} folders")
+        if not self.resolver:
+            return []
+        # Not stored in self.scan_start: a background load may be using it
+        scan_start = time.time_ns()
+        new_picture_groups = []
+        for folder in folders:
+            folder = folder.rstrip(os.path.sep) or os.path.sep
+            if not self.resolver.find_location(folder):
+                continue
+            index = self.database.scanindex_get(folder)
+            scan = {}
+            paths = self.read_folder(
+                folder,
+                {k: v for k, v in index.items() if k != folder},
+                scan,
+                scan_start=scan_start,
             )
+            new_picture_groups += self.update_pictures(index, paths, scan)
+
+        self.link_processes(new_picture_groups)
+        return new_picture_groups
+
+    def update_pictures(self, index, paths, scan, full_reload=False):
+        """Updates the scan index & pictures based on a scan of some folders
+
+        Parameters
+        ----------
+        index : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The scan index of the scanned folders, before the scan
+        paths : list of str
+            The paths of the pictures found during the scan
+        scan : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The folders found during the scan
+        full_reload : bool
+            Whether all pictures found should be added (otherwise, only changes are applied)
+
+        Returns
+        ----------
+        new_picture_groups : list of PictureGroup
+            The picture groups created
+        """
+        # Unchanged folders are stored in scan as-is, so they're easy to exclude
+        changed_folders = {k: v for k, v in scan.items() if index.get(k) is not v}
+        removed_folders = [k for k in index if k not in scan]
+        self.database.scanindex_update(changed_folders, removed_folders)
+
+        if full_reload:
+            added_paths, removed_paths = paths, []
+        else:
+            added_paths, removed_paths = [], []
+            for folder in changed_folders:
+                new_files = changed_folders[folder][1]
+                old_files = index[folder][1] if folder in index else {}
+                removed_paths += [
+                    os.path.join(folder, name)
+                    for name in old_files
+                    if new_files.get(name) != old_files[name]
+                ]
+                added_paths += [
+                    os.path.join(folder, name)
+                    for name in new_files
+                    if old_files.get(name) != new_files[name]
+                ]
+            for folder in removed_folders:
+                removed_paths += [
+                    os.path.join(folder, name) for name in index[folder][1]
+                ]
+
+        new_picture_groups = []
+        with self.bulk_update():
+            for path in removed_paths:
+                picture = PictureModel(
+                    self.storage_locations, self.categories, path, self.resolver
+                )
+                for picture_group in self.picture_group_index.find_matching(
+                    picture.trip, picture.name
+                ):
+                    location_pictures = picture_group.locations.get(
+                        picture.location.name, []
+                    )
+                    if path in [p.path for p in location_pictures]:
+                        self.remove_picture(picture_group, picture.location, path)
+                        break
+            for path in added_paths:
+                picture = PictureModel(
+                    self.storage_locations, self.categories, path, self.resolver
+                )
+                picture_group = self.add_picture_to_groups(picture)
+                if picture_group:
+                    new_picture_groups.append(picture_group)
 
-        # Link picture groups to the in-progress tasks
+        logger.debug(
+            f"Repository.update_pictures: {len(changed_folders)} folders read, {len(added_paths)} images added, {len(removed_paths)} images removed"
+        )
+        return new_picture_groups
+
+    def link_processes(self, picture_groups):
+        """Links new picture groups to the in-progress tasks
+
+        Parameters
+        ----------
+        picture_groups : list of PictureGroup
+            The picture groups to link
+        """
         tasks = []
-        for picture_group in self.picture_groups:
+        for picture_group in picture_groups:
+            if picture_group not in self.picture_groups:
+                continue
             for process_group in self.process_groups:
                 tasks = [
                     t
                     for t in process_group.tasks
                     if t["status"] not in ("Cancelled", "Stopped")
+                    and t["picture_group"]
                     and t["picture_group"].name == picture_group.name
                     and t["picture_group"].trip == picture_group.trip
                 ]
                 for t in tasks:
                     picture_group.add_process(t["process"])
 
-    def read_folder(self, pictures, path):
-        """Reads a given folder recursively to find pictures
+    def add_picture_to_groups(self, picture):
+        """Adds a picture to the matching picture group (which is created if needed)
+
+        Parameters
+        ----------
+        picture : Picture
+            The picture to add
+
+        Returns
+        ----------
+        picture_group : PictureGroup
+            The picture group, if it has been created. None otherwise.
+        """
+        matching_groups = self.picture_group_index.find_matching(
+            picture.trip, picture.name
+        )
+
+        for group in matching_groups:
+            self.bulk_update_include(group)
+
+        # Group doesn't exist yet
+        if len(matching_groups) == 0:
+            group = PictureGroup(picture.name)
+            self.bulk_update_include(group)
+            group.add_picture(picture)
+            self.add_picture_group(group)
+            return group
+        elif len(matching_groups) == 1:
+            # The picture may be known already (added by a background process)
+            if picture.path not in [
+                p.path
+                for p in matching_groups[0].locations.get(picture.location.name, [])
+            ]:
+                matching_groups[0].add_picture(picture)
+        else:
+            # If there are multiple groups, then they should be merged together
+            # This can happen if, for example, the pictures are processed in this order:
+            # IMG_0001_DT, then IMG_0001_RT then IMG_0001
+            # First 2 images will generate a group, the third one will match both of them
+
+            # We first add the new picture to the first group
+            # This will rename the first group to "IMG_0001"
+            group = matching_groups[0]
+            group.add_picture(picture)
+            # Then we merge
+            for g in matching_groups[1:]:
+                pictures_in_group = []
+                for conversion_type in g.pictures:
+                    pictures_in_group += g.pictures[conversion_type]
+                for pic in pictures_in_group:
+                    g.remove_picture(pic)
+                    group.add_picture(pic)
+        return None
+
+    def add_picture_group(self, picture_group):
+        """Adds a picture group to the repository
+
+        The group's trip must be defined, so that the group can be indexed
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The picture group to add
+        """
+        self.picture_groups.append(picture_group)
+        self.picture_group_index.add(picture_group)
+        picture_group.pictureGroupRenamed.connect(
+            lambda old_name, g=picture_group: self.picture_group_index.rename(
+                g, old_name
+            )
+        )
+        picture_group.pictureGroupDeleted.connect(
+            lambda _a, _b, g=picture_group: self.remove_picture_group(g)
+        )
+
+    def remove_picture_group(self, picture_group):
+        """Removes a picture group from the repository (not hard drive)
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The picture group to remove
+        """
+        if picture_group in self.picture_groups:
+            self.picture_groups.remove(picture_group)
+        self.picture_group_index.remove(picture_group)
+
+    def read_locations(self, indexes):
+        """Reads all storage locations in parallel to find pictures
+
+        Each storage location's root folder is read first, then each of its subfolders (trips) is read recursively
+        All those reads happen in a thread pool, so that slow devices don't delay the other ones
+        Results are yielded as soon as each folder is read, so they can be processed while the scan goes on
+        Folders of the scan index that no longer exist are yielded last, with no picture
+
+        Parameters
+        ----------
+        indexes : dict of form location.id: scan index
+            The scan index of each location from the previous scan (see Database.scanindex_get)
+
+        Yields
+        ----------
+        location : StorageLocation
+            The storage location being read
+        index : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The part of the scan index matching the folders read
+        pictures : list of str
+            The paths of the pictures found
+        scan : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The folders read (see read_folder)
+        """
+        logger.debug("Repository.read_locations")
+        # Split the scan index of each location by subfolder ("" is for the root folder)
+        subindexes = {}
+        for location in self.storage_locations:
+            root = location.path.rstrip(os.path.sep) or os.path.sep
+            subindexes[location.id] = {}
+            for path, folder in indexes[location.id].items():
+                subfolder = path[len(root) :].lstrip(os.path.sep).split(os.path.sep)[0]
+                subindexes[location.id].setdefault(subfolder, {})[path] = folder
+
+        scan_start = self.scan_start
+        executor = concurrent.futures.ThreadPoolExecutor(self.scan_threads)
+        try:
+            root_reads = []
+            for location in self.storage_locations:
+                root_scan = {}
+                future = executor.submit(
+                    self.read_folder,
+                    location.path,
+                    indexes[location.id],
+                    root_scan,
+                    False,
+                    scan_start,
+                )
+                root_reads.append((location, root_scan, future))
+
+            reads = []
+            for location, root_scan, future in root_reads:
+                reads.append((location, "", root_scan, future))
+                future.result()
+                root = location.path.rstrip(os.path.sep) or os.path.sep
+                for subfolder in root_scan[root][2] if root in root_scan else []:
+                    subfolder_scan = {}
+                    future = executor.submit(
+                        self.read_folder,
+                        os.path.join(root, subfolder),
+                        indexes[location.id],
+                        subfolder_scan,
+                        True,
+                        scan_start,
+                    )
+                    reads.append((location, subfolder, subfolder_scan, future))
+
+            # Results are yielded in order so that pictures are always found in the same order
+            for location, subfolder, scan, future in reads:
+                index = subindexes[location.id].pop(subfolder, {})
+                yield location, index, future.result(), scan
+
+            for location in self.storage_locations:
+                index = {
+                    path: folder
+                    for subindex in subindexes[location.id].values()
+                    for path, folder in subindex.items()
+                }
+                if index:
+                    yield location, index, [], {}
+        finally:
+            # When the scan is interrupted, the folders not yet read are skipped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def read_folder(self, path, index, scan, recursive=True, scan_start=None):
+        """Reads a given folder (recursively by default) to find pictures
+
+        Folders whose modification time matches the scan index are not listed again
 
         Parameters
         ----------
-        pictures : list of Picture
-            The list in which to add new pictures
         path : str
             The path to explore (will do nothing if it's not a folder)
+        index : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The scan index from the previous scan (see Database.scanindex_get)
+        scan : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            Where to store the folders found during this scan
+        recursive : bool
+            Whether to read subfolders as well
+        scan_start : int
+            When the scan started, in nanoseconds since the epoch (self.scan_start if not provided)
+
+        Returns
+        ----------
+        pictures : list of str
+            The paths of the pictures found
         """
-        logger.debug(f"Repository.read_folder init : {path}, {len(pictures)} pictures")
-        if not os.path.isdir(path):
-            return pictures
-        for element in os.listdir(path):
-            full_path = os.path.join(path, element)
-            if os.path.isdir(full_path):
-                self.read_folder(pictures, full_path)
-            else:
-                matching_extension = [
-                    ext
-                    for ext in self.allowed_extensions
-                    if full_path.lower().endswith(ext)
-                ]
-                if matching_extension:
-                    pictures.append(
-                        PictureModel(self.storage_locations, self.categories, full_path)
-                    )
+        logger.debug(f"Repository.read_folder init : {path}")
+        if scan_start is None:
+            scan_start = self.scan_start
+        try:
+            folder_stat = os.stat(path)
+        except OSError:
+            return []
+        if not stat.S_ISDIR(folder_stat.st_mode):
+            return []
+
+        folder = path.rstrip(os.path.sep) or os.path.sep
+        if folder in index and index[folder][0] == folder_stat.st_mtime_ns:
+            scan[folder] = index[folder]
+        else:
+            files = {}
+            subfolders = []
+            try:
+                with os.scandir(path) as elements:
+                    for element in elements:
+                        # DirEntry caches the file type, so this doesn't require a stat
+                        try:
+                            if element.is_dir():
+                                subfolders.append(element.name)
+                            elif element.name.lower().endswith(self.allowed_extensions):
+                                element_stat = element.stat()
+                                files[element.name] = (
+                                    element_stat.st_size,
+                                    element_stat.st_mtime_ns,
+                                )
+                        except OSError:
+                            continue
+            except OSError:
+                return []
+            # Folders modified during the scan may change again without mtime change
+            mtime = folder_stat.st_mtime_ns
+            if mtime >= scan_start - self.racy_delay:
+                mtime = -1
+            scan[folder] = (mtime, files, subfolders)
+
+        pictures = [os.path.join(folder, name) for name in scan[folder][1]]
+        if recursive:
+            for subfolder in scan[folder][2]:
+                pictures += self.read_folder(
+                    os.path.join(folder, subfolder), index, scan, scan_start=scan_start
+                )
         logger.debug(f"Repository.read_folder done : {path}, {len(pictures)} pictures")
         return pictures
 
@@ -199,7 +624,11 @@ class Repository:
         logger.info(
             f"Repository.add_picture for {picture_group.trip}/{picture_group.name} in {location.name} - {path}"
         )
+        # The picture may have been found by a scan already
+        if path in [p.path for p in picture_group.locations.get(location.name, [])]:
+            return
         picture = PictureModel([location], self.categories, path)
+        self.bulk_update_include(picture_group)
         picture_group.add_picture(picture)
 
     def remove_picture(self, picture_group, location, path):
@@ -217,10 +646,45 @@ class Repository:
         logger.info(
             f"Repository.remove_picture from {picture_group.trip}/{picture_group.name} in {location.name} - {path}"
         )
-        picture = [p for p in picture_group.locations[location.name] if p.path == path]
+        picture = [
+            p for p in picture_group.locations.get(location.name, []) if p.path == path
+        ]
         if picture and len(picture) == 1:
+            self.bulk_update_include(picture_group)
             picture_group.remove_picture(picture[0])
 
+    @contextlib.contextmanager
+    def bulk_update(self):
+        """Groups the changes made to picture groups, to avoid emitting signals for each picture
+
+        Each picture group modified within this context emits a single pictureGroupChanged at the end
+        Contexts can be nested: signals are emitted when the outermost one ends
+        """
+        self.bulk_update_depth += 1
+        try:
+            yield
+        finally:
+            self.bulk_update_depth -= 1
+            if not self.bulk_update_depth:
+                picture_groups, self.bulk_update_groups = self.bulk_update_groups, {}
+                logger.debug(
+                    f"Repository.bulk_update: {len(picture_groups)} picture groups changed"
+                )
+                for picture_group in picture_groups:
+                    picture_group.end_bulk_update()
+
+    def bulk_update_include(self, picture_group):
+        """Includes a picture group in the ongoing bulk update (if any)
+
+        Parameters
+        ----------
+        picture_group : PictureGroup
+            The picture group about to be modified
+        """
+        if self.bulk_update_depth and picture_group not in self.bulk_update_groups:
+            picture_group.begin_bulk_update()
+            self.bulk_update_groups[picture_group] = None
+
     def copy_pictures(
         self,
         label,
@@ -230,12 +694,19 @@ class Repository:
         picture_group=None,
         conversion_method=None,
         target_category=None,
+        verify=False,
+        priority="normal",
     ):
         """Copies pictures between folders
 
         This function will create new picture files (by copying them)
         Triggers self.add_picture once the copy is complete
 
+        Pictures already in the target with the same contents are skipped, otherwise they're in error
+        The contents are compared in the background, using the stored hash when possible (see CopyProcess)
+        The hash of each copy is stored, so that copying again doesn't read the files
+        Verified copies are checked against the source as well (see FileCopier)
+
         Note: if the picture exists in 2 categories in the source folder, it'll try to copy both.
         This will generate an error "target file exists"
 
@@ -258,6 +729,10 @@ class Repository:
             Copy only pictures with a specific conversion method. If blank, copies all pictures.
         target_category : models.category.Category
             Copy in this category. If None, copies in the base folder of the trip
+        verify : bool
+            Whether to check each copy against its source (see FileCopier)
+        priority : str
+            The priority class of the copies (see ProcessScheduler.priorities)
 
         Returns
         ----------
@@ -274,13 +749,13 @@ class Repository:
             picture_groups = [picture_group]
             trip = picture_group.trip
         elif trip is not None:
-            picture_groups = self.trips[trip].values()
+            picture_groups = list(self.trips[trip].values())
 
         if not picture_groups:
             raise ValueError("Either trip or picture_group must be provided")
 
         # Determine the source: if same image exists, then it'll be a copy
-        process_group = ProcessGroup(label)
+        process_group = ProcessGroup(label, priority)
         errors = []
         for picture_group in picture_groups:
             # Assumption: 2 pictures with the same method and location are identical
@@ -319,6 +794,8 @@ class Repository:
                     picture=source_picture,
                     target_location=target_location,
                     target_category=target_category,
+                    verify=verify,
+                    fingerprints=self.fingerprints,
                 )
                 process.signals.taskFinished.connect(self.add_picture)
 
@@ -326,10 +803,27 @@ class Repository:
         if len(errors) == len(picture_groups):
             raise FileNotFoundError(_(f"No source image found for any of the pictures"))
 
-        process_group.run()
-        self.process_groups.append(process_group)
+        self.preload_fingerprints(process_group)
+        self.start_process_group(process_group)
         return process_group
 
+    def preload_fingerprints(self, process_group):
+        """Reads the stored hash of the files copied by a process group (see CopyProcess)
+
+        Parameters
+        ----------
+        process_group : ProcessGroup
+            The process group whose copies will run
+        """
+        self.fingerprints.preload(
+            [
+                path
+                for task in process_group.tasks
+                if task["type"] == "copy" and task["process"]
+                for path in (task["process"].source_file, task["process"].target_file)
+            ]
+        )
+
     def generate_pictures(
         self,
         label,
@@ -338,10 +832,12 @@ class Repository:
         source_location=None,
         trip=None,
         picture_group=None,
+        priority="normal",
     ):
         """Generates pictures by converting between different formats
 
         This function will create new picture files (by converting from RAW pictures)
+        Batch conversion methods convert several pictures of the trip per command (see GenerateBatchProcess)
         Triggers self.add_picture once the generation is complete
 
         Parameters
@@ -361,6 +857,8 @@ class Repository:
         picture_group : PictureGroup
             The picture group to copy. Ignored if blank.
             Either trip or picture_group must be provided
+        priority : str
+            The priority class of the conversions (see ProcessScheduler.priorities)
 
         Returns
         ----------
@@ -377,13 +875,13 @@ class Repository:
             picture_groups = [picture_group]
             trip = picture_group.trip
         elif trip is not None:
-            picture_groups = self.trips[trip].values()
+            picture_groups = list(self.trips[trip].values())
 
         if not picture_groups:
             raise ValueError("Either trip or picture_group must be provided")
 
         # Determine the source: find the RAW image
-        process_group = ProcessGroup(label)
+        process_group = ProcessGroup(label, priority)
         errors = []
         for picture_group in picture_groups:
             # Determine source (RAW) picture - filter by name + location (if provided)
@@ -459,6 +957,7 @@ class Repository:
                     picture=source_picture,
                     target_location=target_location,
                     conversion_method=conversion_method,
+                    conversion_cache=self.conversion_cache,
                 )
                 process.signals.taskFinished.connect(self.add_picture)
 
@@ -466,8 +965,12 @@ class Repository:
         if len(errors) == len(picture_groups):
             raise FileNotFoundError(_(f"No source image found for any of the pictures"))
 
-        process_group.run()
-        self.process_groups.append(process_group)
+        if self.conversion_cache:
+            # The conversion cache uses the source's fingerprint: it's read from the database now
+            self.fingerprints.preload(
+                [task["picture"].path for task in process_group.tasks]
+            )
+        self.start_process_group(process_group)
         return process_group
 
     def remove_pictures(
@@ -476,6 +979,7 @@ class Repository:
         trip=None,
         picture_group=None,
         picture=None,
+        priority="normal",
     ):
         """Removes pictures from hard drive
 
@@ -495,6 +999,8 @@ class Repository:
             The picture to remove.
             picture_group is required if picture is provided
             Either trip, picture_group or picture+picture_group must be provided
+        priority : str
+            The priority class of the deletions (see ProcessScheduler.priorities)
 
         Returns
         ----------
@@ -519,10 +1025,10 @@ class Repository:
         if picture_group:
             picture_groups = [picture_group]
         elif trip is not None:
-            picture_groups = self.trips[trip].values()
+            picture_groups = list(self.trips[trip].values())
 
         # Determine the source: if same image exists, then it'll be a copy
-        process_group = ProcessGroup(label)
+        process_group = ProcessGroup(label, priority)
         for picture_group in picture_groups:
             if picture:
                 pictures = [picture]
@@ -537,8 +1043,7 @@ class Repository:
                 )
                 process.signals.taskFinished.connect(self.remove_picture)
 
-        process_group.run()
-        self.process_groups.append(process_group)
+        self.start_process_group(process_group)
         return process_group
 
     def change_trip_pictures(
@@ -547,11 +1052,15 @@ class Repository:
         target_trip,
         source_trip=None,
         picture_group=None,
+        priority="normal",
     ):
         """Moves pictures between folders (trips)
 
         Triggers self.remove_picture and self.add_picture once the copy is complete
 
+        When a whole trip is renamed to a new trip, each location's trip folder is renamed at once
+        (unless the target folder already exists in that location)
+
         Parameters
         ----------
         label : str
@@ -564,6 +1073,8 @@ class Repository:
         picture_group : PictureGroup
             The picture group to copy. Ignored if blank.
             Either source_trip or picture_group must be provided
+        priority : str
+            The priority class of the moves (see ProcessScheduler.priorities)
 
         Returns
         ----------
@@ -580,48 +1091,149 @@ class Repository:
             picture_groups = [picture_group]
             source_trip = picture_group.trip
         elif source_trip:
-            picture_groups = self.trips[source_trip].values()
+            picture_groups = list(self.trips[source_trip].values())
 
         if not picture_groups:
             raise ValueError("Either source_trip or picture_group must be provided")
 
-        # Determine the source: if same image exists, then it'll be a copy
-        process_group = ProcessGroup(label)
+        # When renaming a whole trip, move folders rather than each picture
+        process_group = ProcessGroup(label, priority)
+        folder_locations = []
+        if not picture_group and target_trip not in self.trips:
+            folder_locations = self.change_trip_folder_locations(
+                picture_groups, source_trip, target_trip
+            )
+        for location in folder_locations:
+            process = process_group.add_process(
+                "change_trip_folder",
+                picture_group=None,
+                target_location=location,
+                target_trip=target_trip,
+                source_trip=source_trip,
+            )
+            for source_picture_group in picture_groups:
+                if location.name in source_picture_group.locations:
+                    source_picture_group.add_process(process)
+            process.signals.taskFinished.connect(
+                lambda _a, location, path, source_folder=process.source_file: self.change_trip_folder_finished(
+                    location, source_trip, target_trip, source_folder, path
+                )
+            )
+
         for source_picture_group in picture_groups:
+            source_pictures = [
+                picture
+                for pictures in source_picture_group.pictures.values()
+                for picture in pictures
+                if picture.location not in folder_locations
+            ]
+            if not source_pictures:
+                continue
+
             # The target picture group may not be the source one
             # Or transfers may fail, thus we need to have both
-            target_picture_group = [
-                pg
-                for pg in self.picture_groups
-                if pg.trip == target_trip and pg.name == source_picture_group.name
-            ]
-            if target_picture_group:
-                target_picture_group = target_picture_group[0]
-            else:
+            target_picture_group = self.picture_group_get(
+                target_trip, source_picture_group.name
+            )
+            if not target_picture_group:
                 target_picture_group = PictureGroup(source_picture_group.name)
                 target_picture_group.trip = target_trip
-                self.picture_groups.append(target_picture_group)
+                self.add_picture_group(target_picture_group)
 
             # Generate tasks for each move
-            for conversion_type in source_picture_group.pictures:
-                for source_picture in source_picture_group.pictures[conversion_type]:
-                    process = process_group.add_process(
-                        "change_trip",
-                        picture_group=source_picture_group,
-                        picture=source_picture,
-                        target_trip=target_trip,
-                    )
-                    target_picture_group.add_process(process)
-                    process.signals.taskFinished.connect(
-                        lambda source_picture_group, _b, path, picture=source_picture, target_picture_group=target_picture_group: self.change_trip_pictures_finished(
-                            source_picture_group, picture, path, target_picture_group
-                        )
+            for source_picture in source_pictures:
+                process = process_group.add_process(
+                    "change_trip",
+                    picture_group=source_picture_group,
+                    picture=source_picture,
+                    target_trip=target_trip,
+                )
+                target_picture_group.add_process(process)
+                process.signals.taskFinished.connect(
+                    lambda source_picture_group, _b, path, picture=source_picture, target_picture_group=target_picture_group: self.change_trip_pictures_finished(
+                        source_picture_group, picture, path, target_picture_group
                     )
+                )
 
-        process_group.run()
-        self.process_groups.append(process_group)
+        self.start_process_group(process_group)
         return process_group
 
+    def change_trip_folder_locations(self, picture_groups, source_trip, target_trip):
+        """Returns the locations where a trip can be renamed through its folder
+
+        This is possible if the target trip's folder doesn't exist in the location
+        Locations where other trips are nested in the trip's folder (such as "Malta/Gozo" for "Malta") are excluded:
+        renaming the folder would move those trips as well
+
+        Parameters
+        ----------
+        picture_groups : list of PictureGroup
+            The picture groups of the trip
+        source_trip : str
+            The trip to rename
+        target_trip : str
+            The new name of the trip
+
+        Returns
+        ----------
+        locations : list of StorageLocation
+            The locations where the trip's folder can be renamed
+        """
+        locations = {
+            picture.location.name: picture.location
+            for picture_group in picture_groups
+            for pictures in picture_group.pictures.values()
+            for picture in pictures
+        }
+        # The target folder can't be within the source folder
+        if (target_trip + os.path.sep).startswith(source_trip + os.path.sep):
+            return []
+        nested_locations = {
+            location_name
+            for trip, trip_picture_groups in self.trips.items()
+            if trip.startswith(source_trip + os.path.sep)
+            for picture_group in trip_picture_groups.values()
+            for location_name in picture_group.locations
+        }
+        return [
+            location
+            for location in locations.values()
+            if location.name not in nested_locations
+            and os.path.isdir(os.path.join(location.path, source_trip))
+            and not os.path.exists(os.path.join(location.path, target_trip))
+        ]
+
+    def change_trip_folder_finished(
+        self, location, source_trip, target_trip, source_folder, target_folder
+    ):
+        """Moves all pictures of a location to the new trip, after its folder has been renamed
+
+        Pictures are updated in memory, without reading the folder again
+
+        Parameters
+        ----------
+        location : StorageLocation
+            The location in which the trip's folder has been renamed
+        source_trip : str
+            The previous name of the trip
+        target_trip : str
+            The new name of the trip
+        source_folder : str
+            The previous path of the trip's folder
+        target_folder : str
+            The new path of the trip's folder
+        """
+        logger.info(
+            f"Repository.change_trip_folder_finished {source_trip} to {target_trip} in {location.name}"
+        )
+        with self.bulk_update():
+            for picture_group in list(self.trips.get(source_trip, {}).values()):
+                for picture in list(picture_group.locations.get(location.name, [])):
+                    self.remove_picture(picture_group, location, picture.path)
+                    picture.trip = target_trip
+                    picture.path = target_folder + picture.path[len(source_folder) :]
+                    self.add_picture_to_groups(picture)
+
     def change_trip_pictures_finished(
         self, source_picture_group, picture, path, target_picture_group
     ):
@@ -654,36 +1266,312 @@ class Repository:
         picture.path = path
         self.add_picture(target_picture_group, picture.location, picture.path)
 
-    def __getattr__(self, attr):
-        """Calculates & returns missing attributes. Only works for trips attribute.
+    def start_process_group(self, process_group):
+        """Stores a process group in the journal & starts it
+
+        The resources used by its tasks are stored as well (see TaskStatistics)
+
+        Parameters
+        ----------
+        process_group : ProcessGroup
+            The process group to start
+        """
+        self.journal.record(process_group)
+        self.statistics.record(process_group)
+        process_group.finished.connect(self.process_group_finished)
+        process_group.run()
+        self.process_groups.append(process_group)
+
+    def process_group_finished(self):
+        """Stores what was learned from a finished process group (memory use & fingerprints)"""
+        self.store_peak_memory()
+        self.fingerprints.save()
+
+    def store_peak_memory(self):
+        """Stores the memory use learned from conversions, for the next runs of PyDive"""
+        monitor = ProcessScheduler.global_instance().monitor
+        self.database.conversionmethods_update_peak_memory(dict(monitor.peak_memory))
+
+    def shutdown(self):
+        """Stops following process groups & writes pending changes to the database
+
+        Called when PyDive exits, before the database is closed
+        Process groups still running are disconnected, so their late signals don't use the database
+        Their unfinished tasks stay in the journal (see resume_process_groups)
+        """
+        logger.info("Repository.shutdown")
+        for process_group in self.process_groups:
+            if not process_group.is_finished:
+                process_group.finished.disconnect(self.process_group_finished)
+        self.journal.shutdown()
+        self.statistics.shutdown()
+        self.store_peak_memory()
+        self.fingerprints.save()
+
+    def resume_process_groups(self, journal_groups):
+        """Resumes the process groups interrupted when PyDive stopped
+
+        Pictures must be loaded first, since tasks are found based on their paths
+        The interrupted process groups are replaced in the journal by the resumed ones
+
+        Parameters
+        ----------
+        journal_groups : list of models.processjournal.JournalGroup
+            The interrupted process groups (see ProcessJournal.unfinished)
+
+        Returns
+        ----------
+        process_groups : list of ProcessGroup
+            The resumed process groups
+        """
+        logger.info(f"Repository.resume_process_groups {journal_groups}")
+        pictures = {
+            picture.path: (picture_group, picture)
+            for picture_group in self.picture_groups
+            for pictures in picture_group.pictures.values()
+            for picture in pictures
+        }
+        process_groups = []
+        for journal_group in journal_groups:
+            process_group = ProcessGroup(
+                journal_group.label, journal_group.priority or "normal"
+            )
+            for journal_task in journal_group.tasks:
+                if journal_task.status != "Stopped":
+                    self.resume_task(
+                        process_group, journal_group, journal_task, pictures
+                    )
+            self.preload_fingerprints(process_group)
+            self.start_process_group(process_group)
+            process_groups.append(process_group)
+        self.journal.discard(journal_groups)
+        return process_groups
+
+    def resume_task(self, process_group, journal_group, journal_task, pictures):
+        """Adds an interrupted task to a process group (unless it was already done)
+
+        Tasks done before PyDive stopped are added as completed. These are:
+        - deletions whose file doesn't exist anymore
+        - moves whose target exists while the source doesn't
+
+        Copies run again: they're skipped if the target has the same contents as the source (see CopyProcess)
+
+        A conversion's output can't be checked, so it's always run again
+        If the target was written after the process group started, it's an incomplete output & is deleted first
+
+        Parameters
+        ----------
+        process_group : ProcessGroup
+            The process group in which to add the task
+        journal_group : models.processjournal.JournalGroup
+            The interrupted process group
+        journal_task : models.processjournal.JournalTask
+            The interrupted task
+        pictures : dict of form path: (PictureGroup, Picture)
+            All the pictures in the repository
+        """
+        task_type = journal_task.type
+        source_file, target_file = journal_task.source_path, journal_task.target_path
+        picture_group, picture = pictures.get(source_file, (None, None))
+        locations = {location.id: location for location in self.storage_locations}
+        location = locations.get(journal_task.location_id)
+        name = f"{task_type}: {source_file} to {target_file}"
+        logger.debug(f"Repository.resume_task {name}")
+
+        # Tasks done before PyDive stopped
+        done = False
+        if task_type == "remove":
+            done = not os.path.exists(source_file)
+        elif task_type in ("change_trip", "change_trip_folder"):
+            done = os.path.exists(target_file) and not os.path.exists(source_file)
+        if done:
+            logger.info(f"Repository.resume_task: already done {name}")
+            process_group.add_completed_task(
+                task_type, picture_group, picture, location, name
+            )
+            return
+
+        # Tasks which can't run anymore
+        error = None
+        if task_type == "change_trip_folder":
+            if not location or not os.path.isdir(source_file):
+                error = _("Source folder does not exist")
+        elif not picture:
+            error = _("Source file does not exists")
+        elif task_type in ("copy", "generate") and not location:
+            error = _("Target location does not exist")
+        if error:
+            logger.warning(f"Repository.resume_task: {error} for {name}")
+            process_group.add_completed_task(
+                task_type,
+                picture_group,
+                picture,
+                location,
+                name,
+                error,
+                f"{error}: {source_file}",
+            )
+            return
+
+        if task_type == "copy":
+            categories = {category.id: category for category in self.categories}
+            # The temporary file of the interrupted copy
+            temporary_file = FileCopier(source_file, target_file).temporary_path()
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            process = process_group.add_process(
+                "copy",
+                picture_group=picture_group,
+                picture=picture,
+                target_location=location,
+                target_category=categories.get(journal_task.category_id),
+                verify=journal_task.verify,
+                fingerprints=self.fingerprints,
+            )
+            process.signals.taskFinished.connect(self.add_picture)
+        elif task_type == "generate":
+            conversion_method = self.database.conversionmethods_get_by_id(
+                journal_task.conversion_method_id
+            )
+            if (
+                os.path.exists(target_file)
+                and os.stat(target_file).st_mtime_ns >= journal_group.created
+            ):
+                logger.info(f"Repository.resume_task: incomplete output {target_file}")
+                os.remove(target_file)
+            process = process_group.add_process(
+                "generate",
+                picture_group=picture_group,
+                picture=picture,
+                target_location=location,
+                conversion_method=conversion_method,
+                conversion_cache=self.conversion_cache,
+            )
+            process.signals.taskFinished.connect(self.add_picture)
+        elif task_type == "remove":
+            process = process_group.add_process(
+                "remove", picture_group=picture_group, picture=picture
+            )
+            process.signals.taskFinished.connect(self.remove_picture)
+        elif task_type == "change_trip":
+            target_trip = journal_task.target_trip
+            target_picture_group = self.picture_group_get(
+                target_trip, picture_group.name
+            )
+            if not target_picture_group:
+                target_picture_group = PictureGroup(picture_group.name)
+                target_picture_group.trip = target_trip
+                self.add_picture_group(target_picture_group)
+            process = process_group.add_process(
+                "change_trip",
+                picture_group=picture_group,
+                picture=picture,
+                target_trip=target_trip,
+            )
+            target_picture_group.add_process(process)
+            process.signals.taskFinished.connect(
+                lambda source_picture_group, _b, path, picture=picture, target_picture_group=target_picture_group: self.change_trip_pictures_finished(
+                    source_picture_group, picture, path, target_picture_group
+                )
+            )
+        elif task_type == "change_trip_folder":
+            source_trip, target_trip = (
+                journal_task.source_trip,
+                journal_task.target_trip,
+            )
+            process = process_group.add_process(
+                "change_trip_folder",
+                picture_group=None,
+                target_location=location,
+                target_trip=target_trip,
+                source_trip=source_trip,
+            )
+            for source_picture_group in self.trips.get(source_trip, {}).values():
+                if location.name in source_picture_group.locations:
+                    source_picture_group.add_process(process)
+            process.signals.taskFinished.connect(
+                lambda _a, location, path, source_folder=source_file: self.change_trip_folder_finished(
+                    location, source_trip, target_trip, source_folder, path
+                )
+            )
+
+    def picture_group_get(self, trip, name):
+        """Returns a picture group based on its trip & name
+
+        Parameters
+        ----------
+        trip : str
+            The trip of the picture group
+        name : str
+            The name of the picture group
+
+        Returns
+        ----------
+        picture_group : PictureGroup
+            The matching picture group, None if it doesn't exist
+        """
+        return self.picture_group_index.groups.get(trip, {}).get(name)
+
+    @property
+    def trips(self):
+        """Returns all trips & their picture groups
+
+        This is maintained as picture groups are added, renamed or deleted, so it should not be modified directly
 
         Returns
         ----------
         trips : dict trip:picture_group.name:PictureGroup
             A dict representing all existing trips
         """
-        if attr == "trips":
-            trips = {}
-            for picture_group in self.picture_groups:
-                if picture_group.trip not in trips:
-                    trips[picture_group.trip] = {}
-                trips[picture_group.trip][picture_group.name] = picture_group
-            return trips
+        return self.picture_group_index.groups
 
 
 class ProcessGroup(QtCore.QObject):
     """A group of process that share common attributes
 
+    Attributes
+    ----------
+    finished : pyqtSignal
+        Emitted once all tasks are stopped
+    progressUpdate : pyqtSignal
+        Emitted when the progress changes
+    taskStopped : pyqtSignal
+        Emitted with the task, when a task is done or in error
+    taskMeasured : pyqtSignal
+        Emitted with the task, once the resources it used are known
+    label : str
+        The name of the task to display
+    priority : str
+        The priority class of the tasks (see ProcessScheduler.priorities)
+    progress : float
+        The share of tasks completed (between 0 and 1)
+    is_finished : bool
+        Whether the finished signal has been emitted
+    tasks : models.repository_tasks.TaskTable
+        The tasks of the group (each task behaves like a dict)
+
     Methods
     -------
-    __init__ (label)
+    __init__ (label, priority)
         Stores basic information about the task group
-    add_process (process, picture_group, picture, target_location, conversion_method, target_trip, target_category)
+    add_process (process, picture_group, picture, target_location, conversion_method, target_trip, target_category, verify, source_trip, conversion_cache, fingerprints)
         Adds a new task to the group
+    add_completed_task (task_type, picture_group, picture, target_location, name, error, error_details)
+        Adds a task that doesn't need to run (already done, or in error)
     task_done (task, path)
         Marks a single task as in done & stopped. Triggers self.update_progress
+    task_skipped (task)
+        Marks a single task as skipped & stopped (it had nothing to do). Triggers self.update_progress
     task_error (task, picture_group, location, error)
         Marks a single task as in error & stopped. Triggers self.update_progress
+    task_output (task, stream, text)
+        Stores the output of a running task
+    task_progress (task, bytes_done, bytes_total, throughput)
+        Stores the progress of a running copy. Triggers self.update_progress
+    task_usage (task, usage)
+        Stores the resources used by a task. Emits taskMeasured
+    cancel_tasks
+        Cancels all the pending and running tasks
     run
         Starts all processes
     update_progress
@@ -692,20 +1580,26 @@ class ProcessGroup(QtCore.QObject):
 
     finished = QtCore.pyqtSignal()
     progressUpdate = QtCore.pyqtSignal()
+    taskStopped = QtCore.pyqtSignal(object)
+    taskMeasured = QtCore.pyqtSignal(object)
 
-    def __init__(self, label):
+    def __init__(self, label, priority="normal"):
         """Stores basic information about the task group
 
         Parameters
         ----------
         label : str
             The name of the task to display
+        priority : str
+            The priority class of the tasks (see ProcessScheduler.priorities)
         """
-        logger.info(f"ProcessGroup.init {label}")
+        logger.info(f"ProcessGroup.init {label} ({priority})")
         super().__init__()
         self.progress = 0
-        self.tasks = []
+        self.is_finished = False
+        self.tasks = TaskTable()
         self.label = label
+        self.priority = priority
 
     def add_process(
         self,
@@ -716,25 +1610,37 @@ class ProcessGroup(QtCore.QObject):
         conversion_method=None,
         target_trip=None,
         target_category=None,
+        verify=False,
+        source_trip=None,
+        conversion_cache=None,
+        fingerprints=None,
     ):
         """Adds a new task to the group
 
         Parameters
         ----------
-        task_type : either "copy", "generate", "remove" or "change_trip"
+        task_type : either "copy", "generate", "remove", "change_trip" or "change_trip_folder"
             The type of process to add
         picture_group : models.picture_group.PictureGroup
-            The picture group to modify
+            The picture group to modify (None for "change_trip_folder")
         picture : models.picture.Picture
             The picture to handle (if none, will take all)
         target_location : models.storage_location.StorageLocation
-            [Copy or Generate] In which location to copy or generate the picture
+            [Copy, Generate or Change trip folder] In which location to copy or generate the picture (or rename the trip)
         conversion_method :
             [Generate] The conversion method to use
         target_trip : str
             [Change trip] The conversion method to use
         target_category : models.category.Category
             [Copy] In which category to copy the image
+        verify : bool
+            [Copy] Whether to check the copy against the source picture
+        source_trip : str
+            [Change trip folder] The trip to rename
+        conversion_cache : models.repository_cache.ConversionCache
+            [Generate] The cache of converted pictures
+        fingerprints : models.repository_fingerprints.FingerprintIndex
+            [Copy] The content hash of files, to skip copies made before (see CopyProcess)
         """
         logger.info(
             f"ProcessGroup.add_task {self.label} - {task_type} for {picture_group}"
@@ -743,53 +1649,134 @@ class ProcessGroup(QtCore.QObject):
         # Create the background processes
         if task_type == "copy":
             process = CopyProcess(
-                picture_group, picture, target_location, target_category
+                picture_group,
+                picture,
+                target_location,
+                target_category,
+                verify,
+                fingerprints,
             )
         elif task_type == "generate":
             process = GenerateProcess(
-                target_location, picture_group, picture, conversion_method
+                target_location,
+                picture_group,
+                picture,
+                conversion_method,
+                conversion_cache,
             )
         elif task_type == "remove":
             process = RemoveProcess(picture_group, picture)
         elif task_type == "change_trip":
             process = ChangeTripProcess(picture_group, picture, target_trip)
+        elif task_type == "change_trip_folder":
+            process = ChangeTripFolderProcess(target_location, source_trip, target_trip)
 
         # Create the task scaffold
-        task = {
-            "status": "Queued",
-            "type": task_type,
-            "name": str(process),
-            "picture_group": picture_group,
-            "picture": picture,
-            "target_location": target_location,
-            "conversion_method": conversion_method,
-            "target_trip": target_trip,
-            "process": process,
-        }
-        self.tasks.append(task)
-        picture_group.add_process(process)
+        task = self.tasks.append(
+            status="Queued",
+            type=task_type,
+            name=str(process),
+            picture_group=picture_group,
+            picture=picture,
+            target_location=target_location,
+            conversion_method=conversion_method,
+            target_trip=target_trip,
+            process=process,
+            output="",
+        )
+        if picture_group:
+            picture_group.add_process(process)
         process.signals.taskFinished.connect(
             lambda _a, _b, path: self.task_done(task, path)
         )
         process.signals.taskError.connect(
             lambda error, details: self.task_error(task, error, details)
         )
+        process.signals.taskSkipped.connect(lambda: self.task_skipped(task))
+        process.signals.taskOutput.connect(
+            lambda stream, text: self.task_output(task, stream, text)
+        )
+        process.signals.taskProgress.connect(
+            lambda done, total, throughput: self.task_progress(
+                task, done, total, throughput
+            )
+        )
+        process.signals.taskUsage.connect(lambda usage: self.task_usage(task, usage))
 
         return process
 
+    def add_completed_task(
+        self,
+        task_type,
+        picture_group,
+        picture,
+        target_location,
+        name,
+        error=None,
+        error_details=None,
+    ):
+        """Adds a task that doesn't need to run (already done, or in error)
+
+        Parameters
+        ----------
+        task_type : either "copy", "generate", "remove", "change_trip" or "change_trip_folder"
+            The type of task
+        picture_group : models.picture_group.PictureGroup
+            The picture group concerned
+        picture : models.picture.Picture
+            The picture concerned
+        target_location : models.storage_location.StorageLocation
+            [Copy or Generate] The location of the target picture
+        name : str
+            The name of the task
+        error : str
+            The error message (if the task is in error)
+        error_details : str
+            The detailed error message (if the task is in error)
+        """
+        logger.info(f"ProcessGroup.add_completed_task {self.label} - {name}")
+        task = self.tasks.append(
+            status="Stopped",
+            type=task_type,
+            name=name,
+            picture_group=picture_group,
+            picture=picture,
+            target_location=target_location,
+            output="",
+            skipped=True,
+        )
+        if error:
+            task["error"] = error
+            task["error_details"] = error_details
+
     def task_done(self, task, path):
         """Marks a single task as in done & stopped. Triggers self.update_progress
 
         Parameters
         ----------
-        task : *Process
-            The task in error
+        task : models.repository_tasks.Task
+            The task done
         path : str
             The path of the newly created image
         """
         logger.debug(f"ProcessGroup.task_done {self.label} - {task['name']}")
         task["status"] = "Stopped"
         task["file_path"] = path
+        self.taskStopped.emit(task)
+        self.update_progress()
+
+    def task_skipped(self, task):
+        """Marks a single task as skipped & stopped (it had nothing to do). Triggers self.update_progress
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The task skipped
+        """
+        logger.debug(f"ProcessGroup.task_skipped {self.label} - {task['name']}")
+        task["status"] = "Stopped"
+        task["skipped"] = True
+        self.taskStopped.emit(task)
         self.update_progress()
 
     def task_error(self, task, error, error_details):
@@ -797,7 +1784,7 @@ class ProcessGroup(QtCore.QObject):
 
         Parameters
         ----------
-        task : *Process
+        task : models.repository_tasks.Task
             The task in error
         error : str
             The error message
@@ -806,34 +1793,112 @@ class ProcessGroup(QtCore.QObject):
         task["status"] = "Stopped"
         task["error"] = error
         task["error_details"] = error_details
+        self.taskStopped.emit(task)
         self.update_progress()
 
+    def task_output(self, task, stream, text):
+        """Stores the output of a running task
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The task writing the output
+        stream : str
+            The stream written to ("stdout" or "stderr")
+        text : str
+            The text written
+        """
+        logger.debug(f"ProcessGroup.task_output {self.label} - {task['name']}: {text}")
+        task["output"] += text
+
+    def task_progress(self, task, bytes_done, bytes_total, throughput):
+        """Stores the progress of a running copy. Triggers self.update_progress
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The running task
+        bytes_done : int
+            The number of bytes copied so far
+        bytes_total : int
+            The size of the file to copy
+        throughput : float
+            The average copy speed, in bytes per second
+        """
+        task["bytes_done"] = bytes_done
+        task["bytes_total"] = bytes_total
+        task["throughput"] = throughput
+        self.update_progress()
+
+    def task_usage(self, task, usage):
+        """Stores the resources used by a task. Emits taskMeasured
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The measured task
+        usage : dict
+            The resources used (see models.repository_resources.ResourceUsage.values)
+        """
+        task["usage"] = usage
+        self.taskMeasured.emit(task)
+
     def cancel_tasks(self):
-        """Cancels all the pending tasks"""
+        """Cancels all the pending and running tasks"""
         logger.debug(f"ProcessGroup.cancel_tasks {self.label}")
         for task in self.tasks:
-            task["process"].cancel()
+            if task["process"]:
+                task["process"].cancel()
 
     def run(self):
-        """Starts all processes"""
+        """Starts all processes
+
+        Each process waits only for the ones using the same resource (see ProcessScheduler)
+        Conversions using a batch conversion method are grouped (see GenerateBatchProcess)
+        If no task needs to run, the finished signal is emitted once the event loop runs
+        (this way, it can be connected after the call)
+        """
+        scheduler = ProcessScheduler.global_instance()
+        batch_processes = []
         for task in self.tasks:
-            if task["status"] == "Queued":
-                QtCore.QThreadPool.globalInstance().start(task["process"], 100)
+            if task["status"] != "Queued":
+                continue
+            if task["type"] == "generate" and task["conversion_method"].batch:
+                batch_processes.append(task["process"])
+                continue
+            scheduler.start(
+                task["process"],
+                task["type"],
+                task["conversion_method"],
+                self.priority,
+            )
+        for batch in GenerateBatchProcess.split(batch_processes):
+            scheduler.start(batch, "generate", batch.method, self.priority)
+        if self.tasks and self.count_completed == len(self.tasks):
+            QtCore.QTimer.singleShot(0, self.update_progress)
 
     def update_progress(self):
-        """Updates the progress. Emits finished signal once complete."""
+        """Updates the progress. Emits finished signal once complete.
+
+        Running copies count for the share of bytes already copied
+        The counters of the task table are used, so this doesn't depend on the number of tasks
+        The finished signal is emitted only once, even if late progress signals arrive afterwards
+        """
         logger.debug(f"ProcessGroup.update_progress {self.label}")
-        progress = self.count_completed / len(self.tasks)
+        if not self.tasks:
+            return
+        progress = (self.count_completed + self.tasks.running_total) / len(self.tasks)
         if progress != self.progress:
             self.progress = progress
             self.progressUpdate.emit()
-        if self.count_completed == len(self.tasks):
+        if self.count_completed == len(self.tasks) and not self.is_finished:
             logger.info(f"ProcessGroup finished {self.label}")
+            self.is_finished = True
             self.finished.emit()
 
     @property
     def count_completed(self):
-        return len([t for t in self.tasks if t["status"] == "Stopped"])
+        return self.tasks.completed
 
     @property
     def count_total(self):
@@ -841,7 +1906,11 @@ class ProcessGroup(QtCore.QObject):
 
     @property
     def count_errors(self):
-        return len([t for t in self.tasks if "error" in t])
+        return self.tasks.error_count
+
+    @property
+    def error_details(self):
+        return self.tasks.error_details
 
     def __repr__(self):
         return f"{self.label} ({len(self.tasks)} tasks)"
@@ -0,0 +1,250 @@
+"""Keeps the result of conversions, so that converting the same picture again is instant
+
+Classes
+----------
+ConversionCache
+    Stores converted pictures, based on their source's contents & the conversion used
+"""
+
+import hashlib
+import logging
+import os
+import shlex
+import shutil
+import threading
+
+from .repository_copier import FileCopier
+from .repository_fingerprints import FingerprintIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionCache:
+    """Stores converted pictures, based on their source's contents & the conversion used
+
+    Each converted picture is stored as a file, named after its key. The key is a hash of:
+    - the contents of the source picture (so that renamed or copied pictures still match)
+    - the command template of the conversion method (with normalized spaces)
+    - the converter's version (the path, size & modification time of its executable)
+
+    The hash of the source picture comes from the fingerprint index when available (see FingerprintIndex)
+    This way, pictures are not hashed again if they were already (for example, when copied)
+
+    Pictures are taken from the cache by reflink (or copy), never by hard link:
+    modifying a converted picture must not modify the cache
+
+    Once the cache exceeds max_size, the least recently used pictures are removed
+
+    Attributes
+    ----------
+    max_size : int
+        The maximum size of the cache, in bytes
+    extension : str
+        The extension of the files stored
+    folder : str
+        The folder in which converted pictures are stored
+    fingerprints : models.repository_fingerprints.FingerprintIndex
+        The fingerprint index used to get the hash of source pictures (set by Repository)
+    lock : threading.Lock
+        Prevents parallel evictions (conversions run in several threads)
+
+    Methods
+    -------
+    __init__ (folder, max_size)
+        Stores the cache's location & size
+    key (source_file, command)
+        Returns the cache key of a conversion
+    normalize_command (command)
+        Returns the command template, with normalized spaces
+    converter_version (command)
+        Returns an identifier of the converter's version
+    path (key)
+        Returns the path of a cached picture
+    fetch (key, target_file)
+        Creates target_file from the cache, if the conversion is in it
+    store (key, target_file)
+        Adds a converted picture to the cache, then removes the least recently used ones
+    evict
+        Removes the least recently used pictures, until the cache fits in max_size
+    """
+
+    max_size = 2 * 2**30
+    extension = ".jpg"
+
+    def __init__(self, folder, max_size=None):
+        """Stores the cache's location & size
+
+        Parameters
+        ----------
+        folder : str
+            The folder in which converted pictures are stored (created when needed)
+        max_size : int
+            The maximum size of the cache, in bytes
+        """
+        self.folder = folder
+        if max_size is not None:
+            self.max_size = max_size
+        self.fingerprints = None
+        self.lock = threading.Lock()
+
+    def key(self, source_file, command):
+        """Returns the cache key of a conversion
+
+        Parameters
+        ----------
+        source_file : str
+            The path of the picture to convert
+        command : str
+            The command template of the conversion method (see ConversionMethod.command)
+
+        Returns
+        ----------
+        key : str
+            The cache key (hexadecimal)
+        """
+        # Called by background processes: the database is not read (see FingerprintIndex.preload)
+        if self.fingerprints:
+            source_digest = self.fingerprints.digest(source_file, read_database=False)
+        else:
+            source_digest = FingerprintIndex.hash_file(source_file)
+        key = hashlib.new(FingerprintIndex.algorithm)
+        for part in [
+            source_digest,
+            self.normalize_command(command),
+            self.converter_version(command),
+        ]:
+            key.update(part.encode() + b"\0")
+        return key.hexdigest()
+
+    def normalize_command(self, command):
+        """Returns the command template, with normalized spaces
+
+        Parameters
+        ----------
+        command : str
+            The command template of the conversion method
+
+        Returns
+        ----------
+        command : str
+            The normalized command template
+        """
+        try:
+            return shlex.join(shlex.split(command))
+        except ValueError:
+            return " ".join(command.split())
+
+    def converter_version(self, command):
+        """Returns an identifier of the converter's version
+
+        Converters are not run to get their version (this is slow for some of them)
+        Their executable's size & modification time change when they're updated
+
+        Parameters
+        ----------
+        command : str
+            The command template of the conversion method
+
+        Returns
+        ----------
+        version : str
+            The identifier (empty if the converter can't be found)
+        """
+        try:
+            program = shlex.split(command)[0]
+        except (ValueError, IndexError):
+            return ""
+        executable = shutil.which(program)
+        if not executable:
+            return ""
+        executable = os.path.realpath(executable)
+        executable_stat = os.stat(executable)
+        return f"{executable}:{executable_stat.st_size}:{executable_stat.st_mtime_ns}"
+
+    def path(self, key):
+        """Returns the path of a cached picture
+
+        Parameters
+        ----------
+        key : str
+            The cache key
+
+        Returns
+        ----------
+        path : str
+            The path of the cached picture (it may not exist)
+        """
+        return os.path.join(self.folder, key + self.extension)
+
+    def fetch(self, key, target_file):
+        """Creates target_file from the cache, if the conversion is in it
+
+        Parameters
+        ----------
+        key : str
+            The cache key
+        target_file : str
+            The path of the picture to create
+
+        Returns
+        ----------
+        found : bool
+            True if target_file has been created from the cache
+        """
+        cached_file = self.path(key)
+        if not os.path.exists(cached_file):
+            return False
+        try:
+            copier = FileCopier(cached_file, target_file)
+            copier.same_device_methods = ["reflink"]
+            copier.copy()
+            os.utime(cached_file)  # Marks it as recently used
+        except OSError as e:
+            logger.warning(f"ConversionCache.fetch failed for {target_file}: {e}")
+            return False
+        logger.info(f"ConversionCache.fetch {target_file} from {key}")
+        return True
+
+    def store(self, key, target_file):
+        """Adds a converted picture to the cache, then removes the least recently used ones
+
+        Errors are logged but not raised: the conversion itself succeeded
+
+        Parameters
+        ----------
+        key : str
+            The cache key
+        target_file : str
+            The path of the converted picture
+        """
+        logger.debug(f"ConversionCache.store {target_file} as {key}")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            copier = FileCopier(target_file, self.path(key))
+            copier.same_device_methods = ["reflink"]
+            copier.copy()
+            self.evict()
+        except OSError as e:
+            logger.warning(f"ConversionCache.store failed for {target_file}: {e}")
+
+    def evict(self):
+        """Removes the least recently used pictures, until the cache fits in max_size"""
+        with self.lock:
+            entries = []
+            with os.scandir(self.folder) as folder:
+                for entry in folder:
+                    if entry.name.endswith(self.extension) and entry.is_file():
+                        entry_stat = entry.stat()
+                        entries.append(
+                            (entry_stat.st_mtime_ns, entry_stat.st_size, entry.path)
+                        )
+            total_size = sum(size for _mtime, size, _path in entries)
+            for _mtime, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                logger.info(f"ConversionCache.evict {path}")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
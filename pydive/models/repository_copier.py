@@ -0,0 +1,396 @@
+"""Copies files chunk by chunk, so that large copies report progress & can be cancelled
+
+Classes
+----------
+FileCopier
+    Copies a file through a temporary file, reporting progress after each chunk
+CopyCancelled
+    The copy has been cancelled
+CopyVerificationError
+    The copy doesn't match the source file
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from .repository_fingerprints import FingerprintIndex
+
+logger = logging.getLogger(__name__)
+
+
+class CopyCancelled(Exception):
+    """The copy has been cancelled"""
+
+
+class CopyVerificationError(OSError):
+    """The copy doesn't match the source file"""
+
+
+class FileCopier:
+    """Copies a file through a temporary file, reporting progress after each chunk
+
+    The data is copied by the kernel when possible (copy_file_range, then sendfile)
+    Otherwise, it is read and written in chunks
+    The target file appears only once complete, through an atomic rename
+
+    Verified copies hash the data while it goes through, then read the copy back from the disk
+    The copy is kept only if both hashes match
+    Other copies can hash the data as well (see hash_data), so that their fingerprint is known
+
+    If the source & target are on the same filesystem, the data is not copied (see same_device_methods)
+    By default, only reflinks are tried: the copy stays an independent file
+    Hard links are only used when enabled for the copy (see CopyProcess)
+
+    Attributes
+    ----------
+    chunk_size : int
+        The number of bytes copied between 2 progress reports
+    temporary_suffix : str
+        The suffix of the temporary file (ignored when reading folders)
+    unsupported_errors : tuple of int
+        The errors meaning a kernel-side copy is not possible for these files
+    same_device_methods : list of str
+        What to try, in that order, when source & target are on the same filesystem
+        "reflink" creates an independent copy sharing the data blocks (on Btrfs, XFS, ...)
+        "hardlink" makes both paths point to the same file (changing one changes the other)
+        If empty or if none work, the data is copied
+    FICLONE : int
+        The ioctl request to create a reflink (on Linux)
+    source_file : str
+        The path of the file to copy
+    target_file : str
+        The path of the copy
+    verify : bool
+        Whether to check the copy against the source file (the data is then always copied)
+    hash_data : bool
+        Whether to hash the data while it is copied (see digest), even if the copy isn't verified
+    method : str
+        How the copy has been made: "reflink", "hardlink" or "copy" (None until the copy starts)
+    digest : str
+        The hash of the file contents (see FingerprintIndex), if the data was hashed during the copy
+    source_stat : os.stat_result
+        The stat of the source file, when the copy started
+    target_stat : os.stat_result
+        The stat of the copy, once complete
+    bytes_total : int
+        The size of the source file (None until the copy starts)
+    bytes_done : int
+        The number of bytes copied so far
+    cancelled : bool
+        Whether the copy has been cancelled
+    start_time : float
+        When the copy started (based on time.monotonic)
+
+    Methods
+    -------
+    __init__ (source_file, target_file, verify)
+        Stores the paths of the copy
+    copy (on_progress)
+        Copies the file, calling on_progress after each chunk
+    temporary_path
+        Returns the path of the temporary file used during the copy
+    link
+        Copies the file without copying its data, if source & target are on the same filesystem
+    reflink
+        Creates the copy as a reflink of the source file
+    chunks (source, target, source_hash)
+        Copies the data, chunk by chunk, using the fastest available method
+    written_digest (target)
+        Returns the hash of the data written, as read back from the disk
+    cancel
+        Cancels the copy (it stops after the current chunk)
+    throughput
+        Returns the average copy speed, in bytes per second
+    """
+
+    chunk_size = 8 * 2**20
+    temporary_suffix = ".part"
+    unsupported_errors = (
+        errno.EXDEV,
+        errno.ENOSYS,
+        errno.EINVAL,
+        errno.ENOTSUP,
+        errno.EOPNOTSUPP,
+        errno.EBADF,
+        errno.ETXTBSY,
+    )
+    same_device_methods = ["reflink"]
+    FICLONE = 0x40049409
+
+    def __init__(self, source_file, target_file, verify=False):
+        """Stores the paths of the copy
+
+        Parameters
+        ----------
+        source_file : str
+            The path of the file to copy
+        target_file : str
+            The path of the copy
+        verify : bool
+            Whether to check the copy against the source file
+        """
+        self.source_file = source_file
+        self.target_file = target_file
+        self.verify = verify
+        self.hash_data = False
+        self.method = None
+        self.digest = None
+        self.source_stat = None
+        self.target_stat = None
+        self.bytes_total = None
+        self.bytes_done = 0
+        self.cancelled = False
+        self.start_time = None
+
+    def copy(self, on_progress=None):
+        """Copies the file, calling on_progress after each chunk
+
+        Metadata (permissions, modification time) is copied as well, like shutil.copy2
+
+        Parameters
+        ----------
+        on_progress : callable
+            Called with (bytes_done, bytes_total) when the copy starts & after each chunk
+
+        Raises
+        ----------
+        CopyCancelled
+            If the copy has been cancelled (the temporary file is then deleted)
+        CopyVerificationError
+            [Verified copies] If the copy doesn't match the source (the temporary file is then deleted)
+        OSError
+            If the copy failed (the temporary file is then deleted)
+        """
+        logger.debug(f"FileCopier.copy {self.source_file} to {self.target_file}")
+        if self.cancelled:
+            raise CopyCancelled()
+        self.start_time = time.monotonic()
+        self.bytes_done = 0
+
+        if not self.verify:
+            self.method = self.link()
+            if self.method:
+                self.source_stat = os.stat(self.source_file)
+                self.target_stat = os.stat(self.target_file)
+                self.bytes_total = self.bytes_done = self.source_stat.st_size
+                if on_progress:
+                    on_progress(self.bytes_done, self.bytes_total)
+                logger.debug(f"FileCopier.copy done {self.target_file} ({self.method})")
+                return
+        self.method = "copy"
+
+        temporary_file = self.temporary_path()
+        source_hash = None
+        if self.verify or self.hash_data:
+            source_hash = hashlib.new(FingerprintIndex.algorithm)
+        try:
+            with open(self.source_file, "rb") as source, open(
+                temporary_file, "w+b"
+            ) as target:
+                self.source_stat = os.fstat(source.fileno())
+                self.bytes_total = self.source_stat.st_size
+                if on_progress:
+                    on_progress(self.bytes_done, self.bytes_total)
+                for chunk in self.chunks(source, target, source_hash):
+                    self.bytes_done += chunk
+                    if on_progress:
+                        on_progress(self.bytes_done, self.bytes_total)
+                    if self.cancelled:
+                        raise CopyCancelled()
+                if self.verify:
+                    written_digest = self.written_digest(target)
+                    if written_digest != source_hash.hexdigest():
+                        raise CopyVerificationError(
+                            errno.EIO,
+                            f"Copy verification failed for {self.target_file}",
+                        )
+                if source_hash:
+                    self.digest = source_hash.hexdigest()
+            shutil.copystat(self.source_file, temporary_file)
+            os.replace(temporary_file, self.target_file)
+            self.target_stat = os.stat(self.target_file)
+        except BaseException:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+        logger.debug(
+            f"FileCopier.copy done {self.target_file}: {self.bytes_done} bytes at {self.throughput():.0f} B/s"
+        )
+
+    def temporary_path(self):
+        """Returns the path of the temporary file used during the copy
+
+        Returns
+        ----------
+        temporary_file : str
+            The path of the temporary file (hidden, next to the target)
+        """
+        target_folder, target_name = os.path.split(self.target_file)
+        return os.path.join(target_folder, "." + target_name + self.temporary_suffix)
+
+    def link(self):
+        """Copies the file without copying its data, if source & target are on the same filesystem
+
+        Methods are tried in the order of same_device_methods
+
+        Returns
+        ----------
+        method : str
+            The method used ("reflink" or "hardlink"), None if the data must be copied
+        """
+        try:
+            source_device = os.stat(self.source_file).st_dev
+            target_device = os.stat(os.path.dirname(self.target_file)).st_dev
+        except OSError:
+            return None
+        if source_device != target_device:
+            return None
+
+        for method in self.same_device_methods:
+            try:
+                if method == "reflink" and fcntl:
+                    self.reflink()
+                elif method == "hardlink":
+                    os.link(self.source_file, self.target_file)
+                else:
+                    continue
+                return method
+            except OSError as e:
+                # Not supported for these files: use the next method
+                if e.errno not in self.unsupported_errors + (
+                    errno.ENOTTY,
+                    errno.EPERM,
+                    errno.EMLINK,
+                ):
+                    raise
+                logger.debug(f"FileCopier.link: {method} not supported ({e})")
+        return None
+
+    def reflink(self):
+        """Creates the copy as a reflink of the source file
+
+        Raises
+        ----------
+        OSError
+            If the filesystem doesn't support reflinks (the temporary file is then deleted)
+        """
+        temporary_file = self.temporary_path()
+        try:
+            with open(self.source_file, "rb") as source, open(
+                temporary_file, "wb"
+            ) as target:
+                fcntl.ioctl(target.fileno(), self.FICLONE, source.fileno())
+            shutil.copystat(self.source_file, temporary_file)
+            os.replace(temporary_file, self.target_file)
+        except BaseException:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+
+    def chunks(self, source, target, source_hash=None):
+        """Copies the data, chunk by chunk, using the fastest available method
+
+        Parameters
+        ----------
+        source : file object
+            The file to copy, opened for reading
+        target : file object
+            The file to write, opened for writing
+        source_hash : hashlib hash object
+            If provided, it's updated with the data copied (this requires a copy through Python)
+
+        Returns
+        ----------
+        chunks : generator of int
+            The number of bytes copied for each chunk
+        """
+        source_fd, target_fd = source.fileno(), target.fileno()
+        offset = 0
+        # Kernel-side copies: the data never goes through Python
+        for method in ["copy_file_range", "sendfile"]:
+            if source_hash or not hasattr(os, method):
+                continue
+            try:
+                while True:
+                    if method == "copy_file_range":
+                        copied = os.copy_file_range(
+                            source_fd, target_fd, self.chunk_size
+                        )
+                    else:
+                        copied = os.sendfile(
+                            target_fd, source_fd, offset, self.chunk_size
+                        )
+                    if copied == 0:
+                        return
+                    offset += copied
+                    yield copied
+            except OSError as e:
+                # Not supported for these files: use the next method
+                if offset > 0 or e.errno not in self.unsupported_errors:
+                    raise
+                logger.debug(f"FileCopier.chunks: {method} not supported ({e})")
+
+        # Fallback: copy through Python
+        while True:
+            data = source.read(self.chunk_size)
+            if not data:
+                return
+            if source_hash:
+                source_hash.update(data)
+            target.write(data)
+            yield len(data)
+
+    def written_digest(self, target):
+        """Returns the hash of the data written, as read back from the disk
+
+        The data is flushed to the disk, then removed from the cache (when possible)
+        This way, it's actually read from the disk
+
+        Parameters
+        ----------
+        target : file object
+            The file written, opened for reading & writing
+
+        Returns
+        ----------
+        digest : str
+            The hash of the data read back (see FingerprintIndex)
+        """
+        target.flush()
+        os.fsync(target.fileno())
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(target.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        target.seek(0)
+        target_hash = hashlib.new(FingerprintIndex.algorithm)
+        while data := target.read(self.chunk_size):
+            if self.cancelled:
+                raise CopyCancelled()
+            target_hash.update(data)
+        return target_hash.hexdigest()
+
+    def cancel(self):
+        """Cancels the copy (it stops after the current chunk)"""
+        logger.info(f"FileCopier.cancel {self.target_file}")
+        self.cancelled = True
+
+    def throughput(self):
+        """Returns the average copy speed, in bytes per second
+
+        Returns
+        ----------
+        throughput : float
+            The average number of bytes copied per second (0 if the copy didn't start)
+        """
+        if self.start_time is None:
+            return 0
+        duration = time.monotonic() - self.start_time
+        return self.bytes_done / duration if duration > 0 else 0
@@ -0,0 +1,206 @@
+"""Runs conversion commands, with a timeout & the possibility to stop them
+
+Classes
+----------
+ConversionExecutor
+    Runs a conversion command in its own process group & streams its output
+"""
+
+import codecs
+import logging
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+
+from .repository_resources import ResourceMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionExecutor:
+    """Runs a conversion command in its own process group & streams its output
+
+    The command runs in a new session, so that killing it also kills all its subprocesses
+    (converters are often wrapper scripts starting other programs)
+
+    Attributes
+    ----------
+    default_timeout : int
+        The timeout used when none is provided (in seconds)
+    poll_interval : float
+        How often the timeout & kill requests are checked (in seconds)
+    memory_interval : float
+        How often the memory used by the command is measured (in seconds)
+    command : str
+        The command to run
+    timeout : int
+        The maximum duration of the command (in seconds)
+    process : subprocess.Popen
+        The running process (None until the command starts)
+    returncode : int
+        The exit code of the command (None until it finishes)
+    killed : bool
+        Whether the command has been killed (on request or after the timeout)
+    timed_out : bool
+        Whether the command has been killed because of the timeout
+    output : dict of form stream: str
+        The output of the command, for stream "stdout" and "stderr"
+    memory : int
+        The memory used by the command & its subprocesses, when last measured (in bytes)
+    peak_memory : int
+        The highest memory measured while the command ran (in bytes)
+    rusage : resource.struct_rusage
+        The resources used by the command & the subprocesses it waited for (None until it finishes)
+
+    Methods
+    -------
+    __init__ (command, timeout)
+        Stores the command to run
+    run (on_output)
+        Runs the command, until it finishes, is killed or times out
+    reap
+        Collects the exit status of the command, if it finished
+    measure_memory
+        Measures the memory used by the command & its subprocesses
+    kill
+        Kills the command & all its subprocesses
+    """
+
+    default_timeout = 3600
+    poll_interval = 0.1
+    memory_interval = 0.5
+
+    def __init__(self, command, timeout=None):
+        """Stores the command to run
+
+        Parameters
+        ----------
+        command : str
+            The command to run (through the shell)
+        timeout : int
+            The maximum duration of the command (in seconds)
+        """
+        self.command = command
+        self.timeout = timeout or self.default_timeout
+        self.process = None
+        self.returncode = None
+        self.killed = False
+        self.timed_out = False
+        self.output = {"stdout": "", "stderr": ""}
+        self.memory = 0
+        self.peak_memory = 0
+        self.rusage = None
+        self.lock = threading.Lock()
+
+    def run(self, on_output=None):
+        """Runs the command, until it finishes, is killed or times out
+
+        Parameters
+        ----------
+        on_output : callable
+            Called with (stream, text) each time the command writes something
+
+        Returns
+        ----------
+        returncode : int
+            The exit code of the command (negative if killed)
+        """
+        logger.debug(f"ConversionExecutor.run {self.command}")
+        with self.lock:
+            if self.killed:
+                return None
+            self.process = subprocess.Popen(
+                self.command,
+                shell=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+        deadline = time.monotonic() + self.timeout
+        next_measure = time.monotonic()
+
+        with selectors.DefaultSelector() as selector:
+            for stream in ["stdout", "stderr"]:
+                selector.register(
+                    getattr(self.process, stream),
+                    selectors.EVENT_READ,
+                    (stream, codecs.getincrementaldecoder("utf-8")("replace")),
+                )
+            # Read until all subprocesses closed their output (they may outlive the shell)
+            # Then wait for the command itself, which may still run with its output closed
+            while selector.get_map() or not self.reap():
+                if selector.get_map():
+                    events = selector.select(self.poll_interval)
+                else:
+                    events = []
+                    time.sleep(self.poll_interval)
+                for key, _events in events:
+                    stream, decoder = key.data
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                    text = decoder.decode(data, final=not data)
+                    if text:
+                        self.output[stream] += text
+                        if on_output:
+                            on_output(stream, text)
+                if time.monotonic() >= next_measure:
+                    next_measure = time.monotonic() + self.memory_interval
+                    self.measure_memory()
+                if not self.killed and time.monotonic() > deadline:
+                    logger.warning(
+                        f"ConversionExecutor timeout after {self.timeout}s: {self.command}"
+                    )
+                    self.timed_out = True
+                    self.kill()
+
+        self.returncode = self.process.wait()
+        return self.returncode
+
+    def reap(self):
+        """Collects the exit status of the command, if it finished
+
+        The resources used are read at the same time (see rusage), where the platform allows it
+
+        Returns
+        ----------
+        finished : bool
+            Whether the command finished
+        """
+        if self.process.returncode is not None:
+            return True
+        if not hasattr(os, "wait4"):
+            return self.process.poll() is not None
+        pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+        if pid == 0:
+            return False
+        self.rusage = rusage
+        self.process.returncode = os.waitstatus_to_exitcode(status)
+        return True
+
+    def measure_memory(self):
+        """Measures the memory used by the command & its subprocesses"""
+        memory = ResourceMonitor.session_memory(self.process.pid)
+        if memory is not None:
+            self.memory = memory
+            self.peak_memory = max(self.peak_memory, memory)
+
+    def kill(self):
+        """Kills the command & all its subprocesses
+
+        Can be called from any thread, before or during the run
+        """
+        with self.lock:
+            self.killed = True
+            if self.process is None:
+                return
+            logger.info(f"ConversionExecutor.kill {self.command}")
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
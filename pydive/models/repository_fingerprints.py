@@ -0,0 +1,183 @@
+"""Identifies files by their contents, so that identical copies are not made twice
+
+Classes
+----------
+FingerprintIndex
+    Computes & caches the content hash of files
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintIndex:
+    """Computes & caches the content hash of files
+
+    Hashes are stored in the database with the file's size & modification time
+    They're computed again only when the file changes
+
+    Attributes
+    ----------
+    algorithm : str
+        The hash algorithm used (as named by hashlib)
+    chunk_size : int
+        The number of bytes read at once when hashing a file
+    database : models.database.Database
+        The database in which hashes are stored
+    cache : dict of form path: (size, mtime, digest)
+        The fingerprints read from (or to be written to) the database
+    pending : dict of form path: (size, mtime, digest)
+        The fingerprints computed since the last save
+    lock : threading.Lock
+        Protects pending (fingerprints may be computed by background processes)
+
+    Methods
+    -------
+    __init__ (database)
+        Stores a reference to the database
+    preload (paths)
+        Reads the stored fingerprints of files, so that background processes don't use the database
+    digest (path, file_stat, read_database)
+        Returns the hash of a file's contents (computed if needed)
+    hash_file (path)
+        Computes the hash of a file's contents
+    same_content (path, other_path, read_database)
+        Returns whether 2 files have the same contents
+    add (path, file_stat, digest)
+        Stores the hash of a file computed elsewhere (for example during a copy)
+    save
+        Stores the new fingerprints in the database
+    """
+
+    algorithm = "blake2b"
+    chunk_size = 2**20
+
+    def __init__(self, database):
+        """Stores a reference to the database
+
+        Parameters
+        ----------
+        database : models.database.Database
+            The database in which hashes are stored
+        """
+        self.database = database
+        self.cache = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def preload(self, paths):
+        """Reads the stored fingerprints of files, so that background processes don't use the database
+
+        Parameters
+        ----------
+        paths : list of str
+            The paths of the files
+        """
+        missing = [path for path in paths if path not in self.cache]
+        if missing:
+            self.cache.update(self.database.fingerprints_get(missing))
+
+    def digest(self, path, file_stat=None, read_database=True):
+        """Returns the hash of a file's contents (computed if needed)
+
+        Parameters
+        ----------
+        path : str
+            The path of the file
+        file_stat : os.stat_result
+            The file's stat (read if not provided)
+        read_database : bool
+            Whether to look for the fingerprint in the database (False in background processes, see preload)
+
+        Returns
+        ----------
+        digest : str
+            The hash of the file (hexadecimal)
+        """
+        file_stat = file_stat or os.stat(path)
+        if read_database and path not in self.cache:
+            self.cache.update(self.database.fingerprints_get([path]))
+        if path in self.cache:
+            size, mtime, digest = self.cache[path]
+            if size == file_stat.st_size and mtime == file_stat.st_mtime_ns:
+                return digest
+
+        logger.debug(f"FingerprintIndex.digest: hashing {path}")
+        digest = self.hash_file(path)
+        self.add(path, file_stat, digest)
+        return digest
+
+    @classmethod
+    def hash_file(cls, path):
+        """Computes the hash of a file's contents
+
+        Parameters
+        ----------
+        path : str
+            The path of the file
+
+        Returns
+        ----------
+        digest : str
+            The hash of the file (hexadecimal)
+        """
+        file_hash = hashlib.new(cls.algorithm)
+        with open(path, "rb") as file:
+            while data := file.read(cls.chunk_size):
+                file_hash.update(data)
+        return file_hash.hexdigest()
+
+    def same_content(self, path, other_path, read_database=True):
+        """Returns whether 2 files have the same contents
+
+        Files with different sizes are not hashed
+
+        Parameters
+        ----------
+        path : str
+            The path of the first file
+        other_path : str
+            The path of the second file
+        read_database : bool
+            Whether to look for the fingerprints in the database (False in background processes, see preload)
+
+        Returns
+        ----------
+        same_content : bool
+            True if both files have the same contents
+        """
+        file_stat, other_stat = os.stat(path), os.stat(other_path)
+        if file_stat.st_size != other_stat.st_size:
+            return False
+        return self.digest(path, file_stat, read_database) == self.digest(
+            other_path, other_stat, read_database
+        )
+
+    def add(self, path, file_stat, digest):
+        """Stores the hash of a file computed elsewhere (for example during a copy)
+
+        Parameters
+        ----------
+        path : str
+            The path of the file
+        file_stat : os.stat_result
+            The file's stat when the hash was computed
+        digest : str
+            The hash of the file (hexadecimal)
+        """
+        fingerprint = (file_stat.st_size, file_stat.st_mtime_ns, digest)
+        with self.lock:
+            self.cache[path] = fingerprint
+            self.pending[path] = fingerprint
+
+    def save(self):
+        """Stores the new fingerprints in the database"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if pending:
+            logger.info(f"FingerprintIndex.save: {len(pending)} fingerprints")
+            self.database.fingerprints_update(pending)
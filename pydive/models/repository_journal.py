@@ -0,0 +1,252 @@
+"""Keeps track of the process groups in progress, so they can be resumed after a restart
+
+Classes
+----------
+ProcessJournal
+    Stores process groups & the status of their tasks in the database
+"""
+
+import logging
+import time
+
+from PyQt5 import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessJournal:
+    """Stores process groups & the status of their tasks in the database
+
+    Process groups are stored before they start, and removed once finished
+    Tasks are marked as stopped in batches (see flush_delay), so that large groups don't write for every task
+    If PyDive stops in between, some finished tasks are still marked as queued: they're checked again when resuming
+
+    Attributes
+    ----------
+    flush_delay : int
+        How long stopped tasks wait before being written to the database (in milliseconds)
+    database : models.database.Database
+        The database in which the journal is stored
+    recorded : set of int
+        The IDs of the process groups recorded since PyDive started
+    followed : dict of form group_id: list of (signal, handler)
+        The signals connected for each process group which is not finished yet
+    pending : dict of form group_id: set of int
+        The positions of the tasks stopped since the last flush, for each process group
+    flush_scheduled : bool
+        Whether a flush will happen after flush_delay
+
+    Methods
+    -------
+    __init__ (database)
+        Stores a reference to the database
+    record (process_group)
+        Stores a process group & its tasks, and follows their progress
+    task_row (task)
+        Returns the values stored in the journal for a given task
+    task_stopped (group_id, task)
+        Marks a task as stopped (it's written to the database later)
+    group_finished (group_id)
+        Removes a finished process group from the journal
+    unfollow (group_id)
+        Disconnects the signals of a process group
+    flush
+        Writes the stopped tasks to the database
+    shutdown
+        Stops following process groups & writes the stopped tasks to the database
+    unfinished
+        Returns the process groups which have unfinished tasks
+    discard (journal_groups)
+        Removes process groups from the journal
+    """
+
+    flush_delay = 1000
+
+    def __init__(self, database):
+        """Stores a reference to the database
+
+        Parameters
+        ----------
+        database : models.database.Database
+            The database in which the journal is stored
+        """
+        self.database = database
+        self.recorded = set()
+        self.followed = {}
+        self.pending = {}
+        self.flush_scheduled = False
+
+    def record(self, process_group):
+        """Stores a process group & its tasks, and follows their progress
+
+        Tasks already stopped (skipped or in error) are not stored
+
+        Parameters
+        ----------
+        process_group : models.repository.ProcessGroup
+            The process group to store
+
+        Returns
+        ----------
+        group_id : int
+            The ID of the process group in the journal (None if it has no task to run)
+        """
+        tasks = [
+            self.task_row(task)
+            for task in process_group.tasks
+            if task["status"] != "Stopped"
+        ]
+        if not tasks:
+            return None
+        group_id = self.database.journal_add(
+            process_group.label, time.time_ns(), tasks, process_group.priority
+        )
+        logger.info(f"ProcessJournal.record {process_group} as {group_id}")
+        self.recorded.add(group_id)
+        self.followed[group_id] = [
+            (process_group.taskStopped, lambda task: self.task_stopped(group_id, task)),
+            (process_group.finished, lambda: self.group_finished(group_id)),
+        ]
+        for signal, handler in self.followed[group_id]:
+            signal.connect(handler)
+        return group_id
+
+    def task_row(self, task):
+        """Returns the values stored in the journal for a given task
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The task to store
+
+        Returns
+        ----------
+        row : dict
+            The values to store (see models.processjournal.JournalTask)
+        """
+        process = task["process"]
+        row = {
+            "position": task.position,
+            "type": task["type"],
+            "status": task["status"],
+            "source_path": None,
+            "target_path": getattr(process, "target_file", None),
+            "location_id": None,
+            "category_id": None,
+            "conversion_method_id": None,
+            "source_trip": None,
+            "target_trip": task["target_trip"],
+            "verify": False,
+        }
+        if task["picture"]:
+            row["source_path"] = task["picture"].path
+        else:
+            row["source_path"] = process.source_file
+        if task["target_location"]:
+            row["location_id"] = task["target_location"].id
+        if task["conversion_method"]:
+            row["conversion_method_id"] = task["conversion_method"].id
+        if task["type"] == "copy":
+            if process.target_category:
+                row["category_id"] = process.target_category.id
+            row["verify"] = process.copier.verify
+        elif task["type"] == "change_trip_folder":
+            row["source_trip"] = process.source_trip
+        return row
+
+    def task_stopped(self, group_id, task):
+        """Marks a task as stopped (it's written to the database later)
+
+        Parameters
+        ----------
+        group_id : int
+            The ID of the process group in the journal
+        task : models.repository_tasks.Task
+            The stopped task
+        """
+        self.pending.setdefault(group_id, set()).add(task.position)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            QtCore.QTimer.singleShot(self.flush_delay, self.flush)
+
+    def group_finished(self, group_id):
+        """Removes a finished process group from the journal
+
+        Parameters
+        ----------
+        group_id : int
+            The ID of the process group in the journal
+        """
+        logger.info(f"ProcessJournal.group_finished {group_id}")
+        self.unfollow(group_id)
+        self.pending.pop(group_id, None)
+        self.database.journal_delete([group_id])
+
+    def unfollow(self, group_id):
+        """Disconnects the signals of a process group
+
+        This way, the process group doesn't keep the journal (and its database) in use
+
+        Parameters
+        ----------
+        group_id : int
+            The ID of the process group in the journal
+        """
+        for signal, handler in self.followed.pop(group_id, []):
+            signal.disconnect(handler)
+
+    def flush(self):
+        """Writes the stopped tasks to the database"""
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, {}
+        for group_id, positions in pending.items():
+            logger.debug(f"ProcessJournal.flush {len(positions)} tasks of {group_id}")
+            self.database.journal_update(group_id, positions)
+
+    def shutdown(self):
+        """Stops following process groups & writes the stopped tasks to the database
+
+        Called when PyDive exits, before the database is closed
+        Unfinished process groups stay in the journal, so they can be resumed at the next start
+        """
+        logger.info(f"ProcessJournal.shutdown ({len(self.followed)} groups followed)")
+        for group_id in list(self.followed):
+            self.unfollow(group_id)
+        self.flush()
+
+    def unfinished(self):
+        """Returns the process groups which have unfinished tasks
+
+        Only the process groups recorded before PyDive started are returned
+        Those whose tasks are all stopped are removed from the journal
+
+        Returns
+        ----------
+        journal_groups : list of models.processjournal.JournalGroup
+            The process groups to resume
+        """
+        self.flush()
+        journal_groups = [
+            group
+            for group in self.database.journal_get()
+            if group.id not in self.recorded
+        ]
+        finished = [
+            group
+            for group in journal_groups
+            if all(task.status == "Stopped" for task in group.tasks)
+        ]
+        if finished:
+            self.discard(finished)
+        return [group for group in journal_groups if group not in finished]
+
+    def discard(self, journal_groups):
+        """Removes process groups from the journal
+
+        Parameters
+        ----------
+        journal_groups : list of models.processjournal.JournalGroup
+            The process groups to remove
+        """
+        logger.info(f"ProcessJournal.discard {len(journal_groups)} process groups")
+        self.database.journal_delete([group.id for group in journal_groups])
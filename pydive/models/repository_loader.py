@@ -0,0 +1,162 @@
+"""Loads pictures in the background, so that the application remains usable during the scan
+
+Classes
+----------
+RepositoryLoader
+    Reads the storage locations in a background thread & updates the repository as folders are read
+"""
+
+import logging
+from PyQt5 import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+class RepositoryLoader(QtCore.QThread):
+    """Reads the storage locations in a background thread & updates the repository as folders are read
+
+    Folders are read in the background thread, while the repository is updated in the main thread
+    This way, picture groups & the database are only modified from the main thread
+
+    Attributes
+    ----------
+    folderRead : pyqtSignal
+        Emitted from the background thread when a folder (trip) has been read
+    loadProgress : pyqtSignal
+        Emitted with the number of folders read & pictures found so far
+    pictureGroupsAdded : pyqtSignal
+        Emitted with the list of picture groups created after each folder read
+    loadFinished : pyqtSignal
+        Emitted at the end of the load, with False if it was cancelled
+    repository : models.repository.Repository
+        The repository to load
+    loading : bool
+        Whether a load is in progress (until the repository is fully updated)
+    cancelled : bool
+        Whether the load has been cancelled
+    indexes : dict of form location.id: scan index
+        The scan index of each location (see Repository.load_pictures_prepare)
+    configuration : tuple
+        The storage locations & categories used for this load
+    full_reload : bool
+        Whether all pictures are loaded (otherwise, only changes are applied)
+    folders_read : int
+        The number of folders read so far
+    pictures_found : int
+        The number of pictures found so far
+    new_picture_groups : list of PictureGroup
+        The picture groups created so far
+
+    Methods
+    -------
+    __init__ (repository)
+        Stores a reference to the repository & connects signals
+    load
+        Prepares the repository & starts reading folders in the background
+    cancel
+        Stops the load: folders not read yet are ignored
+    run
+        Reads all folders (in the background thread)
+    on_folder_read (location, index, pictures, scan)
+        Updates the repository with the pictures of a folder (in the main thread)
+    on_finished
+        Finalizes the load (in the main thread)
+    """
+
+    folderRead = QtCore.pyqtSignal(object, object, object, object)
+    loadProgress = QtCore.pyqtSignal(int, int)
+    pictureGroupsAdded = QtCore.pyqtSignal(list)
+    loadFinished = QtCore.pyqtSignal(bool)
+
+    def __init__(self, repository):
+        """Stores a reference to the repository & connects signals
+
+        Parameters
+        ----------
+        repository : models.repository.Repository
+            The repository to load
+        """
+        logger.debug("RepositoryLoader.init")
+        super().__init__()
+        self.repository = repository
+        self.loading = False
+        self.cancelled = False
+        self.indexes = {}
+        self.configuration = None
+        self.full_reload = False
+        self.folders_read = 0
+        self.pictures_found = 0
+        self.new_picture_groups = []
+        # The loader belongs to the main thread, so these are processed there
+        self.folderRead.connect(self.on_folder_read)
+        self.finished.connect(self.on_finished)
+
+    def load(self):
+        """Prepares the repository & starts reading folders in the background"""
+        logger.info("RepositoryLoader.load")
+        self.loading = True
+        self.cancelled = False
+        self.folders_read = 0
+        self.pictures_found = 0
+        self.new_picture_groups = []
+        (
+            self.indexes,
+            self.configuration,
+            self.full_reload,
+        ) = self.repository.load_pictures_prepare()
+        self.start()
+
+    def cancel(self):
+        """Stops the load: folders not read yet are ignored"""
+        logger.info("RepositoryLoader.cancel")
+        self.cancelled = True
+
+    def run(self):
+        """Reads all folders (in the background thread)"""
+        for location, index, pictures, scan in self.repository.read_locations(
+            self.indexes
+        ):
+            if self.cancelled:
+                break
+            self.folderRead.emit(location, index, pictures, scan)
+
+    def on_folder_read(self, location, index, pictures, scan):
+        """Updates the repository with the pictures of a folder (in the main thread)
+
+        Parameters
+        ----------
+        location : StorageLocation
+            The storage location being read
+        index : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The part of the scan index matching the folders read
+        pictures : list of str
+            The paths of the pictures found
+        scan : dict of form path: (mtime, {file_name: (size, mtime)}, [subfolder_name])
+            The folders read
+        """
+        if self.cancelled:
+            return
+        picture_groups = self.repository.update_pictures(
+            index, pictures, scan, self.full_reload
+        )
+        self.new_picture_groups += picture_groups
+        self.folders_read += len(scan)
+        self.pictures_found += len(pictures)
+        self.loadProgress.emit(self.folders_read, self.pictures_found)
+        if picture_groups:
+            self.pictureGroupsAdded.emit(picture_groups)
+
+    def on_finished(self):
+        """Finalizes the load (in the main thread)"""
+        self.loading = False
+        if self.cancelled:
+            logger.info("RepositoryLoader.on_finished: load cancelled")
+            self.loadFinished.emit(False)
+            return
+        logger.info(
+            f"RepositoryLoader.on_finished: {self.folders_read} folders read, {self.pictures_found} pictures found"
+        )
+        self.repository.load_pictures_finish(
+            self.configuration, self.new_picture_groups
+        )
+        self.loadFinished.emit(True)
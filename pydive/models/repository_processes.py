@@ -11,55 +11,129 @@ CopyProcess
 GenerateProcess
     A process to generate pictures from raw pictures
 
+GenerateBatchProcess
+    A process converting several pictures with a single command
+
 RemoveProcess
     A process to delete pictures
 
 ChangeTripProcess
     A process to change the trip of given pictures
 
+ChangeTripFolderProcess
+    A process to change the trip of all pictures of a location, by renaming the trip's folder
+
 ProcessSignals
     Defines signals when processes are completed or in error
+
+Functions
+----------
+measured
+    Measures the resources used by a process's run, then emits them
 """
 
-import os, subprocess
+import functools
+import os
 import shlex
 import shutil
+import tempfile
 import gettext
 import logging
 
 from PyQt5 import QtCore
 from .picturegroup import PictureGroup
+from .repository_copier import FileCopier, CopyCancelled
+from .repository_executor import ConversionExecutor
+from .repository_resources import ResourceUsage
+from .repository_scheduler import ProcessScheduler
 from .storagelocation import StorageLocation
 
 _ = gettext.gettext
 logger = logging.getLogger(__name__)
 
 
+def measured(run):
+    """Measures the resources used by a process's run, then emits them
+
+    Processes cancelled before running are not measured
+
+    Parameters
+    ----------
+    run : callable
+        The run method of the process (it can use self.usage)
+
+    Returns
+    ----------
+    measured_run : callable
+        The run method, which emits signals.taskUsage once finished
+    """
+
+    @functools.wraps(run)
+    def measured_run(self):
+        if self.status == "Cancelled":
+            return run(self)
+        self.usage = ResourceUsage()
+        try:
+            return run(self)
+        finally:
+            self.usage.stop()
+            self.signals.taskUsage.emit(self.usage.values())
+
+    return measured_run
+
+
 class ProcessScaffold:
     def cancel(self):
         if self.status == "Queued":
-            self.status = "Cancelled"
-            self.signals.taskError.emit(
-                _("Task cancelled"),
-                _("Task cancelled {short_path} - {target_file}").format(
-                    short_path=self.short_path, target_file=self.target_file
-                ),
-            )
+            self.set_cancelled()
+
+    def set_cancelled(self):
+        """Marks the process as cancelled & emits the error signal (only once)"""
+        if self.status == "Cancelled":
+            return
+        self.status = "Cancelled"
+        self.signals.taskError.emit(
+            _("Task cancelled"),
+            _("Task cancelled {short_path} - {target_file}").format(
+                short_path=self.short_path, target_file=self.target_file
+            ),
+        )
 
 
 class CopyProcess(QtCore.QRunnable, ProcessScaffold):
     """A process to copy pictures between locations
 
+    With fingerprints, a target which already exists is compared to the source (in the background)
+    The copy is skipped if both have the same contents
+    The fingerprints of the source & copy are stored after each copy, so that later comparisons don't read them
+
+    Attributes
+    ----------
+    fingerprints : models.repository_fingerprints.FingerprintIndex
+        The content hash of files (None to never compare contents)
+
     Methods
     -------
-    __init__ (picture_group, source_picture, target_location)
+    __init__ (picture_group, source_picture, target_location, target_category, verify, fingerprints)
         Stores the required parameters for the copy
     run
         Runs the copy, after making sure it won't create issues
+    store_fingerprints
+        Stores the content hash of the source & copy
+    target_path (source_picture, target_location, target_category)
+        Returns the path of the copy
+    cancel
+        Cancels the copy, even if it is running
     """
 
     def __init__(
-        self, picture_group, source_picture, target_location, target_category=None
+        self,
+        picture_group,
+        source_picture,
+        target_location,
+        target_category=None,
+        verify=False,
+        fingerprints=None,
     ):
         """Stores the required parameters for the copy
 
@@ -73,6 +147,10 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
             The location where to copy the picture
         target_category : models.category.Category
             The category in which to copy the picture
+        verify : bool
+            Whether to check the copy against the source picture (see FileCopier)
+        fingerprints : models.repository_fingerprints.FingerprintIndex
+            The content hash of files (stored fingerprints must be preloaded, see FingerprintIndex.preload)
         """
         logger.debug(
             f"CopyProcess.init {picture_group.trip}/{picture_group.name}/{target_category.relative_path+'/' if target_category else ''}{source_picture.filename} to {target_location.name}"
@@ -84,31 +162,31 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
         self.source_picture = source_picture
         self.target_location = target_location
         self.target_category = target_category
+        self.fingerprints = fingerprints
 
         self.source_file = source_picture.path
-        # Determine picture's target path
-        if self.target_category:
-            self.target_file = os.path.join(
-                target_location.path,
-                source_picture.trip,
-                self.target_category.relative_path,
-                source_picture.filename,
-            )
-        else:
-            self.target_file = os.path.join(
-                target_location.path,
-                source_picture.trip,
-                source_picture.filename,
-            )
+        self.target_file = self.target_path(
+            source_picture, target_location, target_category
+        )
 
         self.short_path = self.target_file.replace(
             target_location.path, "[" + target_location.name + "]" + os.path.sep
         )
-
+        self.copier = FileCopier(self.source_file, self.target_file, verify)
+        self.copier.hash_data = fingerprints is not None
+        # Hard links within a location only, never towards another one (such as an archive)
+        if (
+            target_location.hardlinks
+            and source_picture.location.id == target_location.id
+        ):
+            self.copier.same_device_methods = ["reflink", "hardlink"]
+
+    @measured
     def run(self):
         """Runs the copy, after making sure it won't create issues
 
-        Will emit error signal if target file already exists
+        Will emit skipped signal if target file already exists with the same contents (with fingerprints)
+        Will emit error signal if target file already exists otherwise
         Will emit finished signal once copy is complete
         """
         # Check target doesn't exist already
@@ -117,12 +195,26 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
             return
         self.status = "Running"
         if os.path.exists(self.target_file):
+            if self.fingerprints and os.path.exists(self.source_file):
+                if self.fingerprints.same_content(
+                    self.source_file, self.target_file, read_database=False
+                ):
+                    logger.info(
+                        f"CopyProcess skipped {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.target_location.name} - Same contents"
+                    )
+                    self.signals.taskSkipped.emit()
+                    return
+                details = _(
+                    "Target file already exists with different contents: {short_path} - {target_file}"
+                )
+            else:
+                details = _("Target file already exists: {short_path} - {target_file}")
             logger.warning(
                 f"CopyProcess error {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.target_location.name} - Target file exists"
             )
             self.signals.taskError.emit(
                 _("Target file already exists"),
-                _("Target file already exists: {short_path} - {target_file}").format(
+                details.format(
                     short_path=self.short_path, target_file=self.target_file
                 ),
             )
@@ -144,7 +236,16 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
         # Run the actual processes
         try:
             os.makedirs(os.path.dirname(self.target_file), exist_ok=True)
-            shutil.copy2(self.source_file, self.target_file)
+            self.copier.copy(
+                lambda done, total: self.signals.taskProgress.emit(
+                    done, total, self.copier.throughput()
+                )
+            )
+        except CopyCancelled:
+            logger.info(
+                f"CopyProcess cancelled {self.source_file} to {self.target_file}"
+            )
+            self.set_cancelled()
         except Exception as e:
             logger.warning(
                 f"CopyProcess error {self.source_file} to {self.target_file} - {e.args}"
@@ -163,12 +264,64 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
             logger.info(
                 f"CopyProcess finished {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.target_location.name}"
             )
+            self.usage.bytes_read = os.path.getsize(self.source_file)
+            self.usage.bytes_written = self.usage.bytes_read
+            if self.fingerprints:
+                self.store_fingerprints()
             self.signals.taskFinished.emit(
                 self.picture_group,
                 self.target_location,
                 self.target_file,
             )
 
+    def store_fingerprints(self):
+        """Stores the content hash of the source & copy
+
+        The hash is computed during the copy, except when the copy shares the source's data (see FileCopier.link)
+        The fingerprints are written to the database later (see FingerprintIndex.save)
+        """
+        digest = self.copier.digest or self.fingerprints.digest(
+            self.source_file, self.copier.source_stat, read_database=False
+        )
+        self.fingerprints.add(self.source_file, self.copier.source_stat, digest)
+        self.fingerprints.add(self.target_file, self.copier.target_stat, digest)
+
+    @staticmethod
+    def target_path(source_picture, target_location, target_category=None):
+        """Returns the path of the copy
+
+        Parameters
+        ----------
+        source_picture : Picture
+            The source picture to copy
+        target_location : StorageLocation
+            The location where to copy the picture
+        target_category : models.category.Category
+            The category in which to copy the picture
+
+        Returns
+        ----------
+        target_file : str
+            The path of the copy
+        """
+        if target_category:
+            return os.path.join(
+                target_location.path,
+                source_picture.trip,
+                target_category.relative_path,
+                source_picture.filename,
+            )
+        return os.path.join(
+            target_location.path,
+            source_picture.trip,
+            source_picture.filename,
+        )
+
+    def cancel(self):
+        """Cancels the copy, even if it is running (it then stops after the current chunk)"""
+        super().cancel()
+        self.copier.cancel()
+
     def __repr__(self):
         return f"Copy picture: {self.source_file} to {self.target_file}"
 
@@ -176,15 +329,39 @@ class CopyProcess(QtCore.QRunnable, ProcessScaffold):
 class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
     """A process to generate pictures from raw pictures
 
+    If a conversion cache is provided, the picture is taken from it when possible
+    Otherwise, the converted picture is added to it
+
+    Processes using a batch conversion method are not run directly: see GenerateBatchProcess
+    With %WORKER_FOLDER%, the converter gets a folder of its own while it runs (see ProcessScheduler.worker_folder)
+    The converter starts once there is enough memory & CPU for it (see ResourceMonitor)
+
+    Attributes
+    ----------
+    batch : GenerateBatchProcess
+        The batch converting this picture (None if it is converted on its own)
+    usage : ResourceUsage
+        The resources used by the conversion (None until it runs)
+
     Methods
     -------
-    __init__ (location, picture_group, source_picture, method)
+    __init__ (location, picture_group, source_picture, method, conversion_cache)
         Determines the actual system command to run
     run
         Runs the command, after making sure it won't create issues
+    check_target
+        Emits the error signal if the target file exists already
+    fetch_from_cache
+        Creates the target file from the conversion cache, if possible
+    finish (cache_key)
+        Stores the converted picture in the cache & emits the finished signal
+    cancel
+        Cancels the conversion, even if it is running
     """
 
-    def __init__(self, location, picture_group, source_picture, method):
+    def __init__(
+        self, location, picture_group, source_picture, method, conversion_cache=None
+    ):
         """Determines the actual system command to run
 
         Parameters
@@ -197,6 +374,8 @@ class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
             The RAW picture to convert
         method : ConversionMethod
             The method to convert the image
+        conversion_cache : models.repository_cache.ConversionCache
+            The cache of converted pictures (None to always run the conversion)
         """
         logger.debug(
             f"GenerateProcess.init: {picture_group.trip}/{picture_group.name}/{source_picture.filename} to {location.name} using {method}"
@@ -206,6 +385,10 @@ class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
         self.signals = ProcessSignals()
         self.picture_group = picture_group
         self.location = location
+        self.method = method
+        self.conversion_cache = conversion_cache
+        self.batch = None
+        self.usage = None
 
         # Determine folder / file paths
         self.source_file = source_picture.path
@@ -220,11 +403,15 @@ class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
 
         # Let's mix all that together!
         command = method.command
+        command = command.replace("%SOURCE_FILES%", shlex.quote(self.source_file))
         command = command.replace("%SOURCE_FILE%", shlex.quote(self.source_file))
         command = command.replace("%TARGET_FILE%", shlex.quote(self.target_file))
         command = command.replace("%TARGET_FOLDER%", shlex.quote(self.target_folder))
         self.command = command
+        self.executor = ConversionExecutor(command, method.timeout)
+        ProcessScheduler.global_instance().monitor.seed(method)
 
+    @measured
     def run(self):
         """Runs the command, after making sure it won't create issues
 
@@ -238,6 +425,70 @@ class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
         if self.status == "Cancelled":
             return
         self.status = "Running"
+        if not self.check_target():
+            return
+
+        # The same picture may have been converted already
+        found, cache_key = self.fetch_from_cache()
+        if found:
+            return
+
+        scheduler = ProcessScheduler.global_instance()
+        with scheduler.worker_folder(self.method) as worker_folder:
+            if worker_folder:
+                self.executor.command = self.command.replace(
+                    "%WORKER_FOLDER%", shlex.quote(worker_folder)
+                )
+            with scheduler.monitor.admit(self.method, self.executor):
+                returncode = self.executor.run(self.signals.taskOutput.emit)
+        self.usage.add_child(self.executor.rusage, self.executor.peak_memory)
+        if self.executor.killed:
+            # Don't leave a partially converted picture behind
+            if os.path.exists(self.target_file):
+                os.remove(self.target_file)
+            if self.executor.timed_out:
+                logger.warning(
+                    f"GenerateProcess timeout {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.location.name}"
+                )
+                self.signals.taskError.emit(
+                    _("Conversion timed out"),
+                    _(
+                        "Conversion timed out after {timeout} seconds for {target_file}"
+                    ).format(
+                        timeout=self.executor.timeout, target_file=self.target_file
+                    ),
+                )
+            else:
+                self.set_cancelled()
+            return
+
+        error = self.executor.output["stderr"]
+        if error == "" and returncode != 0:
+            error = _("Exit code {returncode}").format(returncode=returncode)
+        if error != "":
+            logger.warning(
+                f"GenerateProcess error {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.location.name} - {error}"
+            )
+            self.signals.taskError.emit(
+                _("Error during conversion"),
+                _("Error during conversion for {target_file}: {error}").format(
+                    error=error, target_file=self.target_file
+                ),
+            )
+            return
+
+        self.finish(cache_key)
+
+    def check_target(self):
+        """Emits the error signal if the target file exists already
+
+        The target folder is created if needed
+
+        Returns
+        ----------
+        ok : bool
+            True if the conversion can proceed
+        """
         if os.path.exists(self.target_file):
             logger.warning(
                 f"GenerateProcess error {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.location.name} - Target file exists"
@@ -248,38 +499,302 @@ class GenerateProcess(QtCore.QRunnable, ProcessScaffold):
                     short_path=self.short_path, target_file=self.target_file
                 ),
             )
-
-            return
+            return False
         # Check target folder exists
         if not os.path.exists(self.target_folder):
             os.makedirs(self.target_folder, exist_ok=True)
+        return True
 
-        process = subprocess.run(self.command, shell=True, capture_output=True)
-        if process.stderr.decode("utf-8") != "":
-            logger.warning(
-                f"GenerateProcess error {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.location.name} - {process.stderr.decode('utf-8')}"
-            )
-            self.signals.taskError.emit(
-                _("Error during conversion"),
-                _("Error during conversion for {target_file}: {error}").format(
-                    error=process.stderr.decode("utf-8"), target_file=self.target_file
-                ),
-            )
-            return
+    def fetch_from_cache(self):
+        """Creates the target file from the conversion cache, if possible
+
+        Emits the finished signal if the picture is found
+
+        Returns
+        ----------
+        found : bool
+            True if the target file has been created from the cache
+        cache_key : str
+            The cache key of the conversion (None if the cache isn't used)
+        """
+        cache_key = None
+        if self.conversion_cache and os.path.exists(self.source_file):
+            try:
+                cache_key = self.conversion_cache.key(
+                    self.source_file, self.method.command
+                )
+            except OSError as e:
+                logger.warning(f"GenerateProcess: conversion cache not used: {e}")
+            if cache_key and self.conversion_cache.fetch(cache_key, self.target_file):
+                self.usage.bytes_read = os.path.getsize(self.source_file)
+                self.usage.bytes_written = os.path.getsize(self.target_file)
+                self.signals.taskOutput.emit(
+                    "stdout", _("Converted picture found in cache") + "\n"
+                )
+                self.signals.taskFinished.emit(
+                    self.picture_group,
+                    self.location,
+                    self.target_file,
+                )
+                return True, cache_key
+        return False, cache_key
+
+    def finish(self, cache_key=None):
+        """Stores the converted picture in the cache & emits the finished signal
 
+        Parameters
+        ----------
+        cache_key : str
+            The cache key of the conversion (None if the cache isn't used)
+        """
         logger.info(
             f"GenerateProcess finished {self.picture_group.trip}/{self.picture_group.name}/{os.path.basename(self.source_file)} to {self.location.name}..{os.path.basename(self.target_file)}"
         )
+        self.usage.bytes_read = os.path.getsize(self.source_file)
+        self.usage.bytes_written = os.path.getsize(self.target_file)
+        if cache_key and os.path.exists(self.target_file):
+            self.conversion_cache.store(cache_key, self.target_file)
         self.signals.taskFinished.emit(
             self.picture_group,
             self.location,
             self.target_file,
         )
 
+    def cancel(self):
+        """Cancels the conversion, even if it is running (the converter is then killed)
+
+        A running batch can't skip a single picture: the whole batch is then killed
+        """
+        super().cancel()
+        self.executor.kill()
+        if self.batch and self.status == "Running":
+            self.batch.executor.kill()
+
     def __repr__(self):
         return f"Generate picture: {self.command}"
 
 
+class GenerateBatchProcess(QtCore.QRunnable):
+    """A process converting several pictures with a single command
+
+    Converters often spend more time starting than converting a small picture
+    Batch conversion methods (see ConversionMethod.batch) get all source files at once
+
+    The command writes in a temporary folder, then each converted picture is moved to its target file
+    Each picture keeps its own GenerateProcess: its signals are emitted as if it ran on its own
+
+    Attributes
+    ----------
+    batch_size : int
+        The maximum number of pictures converted by a single command
+    processes : list of GenerateProcess
+        The conversions to run (they all use the same method & target folder)
+    method : ConversionMethod
+        The method to convert the pictures
+    target_folder : str
+        The folder in which pictures are converted
+    executor : ConversionExecutor
+        Runs the command (its command is determined when running)
+    usage : ResourceUsage
+        The resources used by the command
+
+    Methods
+    -------
+    __init__ (processes)
+        Stores the conversions to run
+    split (processes)
+        Groups conversions into batches
+    run
+        Runs the command for all conversions not cancelled yet
+    convert (processes, to_convert)
+        Runs the command for the given conversions
+    output_file (process, work_folder)
+        Returns the path of a picture converted by the command
+    """
+
+    batch_size = 20
+
+    def __init__(self, processes):
+        """Stores the conversions to run
+
+        Parameters
+        ----------
+        processes : list of GenerateProcess
+            The conversions to run (they must use the same method & target folder)
+        """
+        logger.debug(f"GenerateBatchProcess.init with {len(processes)} pictures")
+        super().__init__()
+        self.processes = processes
+        self.method = processes[0].method
+        self.target_folder = processes[0].target_folder
+        timeout = self.method.timeout or ConversionExecutor.default_timeout
+        self.executor = ConversionExecutor(None, timeout * len(processes))
+        for process in processes:
+            process.batch = self
+
+    @classmethod
+    def split(cls, processes):
+        """Groups conversions into batches
+
+        Conversions are grouped by method & target folder, with at most batch_size conversions per batch
+        Converted pictures are named after their source file: those must differ within a batch
+
+        Parameters
+        ----------
+        processes : list of GenerateProcess
+            The conversions to group
+
+        Returns
+        ----------
+        batches : list of GenerateBatchProcess
+            The batches to run
+        """
+        groups = {}
+        for process in processes:
+            key = (process.method.id, process.target_folder)
+            batches = groups.setdefault(key, [[]])
+            output_name = os.path.basename(cls.output_file(process, ""))
+            if len(batches[-1]) >= cls.batch_size or output_name in [
+                os.path.basename(cls.output_file(p, "")) for p in batches[-1]
+            ]:
+                batches.append([])
+            batches[-1].append(process)
+        return [cls(batch) for batches in groups.values() for batch in batches]
+
+    def run(self):
+        """Runs the command for all conversions not cancelled yet
+
+        Each conversion emits its own signals: finished, error, cancelled & resources used
+        The resources used by the command are shared between the pictures it converted
+        """
+        processes = [p for p in self.processes if p.status == "Queued"]
+        logger.debug(
+            f"GenerateBatchProcess.run {len(processes)} pictures to {self.target_folder} using {self.method}"
+        )
+        self.usage = ResourceUsage()
+        for process in processes:
+            process.usage = ResourceUsage()
+        to_convert = []
+        try:
+            self.convert(processes, to_convert)
+        finally:
+            self.usage.stop()
+            converted = [process for process, _cache_key in to_convert]
+            for process in processes:
+                if process in converted:
+                    values = self.usage.values(len(converted))
+                    values["bytes_read"] = process.usage.bytes_read
+                    values["bytes_written"] = process.usage.bytes_written
+                else:
+                    process.usage.stop()
+                    values = process.usage.values()
+                process.signals.taskUsage.emit(values)
+
+    def convert(self, processes, to_convert):
+        """Runs the command for the given conversions
+
+        Parameters
+        ----------
+        processes : list of GenerateProcess
+            The conversions to run
+        to_convert : list of (GenerateProcess, str)
+            Filled with the conversions done by the command, with their cache key
+        """
+        for process in processes:
+            process.status = "Running"
+            if not process.check_target():
+                continue
+            found, cache_key = process.fetch_from_cache()
+            if not found:
+                to_convert.append((process, cache_key))
+        if not to_convert:
+            return
+
+        work_folder = tempfile.mkdtemp(prefix=".pydive_", dir=self.target_folder)
+        try:
+            source_files = " ".join(shlex.quote(p.source_file) for p, _k in to_convert)
+            command = self.method.command
+            command = command.replace("%SOURCE_FILES%", source_files)
+            command = command.replace("%TARGET_FOLDER%", shlex.quote(work_folder))
+
+            def on_output(stream, text):
+                for process, _cache_key in to_convert:
+                    process.signals.taskOutput.emit(stream, text)
+
+            scheduler = ProcessScheduler.global_instance()
+            with scheduler.worker_folder(self.method) as worker_folder:
+                if worker_folder:
+                    command = command.replace(
+                        "%WORKER_FOLDER%", shlex.quote(worker_folder)
+                    )
+                self.executor.command = command
+                with scheduler.monitor.admit(self.method, self.executor):
+                    returncode = self.executor.run(on_output)
+            self.usage.add_child(self.executor.rusage, self.executor.peak_memory)
+            if self.executor.killed:
+                for process, _cache_key in to_convert:
+                    if self.executor.timed_out:
+                        process.signals.taskError.emit(
+                            _("Conversion timed out"),
+                            _(
+                                "Conversion timed out after {timeout} seconds for {target_file}"
+                            ).format(
+                                timeout=self.executor.timeout,
+                                target_file=process.target_file,
+                            ),
+                        )
+                    else:
+                        process.set_cancelled()
+                return
+
+            # Converters may write warnings for some pictures: only missing pictures are errors
+            error = self.executor.output["stderr"]
+            if returncode != 0:
+                error = _("Exit code {returncode}").format(returncode=returncode)
+                error += "\n" + self.executor.output["stderr"]
+            for process, cache_key in to_convert:
+                output_file = self.output_file(process, work_folder)
+                if returncode == 0 and os.path.exists(output_file):
+                    if process.check_target():
+                        os.replace(output_file, process.target_file)
+                        process.finish(cache_key)
+                    continue
+                logger.warning(
+                    f"GenerateBatchProcess error {process.picture_group.trip}/{process.picture_group.name}/{os.path.basename(process.source_file)} to {process.location.name} - {error}"
+                )
+                process.signals.taskError.emit(
+                    _("Error during conversion"),
+                    _("Error during conversion for {target_file}: {error}").format(
+                        error=error or _("Converted picture not found"),
+                        target_file=process.target_file,
+                    ),
+                )
+        finally:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    @staticmethod
+    def output_file(process, work_folder):
+        """Returns the path of a picture converted by the command
+
+        Parameters
+        ----------
+        process : GenerateProcess
+            The conversion
+        work_folder : str
+            The folder in which the command writes
+
+        Returns
+        ----------
+        output_file : str
+            The path of the converted picture
+        """
+        source_name = os.path.splitext(os.path.basename(process.source_file))[0]
+        return os.path.join(work_folder, source_name + ".jpg")
+
+    def __repr__(self):
+        return f"Generate {len(self.processes)} pictures: {self.method.command}"
+
+
 class RemoveProcess(QtCore.QRunnable, ProcessScaffold):
     """A process to delete pictures
 
@@ -318,6 +833,7 @@ class RemoveProcess(QtCore.QRunnable, ProcessScaffold):
             self.location.path, "[" + self.location.name + "]" + os.path.sep
         )
 
+    @measured
     def run(self):
         """Runs the command, after making sure it won't create issues
 
@@ -428,6 +944,7 @@ class ChangeTripProcess(QtCore.QRunnable, ProcessScaffold):
             picture.location.path, "[" + picture.location.name + "]" + os.path.sep
         )
 
+    @measured
     def run(self):
         """Runs the command, after making sure it won't create issues
 
@@ -484,6 +1001,102 @@ class ChangeTripProcess(QtCore.QRunnable, ProcessScaffold):
         return f"Change trip: {self.source_file} to {self.target_file}"
 
 
+class ChangeTripFolderProcess(QtCore.QRunnable, ProcessScaffold):
+    """A process to change the trip of all pictures of a location, by renaming the trip's folder
+
+    Methods
+    -------
+    __init__ (location, source_trip, target_trip)
+        Determines the folders to rename
+    run
+        Renames the folder, after making sure it won't create issues
+    """
+
+    def __init__(self, location, source_trip, target_trip):
+        """Determines the folders to rename
+
+        Parameters
+        ----------
+        location : StorageLocation
+            The location in which to rename the trip
+        source_trip : str
+            The trip to rename
+        target_trip : str
+            The new name of the trip
+        """
+        logger.debug(
+            f"ChangeTripFolderProcess.init: {source_trip} to {target_trip} in {location.name}"
+        )
+        super().__init__()
+        self.status = "Queued"
+        self.signals = ProcessSignals()
+        self.target_location = location
+        self.source_trip = source_trip
+        self.target_trip = target_trip
+
+        self.source_file = os.path.join(location.path, source_trip)
+        self.target_file = os.path.join(location.path, target_trip)
+
+        self.short_path = self.source_file.replace(
+            location.path, "[" + location.name + "]" + os.path.sep
+        )
+
+    @measured
+    def run(self):
+        """Renames the folder, after making sure it won't create issues
+
+        Will emit error signal if target folder already exists
+        Will emit finished signal (without picture group) once process is complete
+        """
+        logger.debug(
+            f"ChangeTripFolderProcess.run {self.source_trip} to {self.target_trip} in {self.target_location.name}"
+        )
+        if self.status == "Cancelled":
+            return
+        self.status = "Running"
+        # Check target doesn't exist already
+        if os.path.exists(self.target_file):
+            logger.warning(
+                f"ChangeTripFolderProcess error {self.source_trip} to {self.target_trip} in {self.target_location.name}: Target folder exists"
+            )
+            self.signals.taskError.emit(
+                _("Target folder already exists"),
+                _("Target folder already exists: {short_path} - {target_file}").format(
+                    short_path=self.short_path, target_file=self.target_file
+                ),
+            )
+            return
+
+        try:
+            # The new trip may be nested (such as "2023/Malta")
+            os.makedirs(os.path.dirname(self.target_file), exist_ok=True)
+            os.rename(self.source_file, self.target_file)
+            logger.info(
+                f"ChangeTripFolderProcess finished {self.source_trip} to {self.target_trip} in {self.target_location.name}"
+            )
+            self.signals.taskFinished.emit(
+                None,
+                self.target_location,
+                self.target_file,
+            )
+        except Exception as e:
+            logger.warning(
+                f"ChangeTripFolderProcess error {self.source_trip} to {self.target_trip} in {self.target_location.name}: {e.args}"
+            )
+            self.signals.taskError.emit(
+                e.args.__repr__(),
+                _("{error}: {short_path} to {target_trip} - {source_file}").format(
+                    error=e.args.__repr__(),
+                    short_path=self.short_path,
+                    target_trip=self.target_trip,
+                    source_file=self.source_file,
+                ),
+            )
+
+    def __repr__(self):
+        return f"Change trip folder: {self.source_file} to {self.target_file}"
+
+
 class ProcessSignals(QtCore.QObject):
     """Defines signals when processes are completed or in error
 
@@ -493,7 +1106,19 @@ class ProcessSignals(QtCore.QObject):
         Emitted once a process has finished
     error : pyqtSignal
         Emitted once a process is in error
+    taskOutput : pyqtSignal
+        Emitted when a process writes something, with the stream (stdout or stderr) & text
+    taskProgress : pyqtSignal
+        Emitted during copies, with the bytes copied, the total bytes & the throughput
+    taskUsage : pyqtSignal
+        Emitted after a process ran, with the resources it used (see ResourceUsage.values)
+    taskSkipped : pyqtSignal
+        Emitted when a process had nothing to do (for example, a copy made before)
     """
 
     taskFinished = QtCore.pyqtSignal(PictureGroup, StorageLocation, str)
     taskError = QtCore.pyqtSignal(str, str)
+    taskOutput = QtCore.pyqtSignal(str, str)
+    taskProgress = QtCore.pyqtSignal(object, object, float)
+    taskUsage = QtCore.pyqtSignal(dict)
+    taskSkipped = QtCore.pyqtSignal()
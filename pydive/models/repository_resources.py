@@ -0,0 +1,394 @@
+"""Checks the memory & CPU available before starting conversions, and measures what tasks use
+
+Classes
+----------
+ResourceMonitor
+    Starts conversions only when the computer has enough memory & CPU for them
+ResourceUsage
+    Measures the resources used by a task
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceMonitor:
+    """Starts conversions only when the computer has enough memory & CPU for them
+
+    RAW converters can use several GB of memory: running too many of them makes the computer swap
+    Before each conversion, the memory available & the CPU load are read from /proc
+    The memory a conversion needs is learned from the previous runs of its conversion method
+
+    Conversions which just started don't use their full memory yet: their expected peak is reserved until then
+    At least one conversion is always allowed to run, so that conversions can't wait forever
+    Without /proc (on other systems), only the number of running conversions is limited (see ProcessScheduler)
+
+    Attributes
+    ----------
+    default_peak_memory : int
+        The memory expected for conversion methods never used before (in bytes)
+    memory_margin : int
+        The memory left for the rest of the system (in bytes)
+    max_cpu_load : float
+        The CPU load above which no conversion starts (between 0 and 1)
+    poll_interval : float
+        How often waiting conversions check the resources again (in seconds)
+    proc_folder : str
+        Where system information is read
+    peak_memory : dict of form method_id: int
+        The peak memory use of each conversion method (in bytes)
+    running : list of (ConversionMethod, ConversionExecutor)
+        The conversions admitted & not finished yet
+    lock : threading.Condition
+        Ensures conversions are admitted one at a time
+    cpu_sample : tuple of form (time, busy, total)
+        The CPU times read last time (to compute the load since then)
+    last_cpu_load : float
+        The CPU load computed last time (reused if asked again within poll_interval)
+
+    Methods
+    -------
+    __init__
+        Initializes values to defaults
+    seed (conversion_method)
+        Uses the peak memory stored in the database, if none has been measured yet
+    expected_memory (conversion_method)
+        Returns the peak memory expected for a conversion method
+    record (conversion_method, peak_memory)
+        Learns the peak memory use of a conversion method, after a conversion
+    memory_available
+        Returns the memory available, from /proc/meminfo
+    cpu_load
+        Returns the CPU load since the previous call, from /proc/stat
+    session_memory (session_id)
+        Returns the memory used by all processes of a session, from /proc
+    can_start (conversion_method)
+        Returns whether there are enough resources to start a conversion
+    admit (conversion_method, executor)
+        Waits until a conversion can start, then keeps track of it while it runs
+    """
+
+    default_peak_memory = 2**30
+    memory_margin = 512 * 2**20
+    max_cpu_load = 0.9
+    poll_interval = 0.5
+    proc_folder = "/proc"
+
+    def __init__(self):
+        """Initializes values to defaults"""
+        self.peak_memory = {}
+        self.running = []
+        self.lock = threading.Condition()
+        self.cpu_sample = None
+        self.last_cpu_load = None
+
+    def seed(self, conversion_method):
+        """Uses the peak memory stored in the database, if none has been measured yet
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method, with its stored peak memory
+        """
+        if conversion_method.peak_memory:
+            with self.lock:
+                self.peak_memory.setdefault(
+                    conversion_method.id, conversion_method.peak_memory
+                )
+
+    def expected_memory(self, conversion_method):
+        """Returns the peak memory expected for a conversion method
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method
+
+        Returns
+        ----------
+        peak_memory : int
+            The expected peak memory (in bytes)
+        """
+        return self.peak_memory.get(conversion_method.id, self.default_peak_memory)
+
+    def record(self, conversion_method, peak_memory):
+        """Learns the peak memory use of a conversion method, after a conversion
+
+        Higher peaks are used immediately, lower ones only lower the expectation gradually
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method used
+        peak_memory : int
+            The peak memory used by the conversion (in bytes)
+        """
+        if not peak_memory:
+            return
+        previous = self.peak_memory.get(conversion_method.id)
+        if previous:
+            peak_memory = max(peak_memory, (previous + peak_memory) // 2)
+        logger.debug(
+            f"ResourceMonitor.record {conversion_method}: {peak_memory // 2**20} MB"
+        )
+        self.peak_memory[conversion_method.id] = peak_memory
+
+    def memory_available(self):
+        """Returns the memory available, from /proc/meminfo
+
+        Returns
+        ----------
+        memory_available : int
+            The memory available (in bytes), None if it can't be determined
+        """
+        try:
+            with open(os.path.join(self.proc_folder, "meminfo"), "r") as meminfo:
+                for line in meminfo:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+
+    def cpu_load(self):
+        """Returns the CPU load since the previous call, from /proc/stat
+
+        Returns
+        ----------
+        cpu_load : float
+            The share of CPU time used (between 0 and 1), None if it can't be determined
+        """
+        now = time.monotonic()
+        if self.cpu_sample and now - self.cpu_sample[0] < self.poll_interval:
+            return self.last_cpu_load
+        try:
+            with open(os.path.join(self.proc_folder, "stat"), "r") as stat:
+                times = [int(value) for value in stat.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        # Idle & I/O wait times are the 4th and 5th values
+        total = sum(times)
+        busy = total - sum(times[3:5])
+        previous, self.cpu_sample = self.cpu_sample, (now, busy, total)
+        self.last_cpu_load = None
+        if previous and total > previous[2]:
+            self.last_cpu_load = (busy - previous[1]) / (total - previous[2])
+        return self.last_cpu_load
+
+    @classmethod
+    def session_memory(cls, session_id):
+        """Returns the memory used by all processes of a session, from /proc
+
+        Converters run in their own session (see ConversionExecutor), with all their subprocesses
+
+        Parameters
+        ----------
+        session_id : int
+            The ID of the session
+
+        Returns
+        ----------
+        memory : int
+            The resident memory of the session's processes (in bytes), None if it can't be determined
+        """
+        try:
+            pids = [pid for pid in os.listdir(cls.proc_folder) if pid.isdigit()]
+        except OSError:
+            return None
+        memory = 0
+        for pid in pids:
+            try:
+                with open(os.path.join(cls.proc_folder, pid, "stat"), "r") as stat:
+                    fields = stat.read().rsplit(")", 1)[1].split()
+            except (OSError, IndexError):
+                continue  # The process just ended
+            # Fields after the command: state, ppid, pgrp, session, ..., rss (22nd)
+            if int(fields[3]) == session_id:
+                memory += int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        return memory
+
+    def can_start(self, conversion_method):
+        """Returns whether there are enough resources to start a conversion
+
+        Must be called while holding the lock
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method to use
+
+        Returns
+        ----------
+        can_start : bool
+            True if the conversion can start
+        """
+        if not self.running:
+            return True
+        cpu_load = self.cpu_load()
+        if cpu_load is not None and cpu_load > self.max_cpu_load:
+            return False
+        memory_available = self.memory_available()
+        if memory_available is None:
+            return True
+        # Running conversions may not have reached their peak memory yet
+        reserved = sum(
+            max(0, self.expected_memory(method) - executor.memory)
+            for method, executor in self.running
+        )
+        memory_needed = self.expected_memory(conversion_method) + self.memory_margin
+        return memory_available - reserved >= memory_needed
+
+    @contextlib.contextmanager
+    def admit(self, conversion_method, executor):
+        """Waits until a conversion can start, then keeps track of it while it runs
+
+        Stops waiting if the conversion is cancelled (the executor is then killed)
+        Once the conversion is finished, its peak memory is recorded
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method to use
+        executor : models.repository_executor.ConversionExecutor
+            The executor which will run the conversion
+        """
+        entry = (conversion_method, executor)
+        with self.lock:
+            start = time.monotonic()
+            while not executor.killed and not self.can_start(conversion_method):
+                self.lock.wait(self.poll_interval)
+            if time.monotonic() - start > self.poll_interval:
+                logger.info(
+                    f"ResourceMonitor.admit {conversion_method} after {time.monotonic() - start:.1f}s"
+                )
+            self.running.append(entry)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running.remove(entry)
+                self.record(conversion_method, executor.peak_memory)
+                self.lock.notify_all()
+
+
+class ResourceUsage:
+    """Measures the resources used by a task
+
+    Tasks run in their own thread: the CPU time of that thread is measured
+    The resources of subprocesses (converters) are added once they're finished (see add_child)
+    The peak memory is only known for subprocesses: threads share the memory of PyDive
+    The bytes read & written are the size of the files handled (they're set by each task)
+
+    Attributes
+    ----------
+    wall_time : float
+        The duration of the task (in seconds)
+    user_time : float
+        The CPU time spent in the task's code (in seconds)
+    system_time : float
+        The CPU time spent by the system for the task (in seconds)
+    peak_memory : int
+        The peak memory used by the task's subprocesses (in bytes, None if there was none)
+    bytes_read : int
+        The size of the files read
+    bytes_written : int
+        The size of the files written
+    start : tuple of form (wall, user, system)
+        The times when the measure started
+
+    Methods
+    -------
+    __init__
+        Starts measuring
+    thread_times
+        Returns the CPU times of the current thread
+    add_child (rusage, peak_memory)
+        Adds the resources used by a finished subprocess
+    stop
+        Stops measuring (must be called from the same thread)
+    values (share)
+        Returns the measures
+    """
+
+    def __init__(self):
+        """Starts measuring"""
+        self.wall_time = 0.0
+        self.user_time = 0.0
+        self.system_time = 0.0
+        self.peak_memory = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.start = (time.perf_counter(), *self.thread_times())
+
+    @staticmethod
+    def thread_times():
+        """Returns the CPU times of the current thread
+
+        Returns
+        ----------
+        user_time : float
+            The CPU time spent in the thread's code (in seconds)
+        system_time : float
+            The CPU time spent by the system for the thread (in seconds)
+        """
+        if resource and hasattr(resource, "RUSAGE_THREAD"):
+            usage = resource.getrusage(resource.RUSAGE_THREAD)
+            return usage.ru_utime, usage.ru_stime
+        return time.thread_time(), 0.0
+
+    def add_child(self, rusage, peak_memory=None):
+        """Adds the resources used by a finished subprocess
+
+        Parameters
+        ----------
+        rusage : resource.struct_rusage
+            The resources used by the subprocess (from os.wait4), None if unknown
+        peak_memory : int
+            The peak memory measured while the subprocess ran (in bytes)
+        """
+        peaks = [peak_memory or 0, self.peak_memory or 0]
+        if rusage:
+            self.user_time += rusage.ru_utime
+            self.system_time += rusage.ru_stime
+            peaks.append(rusage.ru_maxrss * 1024)  # In kilobytes on Linux
+        self.peak_memory = max(peaks) or None
+
+    def stop(self):
+        """Stops measuring (must be called from the same thread)"""
+        wall, user, system = self.start
+        user_end, system_end = self.thread_times()
+        self.wall_time = time.perf_counter() - wall
+        self.user_time += user_end - user
+        self.system_time += system_end - system
+
+    def values(self, share=1):
+        """Returns the measures
+
+        Parameters
+        ----------
+        share : int
+            The number of tasks sharing those measures (times are divided between them)
+
+        Returns
+        ----------
+        values : dict
+            The measures, with the same names as the attributes
+        """
+        return {
+            "wall_time": self.wall_time / share,
+            "user_time": self.user_time / share,
+            "system_time": self.system_time / share,
+            "peak_memory": self.peak_memory,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
@@ -0,0 +1,231 @@
+"""Runs background processes, with a separate concurrency limit for each resource
+
+Classes
+----------
+ProcessScheduler
+    Runs background processes in separate thread pools, based on the resource they use
+"""
+
+import contextlib
+import logging
+import os
+import re
+import shlex
+import tempfile
+import threading
+
+from PyQt5 import QtCore
+
+from .repository_resources import ResourceMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessScheduler:
+    """Runs background processes in separate thread pools, based on the resource they use
+
+    Each task type has its own thread pool, so that quick tasks (copy, delete) don't wait for long conversions
+    Conversions have a thread pool per conversion program: some (like darktable) can't run in parallel
+    This is because parallel runs share the same configuration & library database
+    Conversion methods using %WORKER_FOLDER% get a separate folder for each running conversion (see worker_folder)
+    Those run in parallel, one per CPU core, as long as there is enough memory (see ResourceMonitor)
+
+    Within a thread pool, queued processes run by priority class (see priorities)
+    This way, actions on a single picture don't wait for the bulk actions queued before them
+
+    Attributes
+    ----------
+    limits : dict of form task_type: int
+        The maximum number of processes running in parallel for each task type
+    conversion_limit : int
+        The maximum number of conversions running in parallel for each conversion program
+    isolated_conversion_limit : int
+        The same, for conversion methods using %WORKER_FOLDER% (see ConversionMethod.isolated)
+    worker_root : str
+        The folder in which worker folders are created (the temporary folder if None)
+    priorities : dict of form priority_class: int
+        The thread pool priority of each priority class ("interactive", "normal" or "background")
+    pools : dict of form resource: QtCore.QThreadPool
+        The thread pool of each resource
+    worker_folders_used : dict of form resource: set of int
+        The worker folders in use for each resource
+    lock : threading.Lock
+        Prevents 2 conversions from getting the same worker folder
+    monitor : ResourceMonitor
+        Starts conversions only when there is enough memory & CPU for them
+
+    Methods
+    -------
+    __init__
+        Initializes values to defaults
+    global_instance
+        Returns the scheduler shared by the whole application
+    resource (task_type, conversion_method)
+        Returns the name of the resource used by a given task
+    pool (resource)
+        Returns the thread pool of a resource (created if needed)
+    start (process, task_type, conversion_method, priority)
+        Queues a process in the thread pool matching its resource
+    worker_folder (conversion_method)
+        Provides a folder used only by the current conversion, while it runs
+    wait_for_done
+        Waits for all processes to finish
+    clear
+        Removes all queued processes (running processes are not stopped)
+    """
+
+    limits = {
+        "copy": 4,
+        "change_trip": 4,
+        "change_trip_folder": 4,
+        "remove": 16,  # Deletions are quick, so they're barely limited
+    }
+    conversion_limit = 1
+    isolated_conversion_limit = os.cpu_count() or 1
+    worker_root = None
+    priorities = {
+        "interactive": 200,  # Actions on a single picture: run at the next free slot
+        "normal": 100,
+        "background": 0,  # Bulk actions (whole trips): yield to all others
+    }
+    _global_instance = None
+
+    def __init__(self):
+        """Initializes values to defaults"""
+        logger.debug("ProcessScheduler.init")
+        self.pools = {}
+        self.worker_folders_used = {}
+        self.lock = threading.Lock()
+        self.monitor = ResourceMonitor()
+
+    @classmethod
+    def global_instance(cls):
+        """Returns the scheduler shared by the whole application
+
+        Returns
+        ----------
+        scheduler : ProcessScheduler
+            The application's scheduler
+        """
+        if cls._global_instance is None:
+            cls._global_instance = cls()
+        return cls._global_instance
+
+    def resource(self, task_type, conversion_method=None):
+        """Returns the name of the resource used by a given task
+
+        Conversions are grouped by program (the first element of the command)
+        Isolated conversions (see ConversionMethod.isolated) don't share resources with the others
+
+        Parameters
+        ----------
+        task_type : either "copy", "generate", "remove", "change_trip" or "change_trip_folder"
+            The type of task
+        conversion_method : models.conversionmethod.ConversionMethod
+            [Generate] The conversion method used
+
+        Returns
+        ----------
+        resource : str
+            The name of the resource
+        """
+        if task_type != "generate":
+            return task_type
+        try:
+            program = shlex.split(conversion_method.command)[0]
+        except (ValueError, IndexError):
+            program = conversion_method.command
+        if conversion_method.isolated:
+            return f"generate:{program}:isolated"
+        return f"generate:{program}"
+
+    def pool(self, resource):
+        """Returns the thread pool of a resource (created if needed)
+
+        Parameters
+        ----------
+        resource : str
+            The name of the resource (see resource)
+
+        Returns
+        ----------
+        pool : QtCore.QThreadPool
+            The thread pool of the resource
+        """
+        if resource not in self.pools:
+            task_type = resource.split(":")[0]
+            limit = self.limits.get(task_type, self.conversion_limit)
+            if resource.endswith(":isolated"):
+                limit = self.isolated_conversion_limit
+            logger.info(f"ProcessScheduler.pool: {resource} with {limit} threads")
+            self.pools[resource] = QtCore.QThreadPool()
+            self.pools[resource].setMaxThreadCount(limit)
+        return self.pools[resource]
+
+    def start(self, process, task_type, conversion_method=None, priority="normal"):
+        """Queues a process in the thread pool matching its resource
+
+        Running processes are not interrupted: the priority only changes the order of queued processes
+
+        Parameters
+        ----------
+        process : QtCore.QRunnable
+            The process to run
+        task_type : either "copy", "generate", "remove", "change_trip" or "change_trip_folder"
+            The type of task
+        conversion_method : models.conversionmethod.ConversionMethod
+            [Generate] The conversion method used
+        priority : str
+            The priority class of the process (see priorities)
+        """
+        resource = self.resource(task_type, conversion_method)
+        logger.debug(f"ProcessScheduler.start {process} in {resource} ({priority})")
+        self.pool(resource).start(process, self.priorities[priority])
+
+    @contextlib.contextmanager
+    def worker_folder(self, conversion_method):
+        """Provides a folder used only by the current conversion, while it runs
+
+        Worker folders are numbered for each resource, and reused by later conversions
+        This way, converters can keep their configuration & caches between conversions
+
+        Parameters
+        ----------
+        conversion_method : models.conversionmethod.ConversionMethod
+            The conversion method used
+
+        Yields
+        ----------
+        folder : str
+            The worker folder (None if the conversion method doesn't use %WORKER_FOLDER%)
+        """
+        if not conversion_method.isolated:
+            yield None
+            return
+        resource = self.resource("generate", conversion_method)
+        with self.lock:
+            used = self.worker_folders_used.setdefault(resource, set())
+            slot = 0
+            while slot in used:
+                slot += 1
+            used.add(slot)
+        root = self.worker_root or os.path.join(tempfile.gettempdir(), "pydive-workers")
+        folder = os.path.join(root, re.sub(r"[^\w.-]", "_", resource), str(slot))
+        logger.debug(f"ProcessScheduler.worker_folder {folder}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            yield folder
+        finally:
+            with self.lock:
+                used.discard(slot)
+
+    def wait_for_done(self):
+        """Waits for all processes to finish"""
+        for pool in list(self.pools.values()):
+            pool.waitForDone()
+
+    def clear(self):
+        """Removes all queued processes (running processes are not stopped)"""
+        logger.info("ProcessScheduler.clear")
+        for pool in self.pools.values():
+            pool.clear()
@@ -0,0 +1,162 @@
+"""Stores the resources used by tasks, to compare conversion methods & storage locations
+
+Classes
+----------
+TaskStatistics
+    Stores the resources used by each task in the database, and summarizes them
+"""
+
+import logging
+import time
+
+from PyQt5 import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStatistics:
+    """Stores the resources used by each task in the database, and summarizes them
+
+    Measures are written in batches (see flush_delay), so that large groups don't write for every task
+
+    Attributes
+    ----------
+    flush_delay : int
+        How long measures wait before being written to the database (in milliseconds)
+    database : models.database.Database
+        The database in which statistics are stored
+    followed : list of models.repository.ProcessGroup
+        The process groups whose tasks are measured
+    pending : list of dict
+        The measures not written yet
+    flush_scheduled : bool
+        Whether a flush will happen after flush_delay
+
+    Methods
+    -------
+    __init__ (database)
+        Stores a reference to the database
+    record (process_group)
+        Follows the tasks of a process group, to store their measures
+    task_row (task)
+        Returns the values stored for a given task
+    task_measured (task)
+        Stores the measures of a task (they're written to the database later)
+    flush
+        Writes the pending measures to the database
+    shutdown
+        Stops following process groups & writes the pending measures to the database
+    by_conversion_method
+        Returns the resources used by conversions, for each conversion method
+    by_storage_location
+        Returns the resources used by tasks, for each storage location
+    """
+
+    flush_delay = 1000
+
+    def __init__(self, database):
+        """Stores a reference to the database
+
+        Parameters
+        ----------
+        database : models.database.Database
+            The database in which statistics are stored
+        """
+        self.database = database
+        self.followed = []
+        self.pending = []
+        self.flush_scheduled = False
+
+    def record(self, process_group):
+        """Follows the tasks of a process group, to store their measures
+
+        Parameters
+        ----------
+        process_group : models.repository.ProcessGroup
+            The process group to follow
+        """
+        process_group.taskMeasured.connect(self.task_measured)
+        self.followed.append(process_group)
+
+    def task_row(self, task):
+        """Returns the values stored for a given task
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The measured task
+
+        Returns
+        ----------
+        row : dict
+            The values to store (see models.taskstatistic.TaskStatistic)
+        """
+        row = {
+            "finished": time.time_ns(),
+            "type": task["type"],
+            "error": "error" in task,
+            "conversion_method_id": None,
+            "source_location_id": None,
+            "target_location_id": None,
+            **task["usage"],
+        }
+        if task["conversion_method"]:
+            row["conversion_method_id"] = task["conversion_method"].id
+        if task["picture"]:
+            row["source_location_id"] = task["picture"].location.id
+        if task["target_location"]:
+            row["target_location_id"] = task["target_location"].id
+        return row
+
+    def task_measured(self, task):
+        """Stores the measures of a task (they're written to the database later)
+
+        Parameters
+        ----------
+        task : models.repository_tasks.Task
+            The measured task
+        """
+        self.pending.append(self.task_row(task))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            QtCore.QTimer.singleShot(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Writes the pending measures to the database"""
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, []
+        if pending:
+            logger.debug(f"TaskStatistics.flush {len(pending)} tasks")
+            self.database.taskstatistics_add(pending)
+
+    def shutdown(self):
+        """Stops following process groups & writes the pending measures to the database
+
+        Called when PyDive exits, before the database is closed
+        """
+        followed, self.followed = self.followed, []
+        for process_group in followed:
+            process_group.taskMeasured.disconnect(self.task_measured)
+        self.flush()
+
+    def by_conversion_method(self):
+        """Returns the resources used by conversions, for each conversion method
+
+        Returns
+        ----------
+        statistics : list of dict
+            See models.database.Database.taskstatistics_by_conversion_method
+        """
+        self.flush()
+        return self.database.taskstatistics_by_conversion_method()
+
+    def by_storage_location(self):
+        """Returns the resources used by tasks, for each storage location
+
+        Returns
+        ----------
+        statistics : list of dict
+            See models.database.Database.taskstatistics_by_storage_location
+        """
+        self.flush()
+        return self.database.taskstatistics_by_storage_location()
@@ -0,0 +1,333 @@
+"""Stores the tasks of a process group, with counters updated as tasks progress
+
+Classes
+----------
+TaskTable
+    Stores tasks column by column, with running counters
+Task
+    A single task of a TaskTable, accessed like a dict
+"""
+
+import array
+import collections.abc
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskTable:
+    """Stores tasks column by column, with running counters
+
+    Large process groups (tens of thousands of pictures) would otherwise hold one dict per task
+    Counters are updated when a task changes, so that progress is computed without reading all tasks
+
+    Each task is read & modified through a Task, which behaves like a dict
+    Values which most tasks don't have (errors, output, copy progress, ...) are stored separately
+
+    Attributes
+    ----------
+    status_names : list of str
+        The possible statuses of a task (their position is stored in statuses)
+    columns : list of str
+        The values all tasks have
+    progress_fields : list of str
+        [Copy] The values used to compute the progress of running copies
+    statuses : array.array
+        The status of each task (as a position in status_names)
+    values : dict of form column: list
+        The value of each column for each task
+    extras : dict of form key: dict of form position: value
+        The other values, for the tasks having them
+    completed : int
+        The number of stopped tasks
+    running_progress : dict of form position: float
+        The share of bytes copied for each running copy
+    running_total : float
+        The sum of running_progress
+
+    Methods
+    -------
+    __init__
+        Initializes an empty table
+    append (**values)
+        Adds a task and returns it
+    get (position, key)
+        Returns a value of a task
+    set (position, key, value)
+        Changes a value of a task, and updates counters
+    delete (position, key)
+        Removes a value of a task
+    keys (position)
+        Returns the names of the values of a task
+    update_running_progress (position)
+        Updates the share of bytes copied for a running copy
+    error_count
+        Returns the number of tasks in error
+    error_details
+        Returns the detailed error messages of all tasks in error
+    """
+
+    status_names = ["Queued", "Stopped"]
+    columns = [
+        "type",
+        "name",
+        "picture_group",
+        "picture",
+        "target_location",
+        "conversion_method",
+        "target_trip",
+        "process",
+    ]
+    progress_fields = ["bytes_done", "bytes_total"]
+
+    def __init__(self):
+        """Initializes an empty table"""
+        self.statuses = array.array("B")
+        self.values = {column: [] for column in self.columns}
+        self.extras = {}
+        self.completed = 0
+        self.running_progress = {}
+        self.running_total = 0.0
+
+    def append(self, status="Queued", **values):
+        """Adds a task and returns it
+
+        Parameters
+        ----------
+        status : str
+            The status of the task (one of status_names)
+        **values
+            The values of the task (missing columns are set to None)
+
+        Returns
+        ----------
+        task : Task
+            The new task
+        """
+        position = len(self.statuses)
+        self.statuses.append(self.status_names.index(status))
+        if status == "Stopped":
+            self.completed += 1
+        for column in self.columns:
+            self.values[column].append(values.pop(column, None))
+        for key, value in values.items():
+            self.set(position, key, value)
+        return Task(self, position)
+
+    def get(self, position, key):
+        """Returns a value of a task
+
+        Parameters
+        ----------
+        position : int
+            The position of the task
+        key : str
+            The name of the value
+
+        Returns
+        ----------
+        value : any
+            The value
+
+        Raises
+        ----------
+        KeyError
+            If the task doesn't have this value
+        """
+        if key == "status":
+            return self.status_names[self.statuses[position]]
+        if key in self.values:
+            return self.values[key][position]
+        values = self.extras.get(key, {})
+        if position not in values:
+            raise KeyError(key)
+        return values[position]
+
+    def set(self, position, key, value):
+        """Changes a value of a task, and updates counters
+
+        Parameters
+        ----------
+        position : int
+            The position of the task
+        key : str
+            The name of the value
+        value : any
+            The new value
+        """
+        if key == "status":
+            status = self.status_names.index(value)
+            if status != self.statuses[position]:
+                self.completed += 1 if value == "Stopped" else -1
+                self.statuses[position] = status
+            if value == "Stopped":
+                self.running_total -= self.running_progress.pop(position, 0)
+                if not self.running_progress:
+                    self.running_total = 0.0
+            return
+        if key in self.values:
+            self.values[key][position] = value
+            return
+        self.extras.setdefault(key, {})[position] = value
+        if key in self.progress_fields:
+            self.update_running_progress(position)
+
+    def delete(self, position, key):
+        """Removes a value of a task
+
+        Parameters
+        ----------
+        position : int
+            The position of the task
+        key : str
+            The name of the value
+
+        Raises
+        ----------
+        KeyError
+            If the task doesn't have this value (or if it can't be removed)
+        """
+        if key == "status" or key in self.values:
+            raise KeyError(key)
+        values = self.extras.get(key, {})
+        if position not in values:
+            raise KeyError(key)
+        del values[position]
+
+    def keys(self, position):
+        """Returns the names of the values of a task
+
+        Parameters
+        ----------
+        position : int
+            The position of the task
+
+        Returns
+        ----------
+        keys : list of str
+            The names of the values of the task
+        """
+        extras = [key for key, values in self.extras.items() if position in values]
+        return ["status"] + self.columns + extras
+
+    def update_running_progress(self, position):
+        """Updates the share of bytes copied for a running copy
+
+        Parameters
+        ----------
+        position : int
+            The position of the task
+        """
+        if self.get(position, "status") == "Stopped":
+            return
+        bytes_done = self.extras.get("bytes_done", {}).get(position)
+        bytes_total = self.extras.get("bytes_total", {}).get(position)
+        if not bytes_total or bytes_done is None:
+            return
+        progress = bytes_done / bytes_total
+        self.running_total += progress - self.running_progress.get(position, 0)
+        self.running_progress[position] = progress
+
+    @property
+    def error_count(self):
+        """Returns the number of tasks in error
+
+        Returns
+        ----------
+        error_count : int
+            The number of tasks in error
+        """
+        return len(self.extras.get("error", {}))
+
+    @property
+    def error_details(self):
+        """Returns the detailed error messages of all tasks in error
+
+        Returns
+        ----------
+        error_details : list of str
+            The detailed error messages, in the order errors happened
+        """
+        return list(self.extras.get("error_details", {}).values())
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self.statuses)
+        if not 0 <= position < len(self.statuses):
+            raise IndexError("task index out of range")
+        return Task(self, position)
+
+    def __iter__(self):
+        return (Task(self, position) for position in range(len(self.statuses)))
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def __bool__(self):
+        return len(self.statuses) > 0
+
+    def __repr__(self):
+        return f"TaskTable ({len(self.statuses)} tasks, {self.completed} completed)"
+
+
+class Task(collections.abc.MutableMapping):
+    """A single task of a TaskTable, accessed like a dict
+
+    Attributes
+    ----------
+    table : TaskTable
+        The table storing the task
+    position : int
+        The position of the task in the table
+
+    Methods
+    -------
+    __init__ (table, position)
+        Stores the task's table & position
+    """
+
+    __slots__ = ("table", "position")
+
+    def __init__(self, table, position):
+        """Stores the task's table & position
+
+        Parameters
+        ----------
+        table : TaskTable
+            The table storing the task
+        position : int
+            The position of the task in the table
+        """
+        self.table = table
+        self.position = position
+
+    def __getitem__(self, key):
+        return self.table.get(self.position, key)
+
+    def __setitem__(self, key, value):
+        self.table.set(self.position, key, value)
+
+    def __delitem__(self, key):
+        self.table.delete(self.position, key)
+
+    def __iter__(self):
+        return iter(self.table.keys(self.position))
+
+    def __len__(self):
+        return len(self.table.keys(self.position))
+
+    def __contains__(self, key):
+        if key == "status" or key in self.table.values:
+            return True
+        return self.position in self.table.extras.get(key, {})
+
+    def __eq__(self, other):
+        if isinstance(other, Task):
+            return self.table is other.table and self.position == other.position
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.table), self.position))
+
+    def __repr__(self):
+        return f"Task {self.position} ({self.get('name')})"
@@ -0,0 +1,127 @@
+"""Watches the storage locations & updates the repository when files change
+
+Classes
+----------
+RepositoryWatcher
+    Watches the folders of the storage locations & updates the repository when they change
+"""
+
+import logging
+import os
+from PyQt5 import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+class RepositoryWatcher(QtCore.QObject):
+    """Watches the folders of the storage locations & updates the repository when they change
+
+    Changes are grouped together: folders are read again once no change happened for debounce_delay
+    This avoids reading a folder for each file during a copy or a conversion
+
+    Attributes
+    ----------
+    pictureGroupsAdded : pyqtSignal
+        Emitted with the list of picture groups created after a change
+    debounce_delay : int
+        How long to wait after the last change before reading folders again (in ms)
+    repository : models.repository.Repository
+        The repository to update
+    watcher : QtCore.QFileSystemWatcher
+        The underlying watcher
+    pending_folders : set of str
+        The folders changed since the last refresh
+    timer : QtCore.QTimer
+        Triggers the refresh once changes stop
+
+    Methods
+    -------
+    __init__ (repository)
+        Stores a reference to the repository & sets up the watcher
+    watch_locations
+        Watches all folders of the storage locations
+    on_folder_changed (path)
+        Stores the changed folder & delays the refresh
+    refresh
+        Reads changed folders again & updates the watched folders
+    stop
+        Stops watching folders & discards pending changes
+    """
+
+    pictureGroupsAdded = QtCore.pyqtSignal(list)
+    debounce_delay = 1000
+
+    def __init__(self, repository):
+        """Stores a reference to the repository & sets up the watcher
+
+        Parameters
+        ----------
+        repository : models.repository.Repository
+            The repository to update
+        """
+        logger.debug("RepositoryWatcher.init")
+        super().__init__()
+        self.repository = repository
+        self.watcher = QtCore.QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.on_folder_changed)
+        self.pending_folders = set()
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.debounce_delay)
+        self.timer.timeout.connect(self.refresh)
+
+    def watch_locations(self):
+        """Watches all folders of the storage locations (as found during the last scan)"""
+        folders = set()
+        for location in self.repository.storage_locations:
+            folders.update(self.repository.database.scanindex_folders(location.path))
+        watched = set(self.watcher.directories())
+        if watched - folders:
+            self.watcher.removePaths(list(watched - folders))
+        if folders - watched:
+            self.watcher.addPaths(list(folders - watched))
+        logger.info(f"RepositoryWatcher.watch_locations: {len(folders)} folders")
+
+    def on_folder_changed(self, path):
+        """Stores the changed folder & delays the refresh
+
+        Parameters
+        ----------
+        path : str
+            The folder that changed
+        """
+        logger.debug(f"RepositoryWatcher.on_folder_changed {path}")
+        self.pending_folders.add(path.rstrip(os.path.sep) or os.path.sep)
+        self.timer.start()
+
+    def refresh(self):
+        """Reads changed folders again & updates the watched folders"""
+        folders = sorted(self.pending_folders)
+        self.pending_folders = set()
+        logger.info(f"RepositoryWatcher.refresh on {len(folders)} folders")
+        picture_groups = self.repository.refresh_folders(folders)
+
+        # Watch new subfolders & forget the deleted ones
+        watched = set(self.watcher.directories())
+        for folder in folders:
+            subfolders = set(self.repository.database.scanindex_folders(folder))
+            subtree = {
+                path
+                for path in watched
+                if path == folder or path.startswith(folder + os.path.sep)
+            }
+            if subtree - subfolders:
+                self.watcher.removePaths(list(subtree - subfolders))
+            if subfolders - watched:
+                self.watcher.addPaths(list(subfolders - watched))
+
+        if picture_groups:
+            self.pictureGroupsAdded.emit(picture_groups)
+
+    def stop(self):
+        """Stops watching folders & discards pending changes"""
+        logger.info("RepositoryWatcher.stop")
+        self.timer.stop()
+        self.pending_folders = set()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
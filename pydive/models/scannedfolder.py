@@ -0,0 +1,78 @@
+"""Scan index: the folders & pictures found during the last scan of the storage locations
+
+It allows to re-read only the folders that changed since the last scan
+
+Classes
+----------
+ScannedFolder
+    A folder found during the last scan
+ScannedFile
+    A picture file found during the last scan
+"""
+import sqlalchemy.orm
+
+from sqlalchemy import Column, Integer, String, ForeignKey
+
+from .base import Base
+
+
+class ScannedFolder(Base):
+    """A folder found during the last scan
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    path : str
+        The path of the folder (without final separator)
+    mtime : int
+        The modification time of the folder, in nanoseconds (-1 to force a re-read)
+    files : list of ScannedFile
+        The picture files found in this folder
+    """
+
+    __tablename__ = "scanned_folders"
+    id = Column(Integer, primary_key=True)
+    path = Column(String(1000), nullable=False, unique=True, index=True)
+    mtime = Column(Integer, nullable=False)
+
+    files = sqlalchemy.orm.relationship(
+        "ScannedFile", back_populates="folder", cascade="all, delete-orphan"
+    )
+
+    def __repr__(self):
+        return f"{self.path} @ {self.mtime}"
+
+
+class ScannedFile(Base):
+    """A picture file found during the last scan
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    folder_id : int
+        The ID of the folder containing the file
+    folder : ScannedFolder
+        The folder containing the file
+    name : str
+        The file name (with extension, without folder)
+    size : int
+        The file size, in bytes
+    mtime : int
+        The modification time of the file, in nanoseconds
+    """
+
+    __tablename__ = "scanned_files"
+    id = Column(Integer, primary_key=True)
+    folder_id = Column(
+        Integer, ForeignKey("scanned_folders.id"), nullable=False, index=True
+    )
+    name = Column(String(250), nullable=False)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Integer, nullable=False)
+
+    folder = sqlalchemy.orm.relationship("ScannedFolder", back_populates="files")
+
+    def __repr__(self):
+        return f"{self.name} ({self.size} bytes) @ {self.mtime}"
@@ -14,7 +14,7 @@ import enum
 import sqlalchemy.orm
 import os.path
 
-from sqlalchemy import Column, Integer, String, Enum
+from sqlalchemy import Column, Integer, String, Enum, Boolean
 
 from .base import Base, ValidationException
 
@@ -51,6 +51,9 @@ class StorageLocation(Base):
         The absolute path of the folder
     name : str
         The name that should be displayed in the screens
+    hardlinks : bool
+        [Picture folders] Whether copies within this location may be hard links (see FileCopier)
+        Both paths are then the same file: changing or damaging one changes the other
 
     Methods
     -------
@@ -66,6 +69,7 @@ class StorageLocation(Base):
     name = Column(String(250), nullable=False)
     type = Column(Enum(StorageLocationType, validate_strings=True), nullable=False)
     path = Column(String(250), nullable=False)
+    hardlinks = Column(Boolean, nullable=False, default=False)
 
     @sqlalchemy.orm.validates("name")
     def validate_name(self, key, value):
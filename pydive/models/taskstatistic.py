@@ -0,0 +1,62 @@
+"""Task statistics: the resources used by each task, to compare conversion methods & storage locations
+
+Classes
+----------
+TaskStatistic
+    The resources used by a single task
+"""
+from sqlalchemy import Column, Integer, String, Boolean, Float
+
+from .base import Base
+
+
+class TaskStatistic(Base):
+    """The resources used by a single task
+
+    Attributes
+    ----------
+    id : int
+        Unique ID
+    finished : int
+        When the task finished, in nanoseconds since the epoch
+    type : str
+        The type of task ("copy", "generate", "remove", "change_trip" or "change_trip_folder")
+    error : bool
+        Whether the task ended in error
+    conversion_method_id : int
+        [Generate] The ID of the conversion method
+    source_location_id : int
+        The ID of the storage location of the source picture
+    target_location_id : int
+        [Copy or Generate] The ID of the target storage location
+    wall_time : float
+        The duration of the task (in seconds)
+    user_time : float
+        The CPU time spent in the task's code (in seconds)
+    system_time : float
+        The CPU time spent by the system for the task (in seconds)
+    peak_memory : int
+        [Generate] The peak memory used by the converter (in bytes)
+    bytes_read : int
+        The size of the files read
+    bytes_written : int
+        The size of the files written
+    """
+
+    __tablename__ = "task_statistics"
+    id = Column(Integer, primary_key=True)
+    finished = Column(Integer, nullable=False)
+    type = Column(String(50), nullable=False)
+    error = Column(Boolean, nullable=False, default=False)
+    conversion_method_id = Column(Integer, nullable=True, index=True)
+    source_location_id = Column(Integer, nullable=True, index=True)
+    target_location_id = Column(Integer, nullable=True, index=True)
+    wall_time = Column(Float, nullable=False, default=0)
+    user_time = Column(Float, nullable=False, default=0)
+    system_time = Column(Float, nullable=False, default=0)
+    peak_memory = Column(Integer, nullable=True)
+    bytes_read = Column(Integer, nullable=False, default=0)
+    bytes_written = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"{self.type} in {self.wall_time:.2f}s"
@@ -0,0 +1,71 @@
+"""Memory benchmark: loads synthetic pictures in a repository
+
+Usage: python tests/benchmark_pictures.py [number of pictures]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(os.path.join(BASE_DIR, "pydive"))
+
+import models.database
+import models.repository
+
+from models.storagelocation import StorageLocation
+from models.category import Category
+from models.picture import Picture, PictureResolver
+
+
+def synthetic_paths(locations, categories, nb_pictures):
+    """Generates picture paths: 1 RAW + 2 conversions per group, 500 groups per trip"""
+    suffixes = ["", "_DT", "_RT"]
+    for i in range(nb_pictures):
+        group, conversion = divmod(i, len(suffixes))
+        trip, picture = divmod(group, 500)
+        location = locations[trip % len(locations)]
+        category = categories[picture % 4] if picture % 4 < len(categories) else ""
+        yield os.path.join(
+            location.path,
+            f"Trip {trip:05}",
+            category.relative_path if category else "",
+            f"IMG_{picture:04}{suffixes[conversion]}.{'CR2' if conversion == 0 else 'jpg'}",
+        )
+
+
+def run(nb_pictures):
+    database = models.database.Database(":memory:")
+    repository = models.repository.Repository(database)
+    locations = [
+        StorageLocation(
+            id=i, name=name, type="picture_folder", path=f"/synthetic/{name}"
+        )
+        for i, name in enumerate(["Camera", "Temporary", "Archive"])
+    ]
+    categories = [
+        Category(id=1, name="Top", relative_path="Sélection"),
+        Category(id=2, name="Bof", relative_path="Bof"),
+    ]
+
+    resolver = PictureResolver(locations, categories)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for path in synthetic_paths(locations, categories, nb_pictures):
+        picture = Picture(locations, categories, path, resolver)
+        repository.add_picture_to_groups(picture)
+    duration = time.perf_counter() - start
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Pictures loaded: {nb_pictures}")
+    print(f"Picture groups: {len(repository.picture_groups)}")
+    print(f"Trips: {len(repository.trips)}")
+    print(f"Duration: {duration:.1f} s")
+    print(f"Memory: {memory / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB)")
+    print(f"Memory per picture: {memory / nb_pictures:.0f} bytes")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,51 @@
+"""Speed benchmark: finishes the tasks of a large process group
+
+Usage: python tests/benchmark_process_groups.py [number of tasks]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(os.path.join(BASE_DIR, "pydive"))
+
+import models.repository
+
+
+def run(nb_tasks):
+    process_group = models.repository.ProcessGroup("Benchmark")
+    finished = []
+    process_group.finished.connect(lambda: finished.append(True))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = [
+        process_group.tasks.append(type="copy", name=f"IMG_{i:06}.CR2", output="")
+        for i in range(nb_tasks)
+    ]
+    duration_add = time.perf_counter() - start
+    memory, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Each task reports its progress, then 1 in 100 fails
+    start = time.perf_counter()
+    for i, task in enumerate(tasks):
+        process_group.task_progress(task, 50, 100, 1000.0)
+        if i % 100 == 0:
+            process_group.task_error(task, "Copy failed", f"Copy failed: {i}")
+        else:
+            process_group.task_done(task, f"/synthetic/IMG_{i:06}.CR2")
+    duration_run = time.perf_counter() - start
+
+    print(f"Tasks: {nb_tasks}")
+    print(f"Completed: {process_group.count_completed}")
+    print(f"Errors: {process_group.count_errors}")
+    print(f"Finished signals: {len(finished)}")
+    print(f"Adding tasks: {duration_add:.2f} s")
+    print(f"Finishing tasks: {duration_run:.2f} s")
+    print(f"Memory per task: {memory / nb_tasks:.0f} bytes")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,10 +1,12 @@
 import os
 import shutil
 import sys
+import time
 import pytest
 import datetime
 import logging
 import zipfile
+from PyQt5 import QtCore
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(os.path.join(BASE_DIR, "pydive"))
@@ -24,6 +26,18 @@ from models.divelog import DiveLog
 logging.basicConfig(level=logging.CRITICAL)
 
 
+def shutdown_repository(repository):
+    # Process groups signal their end through the event loop: wait for them while the database still exists
+    scheduler = models.repository.ProcessScheduler.global_instance()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        scheduler.wait_for_done()
+        QtCore.QCoreApplication.processEvents()
+        if all(group.is_finished for group in repository.process_groups):
+            break
+    repository.shutdown()
+
+
 def pytest_configure():
     pytest.DATABASE_FILE = ":memory:"
     pytest.BASE_FOLDER = (
@@ -124,11 +138,14 @@ def pydive_db(pydive_empty_db):
 
 
 @pytest.fixture
-def pydive_repository(pydive_db):
+# qapp is here so that signals of background processes are delivered
+def pydive_repository(qapp, pydive_db):
     repository = models.repository.Repository(pydive_db)
     repository.load_pictures()
     yield repository
 
+    shutdown_repository(repository)
+
 
 @pytest.fixture
 def pydive_fake_pictures():
@@ -249,8 +266,10 @@ def pydive_mainwindow(qtbot, pydive_db, pydive_repository):
 
     yield mainwindow
 
-    mainwindow.database.session.close()
-    mainwindow.database.engine.dispose()
+    mainwindow.controllers["Pictures"].watcher.stop()
+    mainwindow.controllers["Pictures"].loader.cancel()
+    mainwindow.controllers["Pictures"].loader.wait()
+    # The database is closed by pydive_db, after pydive_repository is shut down
 
 
 @pytest.fixture
@@ -261,6 +280,10 @@ def pydive_mainwindow_empty_db(qtbot, pydive_empty_db):
 
     yield mainwindow
 
+    mainwindow.controllers["Pictures"].watcher.stop()
+    mainwindow.controllers["Pictures"].loader.cancel()
+    mainwindow.controllers["Pictures"].loader.wait()
+    shutdown_repository(repository)
     mainwindow.database.session.close()
     mainwindow.database.engine.dispose()
 
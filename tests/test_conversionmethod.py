@@ -1,10 +1,12 @@
 import os
 import sys
+import sqlite3
 import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(os.path.join(BASE_DIR, "pydive"))
 
+import models.database
 from models.base import ValidationException
 from models.conversionmethod import ConversionMethod
 
@@ -46,7 +48,15 @@ class TestStorageLocation:
         forbidden_values = {
             "name": ["", None, "a" * 251],
             "suffix": ["a" * 51],
-            "command": ["", None, "a" * 1001],
+            "command": [
+                "",
+                None,
+                "a" * 1001,
+                "cp %SOURCE_FILES% %TARGET_FILE%",
+                "cp %SOURCE_FILE% %SOURCE_FILES% %TARGET_FOLDER%",
+                "cp %SOURCE_FILES% /tmp",
+            ],
+            "timeout": [0, -10, "abc", "12s"],
         }
 
         for field in forbidden_values:
@@ -65,6 +75,42 @@ class TestStorageLocation:
                     test_name + " - exception.invalid_value is wrong"
                 )
 
+    def test_batch(self):
+        conversion_method = ConversionMethod(
+            id=10,
+            name="rawtherapee",
+            suffix="RT",
+            command="rawtherapee-cli -o %TARGET_FOLDER% -c %SOURCE_FILE%",
+        )
+        assert conversion_method.batch is False, "Single picture commands"
+
+        conversion_method.command = (
+            "rawtherapee-cli -o %TARGET_FOLDER% -c %SOURCE_FILES%"
+        )
+        assert conversion_method.batch is True, "Batch commands use %SOURCE_FILES%"
+
+    def test_database_upgrade(self, tmp_path):
+        # Database created before the timeout column existed
+        database_file = os.path.join(tmp_path, "old.sqlite")
+        connection = sqlite3.connect(database_file)
+        connection.execute(
+            "CREATE TABLE conversion_methods (id INTEGER PRIMARY KEY, name VARCHAR(250) NOT NULL, suffix VARCHAR(50), command VARCHAR(1000) NOT NULL)"
+        )
+        connection.execute(
+            "INSERT INTO conversion_methods VALUES (1, 'DarkTable', 'DT', 'cp %SOURCE_FILE% %TARGET_FILE%')"
+        )
+        connection.commit()
+        connection.close()
+
+        database = models.database.Database(database_file)
+        conversion_method = database.conversionmethods_get_by_id(1)
+        assert conversion_method.timeout is None, "Missing columns are added"
+        conversion_method.timeout = 60
+        database.session.commit()
+        assert (
+            database.conversionmethods_get_by_id(1).timeout == 60
+        ), "Added columns can be used"
+
 
 if __name__ == "__main__":
     pytest.main(["-s", __file__])
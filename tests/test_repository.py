@@ -1,5 +1,9 @@
+import errno
+import hashlib
 import os
 import sys
+import threading
+import time
 import pytest
 from PyQt5 import QtCore, QtTest
 
@@ -7,8 +11,16 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(os.path.join(BASE_DIR, "pydive"))
 
 from models.storagelocation import StorageLocation
-from models.picture import Picture, StorageLocationCollision
+from models.picture import Picture, PictureResolver, StorageLocationCollision
 from models.category import Category
+from models.repository_scheduler import ProcessScheduler
+from models.repository_executor import ConversionExecutor
+from models.repository_resources import ResourceMonitor, ResourceUsage
+from models.repository_copier import FileCopier, CopyCancelled, CopyVerificationError
+from models.repository_fingerprints import FingerprintIndex
+from models.repository_tasks import TaskTable
+from models.repository_cache import ConversionCache
+from models.repository import Repository, ProcessGroup
 
 
 class TestRepository:
@@ -17,7 +29,7 @@ class TestRepository:
         self.all_files = pydive_fake_pictures
 
     def helper_check_paths(self, test, should_exist=[], should_not_exist=[]):
-        QtCore.QThreadPool.globalInstance().waitForDone()
+        ProcessScheduler.global_instance().wait_for_done()
         # Add "should exist" to "all_files" so they get deleted later
         self.all_files += should_exist
         self.all_files = list(set(self.all_files))
@@ -154,6 +166,251 @@ class TestRepository:
             pytest.fail(test)
         assert cm.value.args[0] == "recognition failed", test
 
+    def test_picture_resolver(self, pydive_db):
+        locations = pydive_db.storagelocations_get_picture_folders()
+        categories = pydive_db.categories_get()
+        resolver = PictureResolver(locations, categories)
+
+        test = "Picture resolver: location, trip & category"
+        folder = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta", "Sélection")
+        location, trip, category = resolver.resolve(folder, folder)
+        assert location.name == "Temporary", test
+        assert trip == "Malta", test
+        assert category.name == "Top", test
+
+        test = "Picture resolver: location root"
+        folder = os.path.join(pytest.BASE_FOLDER, "DCIM")
+        assert resolver.resolve(folder, folder)[1:] == ("", ""), test
+
+        test = "Picture resolver: folder outside of locations"
+        with pytest.raises(StorageLocationCollision) as cm:
+            resolver.resolve(pytest.BASE_FOLDER, pytest.BASE_FOLDER)
+            pytest.fail(test)
+
+        test = "Picture resolver: nested locations are detected without any picture"
+        nested_location = StorageLocation(
+            id=999,
+            name="Nested",
+            type="picture_folder",
+            path=os.path.join(pytest.BASE_FOLDER, "Empty", "Nothing"),
+        )
+        with pytest.raises(StorageLocationCollision) as cm:
+            PictureResolver(locations + [nested_location], categories)
+            pytest.fail(test)
+        assert cm.value.path == nested_location.path, test
+
+    def test_load_pictures_incremental(self, pydive_repository, pydive_db, monkeypatch):
+        # Files are just created, so the scan index must be told they're not "racy"
+        pydive_repository.racy_delay = -(10**12)
+        pydive_repository.load_pictures()
+        malta_group = pydive_repository.trips["Malta"]["IMG001"]
+
+        test = "Incremental load: scan index is stored"
+        index = pydive_db.scanindex_get(os.path.join(pytest.BASE_FOLDER, "Temporary"))
+        malta = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta")
+        assert "IMG002.CR2" in index[malta][1], test
+        assert "Sélection" in index[malta][2], test
+
+        test = "Incremental load: the folders of the scan index can be listed alone"
+        folders = pydive_db.scanindex_folders(
+            os.path.join(pytest.BASE_FOLDER, "Temporary")
+        )
+        assert sorted(folders) == sorted(index), test
+
+        test = "Incremental load: unchanged folders are not read again"
+        read_folders = []
+        scandir = os.scandir
+        monkeypatch.setattr(
+            os, "scandir", lambda path: read_folders.append(path) or scandir(path)
+        )
+        pydive_repository.load_pictures()
+        assert read_folders == [], test
+        assert pydive_repository.trips["Malta"]["IMG001"] is malta_group, test
+
+        test = "Incremental load: new pictures are found"
+        open(os.path.join(malta, "IMG003.CR2"), "w").close()
+        self.all_files.append(os.path.join("Temporary", "Malta", "IMG003.CR2"))
+        pydive_repository.load_pictures()
+        assert read_folders == [malta], test
+        assert "IMG003" in pydive_repository.trips["Malta"], test
+        assert pydive_repository.trips["Malta"]["IMG001"] is malta_group, test
+
+        test = "Incremental load: deleted pictures are removed"
+        os.unlink(os.path.join(pytest.BASE_FOLDER, "Temporary", "Korea", "IMG030.CR2"))
+        self.all_files.remove(os.path.join("Temporary", "Korea", "IMG030.CR2"))
+        pydive_repository.load_pictures()
+        assert (
+            "Temporary" not in pydive_repository.trips["Korea"]["IMG030"].locations
+        ), test
+        assert "Archive" in pydive_repository.trips["Korea"]["IMG030"].locations, test
+
+    def test_repository_loader(self, pydive_repository, qtbot):
+        from models.repository_loader import RepositoryLoader
+
+        trips = {
+            trip: sorted(groups) for trip, groups in pydive_repository.trips.items()
+        }
+        pydive_repository.configuration = None
+        loader = RepositoryLoader(pydive_repository)
+
+        test = "Background load: picture groups are streamed as folders are read"
+        added_groups = []
+        progress = []
+        loader.pictureGroupsAdded.connect(added_groups.extend)
+        loader.loadProgress.connect(lambda *args: progress.append(args))
+        with qtbot.waitSignal(loader.loadFinished, timeout=10000) as blocker:
+            loader.load()
+        assert blocker.args == [True], test
+        # Some groups may be merged into others afterwards
+        assert all(g in added_groups for g in pydive_repository.picture_groups), test
+        assert progress[-1] == (loader.folders_read, loader.pictures_found), test
+        assert loader.pictures_found > 0, test
+
+        test = "Background load: same result as a synchronous load"
+        assert {
+            trip: sorted(groups) for trip, groups in pydive_repository.trips.items()
+        } == trips, test
+        assert pydive_repository.configuration is not None, test
+
+        test = "Background load: cancelled load forces a full reload next time"
+        with qtbot.waitSignal(loader.loadFinished, timeout=10000) as blocker:
+            loader.load()
+            loader.cancel()
+        assert blocker.args == [False], test
+        assert pydive_repository.configuration is None, test
+
+    def test_refresh_folders(self, pydive_repository):
+        malta = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta")
+        malta_group = pydive_repository.trips["Malta"]["IMG001"]
+
+        test = "Refresh folders: new pictures are found"
+        open(os.path.join(malta, "IMG004.CR2"), "w").close()
+        self.all_files.append(os.path.join("Temporary", "Malta", "IMG004.CR2"))
+        new_picture_groups = pydive_repository.refresh_folders([malta])
+        assert [g.name for g in new_picture_groups] == ["IMG004"], test
+        assert "IMG004" in pydive_repository.trips["Malta"], test
+        assert pydive_repository.trips["Malta"]["IMG001"] is malta_group, test
+
+        test = "Refresh folders: deleted pictures are removed"
+        os.unlink(os.path.join(malta, "IMG004.CR2"))
+        self.all_files.remove(os.path.join("Temporary", "Malta", "IMG004.CR2"))
+        assert pydive_repository.refresh_folders([malta]) == [], test
+        assert "IMG004" not in pydive_repository.trips["Malta"], test
+
+        test = "Refresh folders: folders outside of storage locations are ignored"
+        outside = os.path.join(pytest.BASE_FOLDER, "Archive_outside_DB")
+        assert pydive_repository.refresh_folders([outside]) == [], test
+
+    def test_bulk_update_signals(self, pydive_repository, pydive_db):
+        malta = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta")
+        malta_group = pydive_repository.trips["Malta"]["IMG001"]
+        signals = {"added": 0, "removed": 0, "changed": 0}
+
+        def count(signal):
+            signals[signal] += 1
+
+        malta_group.pictureAdded.connect(lambda _a, _b: count("added"))
+        malta_group.pictureRemoved.connect(lambda _a, _b: count("removed"))
+        malta_group.pictureGroupChanged.connect(lambda: count("changed"))
+
+        test = "Bulk update: a single signal for many pictures"
+        for i in range(50):
+            open(os.path.join(malta, f"IMG001_{i}.jpg"), "w").close()
+            self.all_files.append(os.path.join("Temporary", "Malta", f"IMG001_{i}.jpg"))
+        pydive_repository.refresh_folders([malta])
+        assert len(malta_group.pictures) == 53, test
+        assert signals == {"added": 0, "removed": 0, "changed": 1}, test
+
+        test = "Bulk update: nested contexts emit signals at the end"
+        locations = pydive_db.storagelocations_get_picture_folders()
+        with pydive_repository.bulk_update():
+            with pydive_repository.bulk_update():
+                pydive_repository.remove_picture(
+                    malta_group, locations[1], os.path.join(malta, "IMG001_0.jpg")
+                )
+            assert signals["changed"] == 1, test
+        assert signals == {"added": 0, "removed": 0, "changed": 2}, test
+
+        test = (
+            "Bulk update: signals are emitted for each picture outside of bulk updates"
+        )
+        pydive_repository.remove_picture(
+            malta_group, locations[1], os.path.join(malta, "IMG001_1.jpg")
+        )
+        assert signals == {"added": 0, "removed": 1, "changed": 2}, test
+
+    def test_repository_watcher(self, pydive_repository, qtbot):
+        from models.repository_watcher import RepositoryWatcher
+
+        watcher = RepositoryWatcher(pydive_repository)
+        watcher.timer.setInterval(100)
+        watcher.watch_locations()
+        malta = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta")
+
+        test = "Repository watcher: all folders are watched"
+        assert malta in watcher.watcher.directories(), test
+
+        test = "Repository watcher: new pictures are added"
+        with qtbot.waitSignal(watcher.pictureGroupsAdded, timeout=5000) as blocker:
+            open(os.path.join(malta, "IMG005.CR2"), "w").close()
+            open(os.path.join(malta, "IMG005_RT.jpg"), "w").close()
+            self.all_files.append(os.path.join("Temporary", "Malta", "IMG005.CR2"))
+            self.all_files.append(os.path.join("Temporary", "Malta", "IMG005_RT.jpg"))
+        assert [g.name for g in blocker.args[0]] == ["IMG005"], test
+        picture_group = pydive_repository.trips["Malta"]["IMG005"]
+        assert sorted(picture_group.pictures) == ["", "RT"], test
+
+        test = "Repository watcher: refreshes don't change the scan start of loads"
+        scan_start = pydive_repository.scan_start
+        pydive_repository.refresh_folders([malta])
+        assert pydive_repository.scan_start == scan_start, test
+
+        test = "Repository watcher: new folders are watched"
+        new_folder = os.path.join(malta, "New")
+        with qtbot.waitSignal(watcher.timer.timeout, timeout=5000):
+            os.mkdir(new_folder)
+        qtbot.waitUntil(
+            lambda: new_folder in watcher.watcher.directories(), timeout=1000
+        )
+        with qtbot.waitSignal(watcher.pictureGroupsAdded, timeout=5000):
+            open(os.path.join(new_folder, "IMG006.CR2"), "w").close()
+        assert "IMG006" in pydive_repository.trips["Malta/New"], test
+        os.unlink(os.path.join(new_folder, "IMG006.CR2"))
+        os.rmdir(new_folder)
+        watcher.stop()
+
+    def test_load_pictures_group_merge(self, pydive_repository, pydive_db):
+        locations = pydive_db.storagelocations_get_picture_folders()
+        categories = pydive_db.categories_get()
+        folder = os.path.join(pytest.BASE_FOLDER, "Temporary", "Egypt")
+        nb_groups_before = len(pydive_repository.picture_groups)
+
+        test = "Group merge: each converted picture creates its own group"
+        for name in ["IMG090_DT.jpg", "IMG090_RT.jpg"]:
+            picture = Picture(locations, categories, os.path.join(folder, name))
+            pydive_repository.add_picture_to_groups(picture)
+        assert len(pydive_repository.picture_groups) == nb_groups_before + 2, test
+
+        test = "Group merge: the RAW picture merges both groups"
+        picture = Picture(locations, categories, os.path.join(folder, "IMG090.CR2"))
+        pydive_repository.add_picture_to_groups(picture)
+        assert len(pydive_repository.picture_groups) == nb_groups_before + 1, test
+        assert list(pydive_repository.trips["Egypt"]) == ["IMG090"], test
+        picture_group = pydive_repository.trips["Egypt"]["IMG090"]
+        assert sorted(picture_group.pictures) == ["", "DT", "RT"], test
+
+        test = "Group merge: index matches the renamed group"
+        matching = pydive_repository.picture_group_index.find_matching(
+            "Egypt", "IMG090_DT"
+        )
+        assert matching == [picture_group], test
+        matching = pydive_repository.picture_group_index.find_matching("Egypt", "IMG09")
+        assert matching == [picture_group], test
+        matching = pydive_repository.picture_group_index.find_matching(
+            "Malta", "IMG090"
+        )
+        assert matching == [], test
+
     def test_load_pictures_while_process_running(
         self, pydive_repository, pydive_db, qtbot
     ):
@@ -165,11 +422,15 @@ class TestRepository:
         )
 
         # Trigger picture load
-        with qtbot.waitSignal(picture_group.pictureAdded, timeout=2000):
-            pydive_repository.load_pictures()
+        # The new picture is found either by the load (bulk update) or by the process
+        signals = []
+        picture_group.pictureAdded.connect(lambda *args: signals.append("added"))
+        picture_group.pictureGroupChanged.connect(lambda: signals.append("changed"))
+        pydive_repository.load_pictures()
 
-            # Check picture group has a running process
-            assert len(picture_group.tasks) == 1, "Task is added to picture group"
+        # Check picture group has a running process
+        assert len(picture_group.tasks) == 1, "Task is added to picture group"
+        qtbot.waitUntil(lambda: len(signals) > 0, timeout=2000)
 
     # List of Repository.copy_pictures tests - "KO" denotes when a ValueError is raised
     # The copy with category is tested only in test_repository_copy_pictures_all_parameters
@@ -215,7 +476,7 @@ class TestRepository:
             picture_group,
             conversion_method,
         )
-        QtCore.QThreadPool.globalInstance().waitForDone()
+        ProcessScheduler.global_instance().wait_for_done()
 
         expected_signal = QtTest.QSignalSpy(process.finished)
         assert expected_signal.isValid()
@@ -227,6 +488,766 @@ class TestRepository:
 
         self.helper_check_paths(test, new_files)
 
+    def test_task_table(self):
+        test = "Task table: values are stored & read like a dict"
+        table = TaskTable()
+        task = table.append(type="copy", name="IMG040.CR2", output="")
+        assert task["status"] == "Queued", test
+        assert task["type"] == "copy", test
+        assert task["process"] is None, test
+        assert "error" not in task, test
+        assert task.get("error") is None, test
+        with pytest.raises(KeyError):
+            task["error"]
+        task["output"] += "started"
+        assert table[0]["output"] == "started", test
+        assert dict(task)["name"] == "IMG040.CR2", test
+
+        test = "Task table: counters follow status & errors"
+        other_task = table.append(status="Stopped", type="copy", name="IMG041.CR2")
+        assert len(table) == 2, test
+        assert table.completed == 1, test
+        task["error"] = "Copy failed"
+        task["error_details"] = "Copy failed: IMG040.CR2"
+        task["status"] = "Stopped"
+        task["status"] = "Stopped"
+        assert table.completed == 2, test
+        assert table.error_count == 1, test
+        assert table.error_details == ["Copy failed: IMG040.CR2"], test
+        assert [t["name"] for t in table] == ["IMG040.CR2", "IMG041.CR2"], test
+        assert table[-1] == other_task, test
+        with pytest.raises(IndexError):
+            table[2]
+
+        test = "Task table: progress of running copies"
+        task = table.append(type="copy", name="IMG042.CR2")
+        task["bytes_total"] = 200
+        task["bytes_done"] = 50
+        assert table.running_total == 0.25, test
+        task["bytes_done"] = 150
+        assert table.running_total == 0.75, test
+        task["status"] = "Stopped"
+        assert table.running_total == 0, test
+        assert table.running_progress == {}, test
+
+    def test_repository_process_group_counters(self, qtbot):
+        test = "Process group: counters & progress without running the tasks"
+        process_group = ProcessGroup("Counters")
+        tasks = [
+            process_group.tasks.append(type="copy", name=f"IMG{i:03}.CR2")
+            for i in range(4)
+        ]
+        process_group.task_progress(tasks[0], 50, 100, 10.0)
+        assert process_group.progress == 0.125, test
+        process_group.task_done(tasks[0], "/IMG000.CR2")
+        process_group.task_error(tasks[1], "Copy failed", "Copy failed: IMG001")
+        assert process_group.count_completed == 2, test
+        assert process_group.count_errors == 1, test
+        assert process_group.count_total == 4, test
+        assert process_group.error_details == ["Copy failed: IMG001"], test
+        assert process_group.progress == 0.5, test
+        assert tasks[0]["file_path"] == "/IMG000.CR2", test
+
+        test = "Process group: finished is emitted once all tasks are done"
+        process_group.task_done(tasks[2], "/IMG002.CR2")
+        with qtbot.waitSignal(process_group.finished, timeout=1000):
+            process_group.task_done(tasks[3], "/IMG003.CR2")
+        assert process_group.progress == 1, test
+
+        test = "Process group: finished is emitted only once"
+        finished = []
+        process_group.finished.connect(lambda: finished.append(True))
+        process_group.task_progress(tasks[3], 100, 100, 10.0)
+        process_group.update_progress()
+        assert finished == [], test
+
+        test = "Process group: empty groups don't fail on late progress updates"
+        empty_group = ProcessGroup("Empty")
+        empty_group.update_progress()
+        assert empty_group.progress == 0, test
+
+    def test_process_scheduler(self, pydive_db, tmp_path):
+        scheduler = ProcessScheduler()
+        methods = {m.suffix: m for m in pydive_db.conversionmethods_get()}
+
+        test = "Process scheduler: each task type has its own resource"
+        assert scheduler.resource("copy") == "copy", test
+        assert scheduler.resource("remove") == "remove", test
+        assert scheduler.pool("copy") is not scheduler.pool("remove"), test
+
+        test = "Process scheduler: conversions are limited by program"
+        resource = scheduler.resource("generate", methods["DT"])
+        assert resource == "generate:" + methods["DT"].command.split()[0], test
+        assert scheduler.pool(resource).maxThreadCount() == 1, test
+        assert scheduler.pool("copy").maxThreadCount() == scheduler.limits["copy"], test
+
+        test = "Process scheduler: copies don't wait for conversions"
+        conversion_running = QtCore.QSemaphore()
+        conversion_done = QtCore.QSemaphore()
+        copy_done = QtCore.QSemaphore()
+
+        class Conversion(QtCore.QRunnable):
+            def run(self):
+                conversion_running.release()
+                conversion_done.acquire()
+
+        class Copy(QtCore.QRunnable):
+            def run(self):
+                copy_done.release()
+
+        scheduler.start(Conversion(), "generate", methods["DT"])
+        scheduler.start(Conversion(), "generate", methods["DT"])
+        assert conversion_running.tryAcquire(1, 2000), test
+        scheduler.start(Copy(), "copy")
+        assert copy_done.tryAcquire(1, 2000), test
+        assert not conversion_running.tryAcquire(1, 100), test
+
+        test = "Process scheduler: conversions using the same program run one by one"
+        conversion_done.release()
+        assert conversion_running.tryAcquire(1, 2000), test
+        conversion_done.release()
+        scheduler.wait_for_done()
+
+        test = "Process scheduler: interactive tasks run before queued bulk tasks"
+        order = []
+
+        class Task(QtCore.QRunnable):
+            def __init__(self, name):
+                super().__init__()
+                self.name = name
+
+            def run(self):
+                if self.name == "blocker":
+                    conversion_done.acquire()
+                order.append(self.name)
+
+        scheduler.start(Task("blocker"), "generate", methods["DT"])
+        for i in range(3):
+            scheduler.start(Task(f"bulk {i}"), "generate", methods["DT"], "background")
+        scheduler.start(Task("normal"), "generate", methods["DT"])
+        scheduler.start(Task("interactive"), "generate", methods["DT"], "interactive")
+        conversion_done.release()
+        scheduler.wait_for_done()
+        assert order == [
+            "blocker",
+            "interactive",
+            "normal",
+            "bulk 0",
+            "bulk 1",
+            "bulk 2",
+        ], test
+
+        test = "Process scheduler: isolated conversions run in parallel"
+        isolated = methods["RT"]
+        isolated.command = "darktable-cli %SOURCE_FILE% %TARGET_FILE% --core --configdir %WORKER_FOLDER%"
+        resource = scheduler.resource("generate", isolated)
+        assert resource == "generate:darktable-cli:isolated", test
+        assert (
+            scheduler.pool(resource).maxThreadCount()
+            == scheduler.isolated_conversion_limit
+        ), test
+
+        test = "Process scheduler: each running conversion has its own worker folder"
+        scheduler.worker_root = str(tmp_path)
+        with scheduler.worker_folder(isolated) as folder_1:
+            with scheduler.worker_folder(isolated) as folder_2:
+                assert folder_1 != folder_2, test
+                assert os.path.isdir(folder_1), test
+                assert os.path.isdir(folder_2), test
+                assert folder_1.startswith(str(tmp_path)), test
+
+        test = "Process scheduler: worker folders are reused"
+        with scheduler.worker_folder(isolated) as folder_3:
+            assert folder_3 == folder_1, test
+
+        test = "Process scheduler: other conversions don't get a worker folder"
+        with scheduler.worker_folder(methods["DT"]) as folder:
+            assert folder is None, test
+
+    def test_conversion_executor(self):
+        test = "Conversion executor: output is streamed"
+        output = []
+        executor = ConversionExecutor("echo converted ; echo warning >&2")
+        returncode = executor.run(lambda stream, text: output.append((stream, text)))
+        assert returncode == 0, test
+        assert ("stdout", "converted\n") in output, test
+        assert executor.output == {"stdout": "converted\n", "stderr": "warning\n"}, test
+
+        test = "Conversion executor: commands are killed after the timeout"
+        executor = ConversionExecutor("sleep 30", timeout=1)
+        start = time.monotonic()
+        executor.run()
+        assert time.monotonic() - start < 10, test
+        assert executor.timed_out, test
+        assert executor.returncode != 0, test
+
+        test = "Conversion executor: commands with closed output are killed after the timeout"
+        executor = ConversionExecutor("exec sleep 30 >/dev/null 2>&1", timeout=1)
+        start = time.monotonic()
+        executor.run()
+        assert time.monotonic() - start < 10, test
+        assert executor.timed_out, test
+        assert executor.returncode != 0, test
+
+        test = "Conversion executor: kill stops the command & its subprocesses"
+        executor = ConversionExecutor("sleep 30 & sleep 30 ; wait")
+        threading.Timer(0.5, executor.kill).start()
+        start = time.monotonic()
+        executor.run()
+        assert time.monotonic() - start < 10, test
+        assert executor.killed and not executor.timed_out, test
+
+        test = "Conversion executor: kill before the run prevents it"
+        executor = ConversionExecutor("echo converted")
+        executor.kill()
+        assert executor.run() is None, test
+        assert executor.output["stdout"] == "", test
+
+        test = "Conversion executor: the peak memory of the command is measured"
+        executor = ConversionExecutor(
+            f"{sys.executable} -c 'data = bytearray(64 * 2**20); import time; time.sleep(1)'"
+        )
+        executor.memory_interval = 0.1
+        executor.run()
+        assert executor.peak_memory > 64 * 2**20, test
+
+        test = "Conversion executor: the resources used by the command are measured"
+        assert executor.rusage.ru_maxrss * 1024 > 64 * 2**20, test
+        assert executor.rusage.ru_utime + executor.rusage.ru_stime > 0, test
+
+    def test_resource_monitor(self, pydive_db, tmp_path):
+        method = pydive_db.conversionmethods_get_by_suffix("DT")
+        monitor = ResourceMonitor()
+        monitor.proc_folder = str(tmp_path)
+        monitor.poll_interval = 0
+
+        def write_proc(memory_available, cpu_times):
+            with open(os.path.join(tmp_path, "meminfo"), "w") as meminfo:
+                meminfo.write("MemTotal:       16000000 kB\n")
+                meminfo.write(f"MemAvailable:   {memory_available // 1024} kB\n")
+            with open(os.path.join(tmp_path, "stat"), "w") as stat:
+                stat.write("cpu  " + " ".join(str(t) for t in cpu_times) + "\n")
+
+        class Executor:
+            memory = 0
+            peak_memory = 0
+            killed = False
+
+        test = "Resource monitor: memory & CPU load are read from /proc"
+        write_proc(4 * 2**30, [100, 0, 100, 800, 0, 0, 0])
+        assert monitor.memory_available() == 4 * 2**30, test
+        assert monitor.cpu_load() is None, test
+        write_proc(4 * 2**30, [200, 0, 200, 1400, 0, 0, 0])
+        assert monitor.cpu_load() == 0.25, test
+
+        test = "Resource monitor: unknown conversion methods get the default memory"
+        assert monitor.expected_memory(method) == monitor.default_peak_memory, test
+
+        test = "Resource monitor: the peak memory is learned from past conversions"
+        monitor.record(method, 3 * 2**30)
+        assert monitor.expected_memory(method) == 3 * 2**30, test
+        monitor.record(method, 2**30)
+        assert monitor.expected_memory(method) == 2 * 2**30, test
+
+        test = "Resource monitor: a conversion always starts if none is running"
+        write_proc(0, [300, 0, 300, 1500, 0, 0, 0])
+        with monitor.lock:
+            assert monitor.can_start(method), test
+
+        test = "Resource monitor: conversions wait for the memory they need"
+        running = Executor()
+        monitor.running.append((method, running))
+        write_proc(3 * 2**30, [400, 0, 400, 2300, 0, 0, 0])
+        with monitor.lock:
+            assert not monitor.can_start(method), test
+        running.memory = 2 * 2**30
+        with monitor.lock:
+            assert monitor.can_start(method), test
+
+        test = "Resource monitor: conversions wait while the CPU is busy"
+        write_proc(3 * 2**30, [1400, 0, 400, 2300, 0, 0, 0])
+        with monitor.lock:
+            assert not monitor.can_start(method), test
+
+        test = "Resource monitor: cancelled conversions stop waiting"
+        waiting = Executor()
+        waiting.killed = True
+        with monitor.admit(method, waiting):
+            assert (method, waiting) in monitor.running, test
+        assert (method, waiting) not in monitor.running, test
+        monitor.running.clear()
+
+        test = "Resource monitor: the memory of a session is read from /proc"
+        assert ResourceMonitor.session_memory(os.getsid(0)) > 0, test
+
+    def test_resource_usage(self):
+        test = "Resource usage: the CPU time of the current thread is measured"
+        usage = ResourceUsage()
+        end = time.monotonic() + 0.2
+        while time.monotonic() < end:
+            pass
+        usage.stop()
+        assert usage.wall_time >= 0.2, test
+        assert usage.user_time + usage.system_time > 0.1, test
+        assert usage.peak_memory is None, test
+
+        test = "Resource usage: the resources of subprocesses are added"
+        executor = ConversionExecutor(f"{sys.executable} -c 'sum(range(10**6))'")
+        executor.run()
+        cpu_time = usage.user_time + usage.system_time
+        usage.add_child(executor.rusage, executor.peak_memory)
+        assert usage.user_time + usage.system_time > cpu_time, test
+        assert usage.peak_memory == executor.rusage.ru_maxrss * 1024, test
+
+        test = "Resource usage: times are divided between the tasks sharing them"
+        usage.bytes_read = 1000
+        values = usage.values(4)
+        assert values["wall_time"] == usage.wall_time / 4, test
+        assert values["user_time"] == usage.user_time / 4, test
+        assert values["bytes_read"] == 1000, test
+
+    def test_database_task_statistics(self, pydive_db):
+        test = "Task statistics: each task is counted once per storage location"
+        row = {
+            "finished": 0,
+            "error": False,
+            "conversion_method_id": None,
+            "user_time": 0.0,
+            "system_time": 0.0,
+            "peak_memory": None,
+        }
+        pydive_db.taskstatistics_add(
+            [
+                # Copy within a location, then copy from location 2 to location 3
+                {
+                    **row,
+                    "type": "copy",
+                    "source_location_id": 2,
+                    "target_location_id": 2,
+                    "wall_time": 1.0,
+                    "bytes_read": 100,
+                    "bytes_written": 100,
+                },
+                {
+                    **row,
+                    "type": "copy",
+                    "source_location_id": 2,
+                    "target_location_id": 3,
+                    "wall_time": 2.0,
+                    "bytes_read": 200,
+                    "bytes_written": 200,
+                },
+                # Removal: no target location
+                {
+                    **row,
+                    "type": "remove",
+                    "source_location_id": 3,
+                    "target_location_id": None,
+                    "wall_time": 4.0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                },
+            ]
+        )
+        locations = {
+            location["location_id"]: location
+            for location in pydive_db.taskstatistics_by_storage_location()
+        }
+        assert locations[2] == {
+            "location_id": 2,
+            "tasks": 1,
+            "bytes_read": 300,
+            "bytes_written": 100,
+            "wall_time": 1.0,
+        }, test
+        assert locations[3] == {
+            "location_id": 3,
+            "tasks": 2,
+            "bytes_read": 0,
+            "bytes_written": 200,
+            "wall_time": 6.0,
+        }, test
+
+    def test_repository_store_peak_memory(self, pydive_repository, pydive_db):
+        test = "Conversion memory: the peak memory is stored in the database"
+        method = pydive_db.conversionmethods_get_by_suffix("RT")
+        monitor = ProcessScheduler.global_instance().monitor
+        monitor.peak_memory[method.id] = 3 * 2**30
+        pydive_repository.store_peak_memory()
+        pydive_db.session.expire_all()
+        method = pydive_db.conversionmethods_get_by_suffix("RT")
+        assert method.peak_memory == 3 * 2**30, test
+
+        test = "Conversion memory: the stored peak memory is used after a restart"
+        del monitor.peak_memory[method.id]
+        monitor.seed(method)
+        assert monitor.expected_memory(method) == 3 * 2**30, test
+        del monitor.peak_memory[method.id]
+
+    def test_repository_generate_cancel_running(
+        self, pydive_repository, pydive_db, qtbot
+    ):
+        test = "Conversion cancel: a running conversion is killed"
+        method = pydive_db.conversionmethods_get_by_suffix("DT")
+        method.command = "echo started ; sleep 30 ; cp %SOURCE_FILE% %TARGET_FILE%"
+        picture_group = pydive_repository.trips["Malta"]["IMG002"]
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        process_group = pydive_repository.generate_pictures(
+            test, target_location, ["DT"], picture_group=picture_group
+        )
+        task = process_group.tasks[0]
+        qtbot.waitUntil(lambda: task["output"] == "started\n", timeout=5000)
+
+        start = time.monotonic()
+        with qtbot.waitSignal(process_group.finished, timeout=5000):
+            process_group.cancel_tasks()
+        assert time.monotonic() - start < 5, test
+        assert task["error"] == "Task cancelled", test
+
+        test = "Conversion cancel: no picture is generated"
+        self.helper_check_paths(test)
+
+        test = "Conversion timeout: the conversion is in error"
+        method.timeout = 1
+        process_group = pydive_repository.generate_pictures(
+            test, target_location, ["DT"], picture_group=picture_group
+        )
+        with qtbot.waitSignal(process_group.finished, timeout=5000):
+            pass
+        assert process_group.tasks[0]["error"] == "Conversion timed out", test
+        self.helper_check_paths(test)
+
+    def test_file_copier(self, tmp_path, monkeypatch):
+        source_file = os.path.join(tmp_path, "IMG001.CR2")
+        target_file = os.path.join(tmp_path, "Copy", "IMG001.CR2")
+        os.makedirs(os.path.dirname(target_file))
+        with open(source_file, "wb") as file:
+            file.write(os.urandom(3 * 2**20 + 100))
+        os.utime(source_file, (1000000000, 1000000000))
+
+        # Source & target are on the same filesystem: force actual copies
+        monkeypatch.setattr(FileCopier, "same_device_methods", [])
+
+        test = "File copier: progress is reported after each chunk"
+        progress = []
+        copier = FileCopier(source_file, target_file)
+        copier.chunk_size = 2**20
+        copier.copy(lambda done, total: progress.append((done, total)))
+        total = 3 * 2**20 + 100
+        assert progress[-1] == (total, total), test
+        assert progress[0] == (0, total), test
+        assert len(progress) == 5, test
+        assert copier.throughput() > 0, test
+
+        test = "File copier: the copy has the same content & metadata"
+        with open(source_file, "rb") as source, open(target_file, "rb") as target:
+            assert source.read() == target.read(), test
+        assert os.stat(target_file).st_mtime == 1000000000, test
+        assert os.listdir(os.path.dirname(target_file)) == ["IMG001.CR2"], test
+        os.remove(target_file)
+
+        test = "File copier: cancelled copies leave no file behind"
+        copier = FileCopier(source_file, target_file)
+        copier.chunk_size = 2**20
+        with pytest.raises(CopyCancelled):
+            copier.copy(lambda done, total: done and copier.cancel())
+        assert copier.bytes_done == 2**20, test
+        assert os.listdir(os.path.dirname(target_file)) == [], test
+
+        test = "File copier: verified copies compute the hash of the contents"
+        copier = FileCopier(source_file, target_file, verify=True)
+        copier.copy()
+        with open(source_file, "rb") as source:
+            assert copier.digest == hashlib.blake2b(source.read()).hexdigest(), test
+        assert copier.target_stat.st_mtime_ns == copier.source_stat.st_mtime_ns, test
+        os.remove(target_file)
+
+        test = "File copier: copies that don't match the source are deleted"
+        copier = FileCopier(source_file, target_file, verify=True)
+        monkeypatch.setattr(copier, "written_digest", lambda target: "corrupted")
+        with pytest.raises(CopyVerificationError):
+            copier.copy()
+        assert os.listdir(os.path.dirname(target_file)) == [], test
+
+        test = "File copier: on the same filesystem, data is not copied"
+        monkeypatch.setattr(FileCopier, "same_device_methods", ["hardlink"])
+        copier = FileCopier(source_file, target_file)
+        copier.copy()
+        assert copier.method == "hardlink", test
+        assert os.stat(target_file).st_ino == os.stat(source_file).st_ino, test
+        os.remove(target_file)
+
+        test = "File copier: reflinks are used when supported, otherwise data is copied"
+        monkeypatch.setattr(FileCopier, "same_device_methods", ["reflink"])
+        copier = FileCopier(source_file, target_file)
+        copier.copy()
+        assert copier.method in ["reflink", "copy"], test
+        assert os.stat(target_file).st_ino != os.stat(source_file).st_ino, test
+        with open(source_file, "rb") as source, open(target_file, "rb") as target:
+            assert source.read() == target.read(), test
+        assert os.listdir(os.path.dirname(target_file)) == ["IMG001.CR2"], test
+        os.remove(target_file)
+
+        test = "File copier: verified copies always copy the data"
+        monkeypatch.setattr(FileCopier, "same_device_methods", ["hardlink"])
+        copier = FileCopier(source_file, target_file, verify=True)
+        copier.copy()
+        assert copier.method == "copy", test
+        os.remove(target_file)
+        monkeypatch.setattr(FileCopier, "same_device_methods", [])
+
+        test = "File copier: falls back to buffered copies"
+
+        def unsupported(*args):
+            raise OSError(errno.EXDEV, "Unsupported")
+
+        monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+        monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+        copier = FileCopier(source_file, target_file)
+        copier.copy()
+        with open(source_file, "rb") as source, open(target_file, "rb") as target:
+            assert source.read() == target.read(), test
+
+    def test_conversion_cache(self, tmp_path):
+        cache = ConversionCache(os.path.join(tmp_path, "Cache"), max_size=350)
+        source_file = os.path.join(tmp_path, "IMG001.CR2")
+        renamed_file = os.path.join(tmp_path, "IMG002.CR2")
+        for path in [source_file, renamed_file]:
+            with open(path, "wb") as file:
+                file.write(b"RAW picture")
+        command = "cp %SOURCE_FILE% %TARGET_FILE%"
+
+        test = "Conversion cache: identical contents have the same key"
+        key = cache.key(source_file, command)
+        assert key == cache.key(renamed_file, command), test
+
+        test = "Conversion cache: spaces in the command are ignored"
+        assert key == cache.key(source_file, "cp  %SOURCE_FILE%   %TARGET_FILE% "), test
+
+        test = "Conversion cache: a different command has a different key"
+        assert key != cache.key(source_file, "cp -p %SOURCE_FILE% %TARGET_FILE%"), test
+
+        test = "Conversion cache: missing conversions are not found"
+        target_file = os.path.join(tmp_path, "IMG001_DT.jpg")
+        assert cache.fetch(key, target_file) is False, test
+        assert not os.path.exists(target_file), test
+
+        test = "Conversion cache: stored conversions are found"
+        with open(target_file, "wb") as file:
+            file.write(b"A" * 100)
+        cache.store(key, target_file)
+        os.remove(target_file)
+        assert cache.fetch(key, target_file) is True, test
+        with open(target_file, "rb") as file:
+            assert file.read() == b"A" * 100, test
+
+        test = "Conversion cache: the least recently used conversions are removed"
+        keys = [key, "other1", "other2"]
+        for i, other_key in enumerate(keys[1:]):
+            cache.store(other_key, target_file)
+            os.utime(cache.path(other_key), ns=(i, i))
+        os.utime(cache.path(key), ns=(5, 5))
+        cache.fetch("other1", os.path.join(tmp_path, "other1.jpg"))
+        cache.store("other3", target_file)
+        assert os.path.exists(cache.path(key)), test
+        assert os.path.exists(cache.path("other1")), test
+        assert not os.path.exists(cache.path("other2")), test
+        assert os.path.exists(cache.path("other3")), test
+
+        test = "Conversion cache: the source's fingerprint is taken from the index"
+        cache.fingerprints = FingerprintIndex(None)
+        cache.fingerprints.add(source_file, os.stat(source_file), "0" * 128)
+        assert cache.key(source_file, command) != key, test
+        assert cache.key(renamed_file, command) == key, test
+        assert renamed_file in cache.fingerprints.pending, test
+
+    def test_repository_copy_pictures_progress(self, pydive_repository, pydive_db):
+        test = "Picture copy: the task stores the bytes copied"
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        picture_group = pydive_repository.trips["Malta"]["IMG001"]
+        process_group = pydive_repository.copy_pictures(
+            test, target_location, picture_group=picture_group
+        )
+        ProcessScheduler.global_instance().wait_for_done()
+        QtCore.QCoreApplication.processEvents()
+
+        copies = [t for t in process_group.tasks if "bytes_total" in t]
+        assert copies, test
+        assert all(t["bytes_done"] == t["bytes_total"] for t in copies), test
+        assert process_group.progress == 1, test
+        self.all_files += [
+            os.path.relpath(t["process"].target_file, pytest.BASE_FOLDER)
+            for t in process_group.tasks
+            if t["process"]
+        ]
+
+    def test_repository_journal_resume(self, pydive_repository, pydive_db, qtbot):
+        test = "Journal: process groups are stored before they run"
+        archive = pydive_db.storagelocation_get_by_name("Archive")
+        picture_group = pydive_repository.trips["Sweden"]["IMG040"]
+        raw_picture = picture_group.pictures[""][0]
+        rt_picture = picture_group.pictures["RT"][0]
+        other_picture_group = pydive_repository.trips["Sweden"]["IMG041"]
+        other_picture = other_picture_group.pictures[""][0]
+
+        # Simulate a process group interrupted before running
+        process_group = ProcessGroup("Interrupted")
+        for group, picture in [
+            (picture_group, raw_picture),
+            (other_picture_group, other_picture),
+        ]:
+            process_group.add_process("copy", group, picture, target_location=archive)
+        process_group.add_process("remove", picture_group, rt_picture)
+        group_id = pydive_repository.journal.record(process_group)
+        assert group_id is not None, test
+        assert pydive_repository.journal.unfinished() == [], test
+
+        test = "Journal: stopped tasks are written after a delay"
+        pydive_repository.journal.task_stopped(group_id, process_group.tasks[2])
+        assert pydive_db.journal_get()[0].tasks[2].status == "Queued", test
+        pydive_repository.journal.flush()
+        assert pydive_db.journal_get()[0].tasks[2].status == "Stopped", test
+        pydive_db.journal_update(group_id, [2], "Queued")
+
+        # Some tasks were done before PyDive stopped
+        other_copy = os.path.join("Archive", "Sweden", "IMG041.CR2")
+        with open(os.path.join(pytest.BASE_FOLDER, other_copy), "wb"):
+            pass
+        os.remove(rt_picture.path)
+
+        test = "Journal: interrupted process groups are found after a restart"
+        repository = Repository(pydive_db)
+        journal_groups = repository.journal.unfinished()
+        assert len(journal_groups) == 1, test
+        assert journal_groups[0].label == "Interrupted", test
+        assert [t.type for t in journal_groups[0].tasks] == [
+            "copy",
+            "copy",
+            "remove",
+        ], test
+
+        test = "Journal: tasks already done are skipped when resuming"
+        process_groups = repository.resume_process_groups(journal_groups)
+        with qtbot.waitSignal(process_groups[0].finished, timeout=5000):
+            pass
+        tasks = process_groups[0].tasks
+        assert [t.get("skipped", False) for t in tasks] == [False, True, True], test
+        assert process_groups[0].count_errors == 0, test
+
+        new_files = [os.path.join("Archive", "Sweden", "IMG040.CR2"), other_copy]
+        should_not_exist = [os.path.join("Temporary", "Sweden", "IMG040_RT.jpg")]
+        self.helper_check_paths(test, new_files, should_not_exist)
+
+        test = "Journal: finished process groups are removed"
+        qtbot.waitUntil(lambda: pydive_db.journal_get() == [])
+        assert repository.journal.unfinished() == [], test
+        repository.shutdown()
+
+    def test_repository_copy_pictures_verified(
+        self, pydive_repository, pydive_db, qtbot, monkeypatch
+    ):
+        test = "Verified copy: the hash of the source & copy is stored"
+        source = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta", "IMG002.CR2")
+        target = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta", "IMG002.CR2")
+        os.remove(target)
+        with open(source, "w") as file:
+            file.write("RAW picture")
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        source_location = pydive_db.storagelocation_get_by_name("Temporary")
+        picture_group = pydive_repository.trips["Malta"]["IMG002"]
+        process_group = pydive_repository.copy_pictures(
+            test,
+            target_location,
+            source_location,
+            picture_group=picture_group,
+            conversion_method="",
+            verify=True,
+        )
+        qtbot.waitUntil(
+            lambda: target in pydive_db.fingerprints_get([target]), timeout=2000
+        )
+        assert process_group.count_errors == 0, test
+        fingerprints = pydive_db.fingerprints_get([source, target])
+        expected = hashlib.blake2b(b"RAW picture").hexdigest()
+        assert fingerprints[source][2] == expected, test
+        assert fingerprints[target][2] == expected, test
+        assert fingerprints[target][1] == os.stat(target).st_mtime_ns, test
+
+        test = "Verified copy: later checks reuse the stored hash"
+        fingerprints = FingerprintIndex(pydive_db)
+        hashed = []
+        monkeypatch.setattr(FingerprintIndex, "hash_file", hashed.append)
+        assert fingerprints.same_content(source, target), test
+        assert hashed == [], test
+
+    def test_repository_copy_pictures_identical_target(
+        self, pydive_repository, pydive_db, qtbot, monkeypatch
+    ):
+        source = os.path.join(pytest.BASE_FOLDER, "Temporary", "Malta", "IMG002.CR2")
+        target = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta", "IMG002.CR2")
+        for path in [source, target]:
+            with open(path, "w") as file:
+                file.write("RAW picture")
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        source_location = pydive_db.storagelocation_get_by_name("Temporary")
+        picture_group = pydive_repository.trips["Malta"]["IMG002"]
+
+        test = "Picture copy: identical pictures are skipped"
+        process_group = pydive_repository.copy_pictures(
+            test, target_location, source_location, picture_group=picture_group
+        )
+        with qtbot.waitSignal(process_group.finished, timeout=2000):
+            pass
+        tasks = {os.path.basename(t["picture"].path): t for t in process_group.tasks}
+        assert tasks["IMG002.CR2"]["skipped"], test
+        assert "error" not in tasks["IMG002.CR2"], test
+        assert not tasks["IMG002_RT.jpg"].get("skipped"), test
+        self.helper_check_paths(
+            test, [os.path.join("Archive", "Malta", "IMG002_RT.jpg")]
+        )
+
+        test = "Picture copy: fingerprints are stored"
+        fingerprints = pydive_db.fingerprints_get([source, target])
+        assert len(fingerprints) == 2, test
+        assert fingerprints[source][2] == fingerprints[target][2], test
+
+        test = "Picture copy: copies store the fingerprints of the source & copy"
+        copied = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta", "IMG002_RT.jpg")
+        rt_source = os.path.join(
+            pytest.BASE_FOLDER, "Temporary", "Malta", "IMG002_RT.jpg"
+        )
+        fingerprints = pydive_db.fingerprints_get([rt_source, copied])
+        assert len(fingerprints) == 2, test
+        assert fingerprints[copied][1] == os.stat(copied).st_mtime_ns, test
+
+        test = "Picture copy: copying again doesn't read the files"
+        hashed = []
+        monkeypatch.setattr(FingerprintIndex, "hash_file", hashed.append)
+        pydive_repository.fingerprints.cache = {}  # As after a restart
+        process_group = pydive_repository.copy_pictures(
+            test, target_location, source_location, picture_group=picture_group
+        )
+        with qtbot.waitSignal(process_group.finished, timeout=2000):
+            pass
+        assert all(task["skipped"] for task in process_group.tasks), test
+        assert process_group.count_errors == 0, test
+        assert hashed == [], test
+        monkeypatch.undo()
+
+        test = "Picture copy: pictures with different contents are in conflict"
+        with open(target, "w") as file:
+            file.write("Different picture")
+        process_group = pydive_repository.copy_pictures(
+            test, target_location, source_location, picture_group=picture_group
+        )
+        with qtbot.waitSignal(process_group.finished, timeout=2000):
+            pass
+        tasks = {os.path.basename(t["picture"].path): t for t in process_group.tasks}
+        assert tasks["IMG002.CR2"]["error"] == "Target file already exists", test
+        assert "different contents" in tasks["IMG002.CR2"]["error_details"], test
+        with open(target, "r") as file:
+            assert file.read() == "Different picture", test
+
     def test_repository_copy_pictures_all_parameters(
         self, pydive_repository, pydive_db
     ):
@@ -254,6 +1275,49 @@ class TestRepository:
 
         self.helper_check_paths(test, new_files)
 
+    def test_repository_copy_pictures_hardlinks(self, pydive_repository, pydive_db):
+        test = "Picture copy: by default, copies are never hard links"
+        location = pydive_db.storagelocation_get_by_name("Temporary")
+        archive = pydive_db.storagelocation_get_by_name("Archive")
+        target_category = pydive_db.category_get_by_name("Top")
+        picture_group = pydive_repository.trips["Sweden"]["IMG040"]
+        source_file = os.path.join(
+            pytest.BASE_FOLDER, "Temporary", "Sweden", "IMG040.CR2"
+        )
+        copy_file = os.path.join(
+            pytest.BASE_FOLDER, "Temporary", "Sweden", "Sélection", "IMG040.CR2"
+        )
+
+        pydive_repository.copy_pictures(
+            test, location, location, "Sweden", picture_group, "", target_category
+        )
+        ProcessScheduler.global_instance().wait_for_done()
+        assert os.stat(copy_file).st_ino != os.stat(source_file).st_ino, test
+        os.remove(copy_file)
+
+        test = "Picture copy: hard links are used within a location, if enabled"
+        location.hardlinks = True
+        pydive_repository.copy_pictures(
+            test, location, location, "Sweden", picture_group, "", target_category
+        )
+        ProcessScheduler.global_instance().wait_for_done()
+        assert os.stat(copy_file).st_ino == os.stat(source_file).st_ino, test
+
+        test = "Picture copy: copies to another location are never hard links"
+        archive.hardlinks = True
+        pydive_repository.copy_pictures(
+            test, archive, location, "Sweden", picture_group, ""
+        )
+        new_files = [
+            os.path.join("Temporary", "Sweden", "Sélection", "IMG040.CR2"),
+            os.path.join("Archive", "Sweden", "IMG040.CR2"),
+        ]
+        self.helper_check_paths(test, new_files)
+        archive_file = os.path.join(
+            pytest.BASE_FOLDER, "Archive", "Sweden", "IMG040.CR2"
+        )
+        assert os.stat(archive_file).st_ino != os.stat(source_file).st_ino, test
+
     def test_repository_copy_pictures_missing_category(
         self, pydive_repository, pydive_db
     ):
@@ -821,6 +1885,99 @@ class TestRepository:
 
         self.helper_check_paths(test, new_files, should_not_exist)
 
+    def test_repository_change_trip_folder(self, pydive_repository, qtbot):
+        test = "Picture change trip: whole trip renamed to a new trip"
+        target_trip = "Norway"
+        source_trip = "Sweden"
+
+        process_group = pydive_repository.change_trip_pictures(
+            test, target_trip, source_trip, None
+        )
+        qtbot.waitUntil(lambda: source_trip not in pydive_repository.trips)
+
+        # One task per folder, none per picture
+        task_types = [t["type"] for t in process_group.tasks]
+        assert task_types == ["change_trip_folder"] * 2, test
+
+        new_files = [
+            os.path.join("Temporary", "Norway", "IMG040.CR2"),
+            os.path.join("Temporary", "Norway", "IMG041.CR2"),
+            os.path.join("Temporary", "Norway", "IMG040_RT.jpg"),
+            os.path.join("Temporary", "Norway", "IMG040_DT.jpg"),
+            os.path.join("Archive", "Norway", "IMG040_convert.jpg"),
+        ]
+        should_not_exist = [
+            os.path.join("Temporary", "Sweden", ""),
+            os.path.join("Temporary", "Sweden", "IMG040.CR2"),
+            os.path.join("Temporary", "Sweden", "IMG041.CR2"),
+            os.path.join("Temporary", "Sweden", "IMG040_RT.jpg"),
+            os.path.join("Temporary", "Sweden", "IMG040_DT.jpg"),
+            os.path.join("Archive", "Sweden", ""),
+            os.path.join("Archive", "Sweden", "IMG040_convert.jpg"),
+        ]
+        self.helper_check_paths(test, new_files, should_not_exist)
+
+        # Pictures are updated in memory, without scanning the folders again
+        picture_group = pydive_repository.trips["Norway"]["IMG040"]
+        picture = picture_group.pictures[""][0]
+        new_path = os.path.join("Temporary", "Norway", "IMG040.CR2")
+        assert picture.path == os.path.join(pytest.BASE_FOLDER, new_path), test
+        assert picture.trip == target_trip, test
+        assert len(picture_group.pictures["convert"]) == 1, test
+        assert "IMG041" in pydive_repository.trips["Norway"], test
+
+        test = "Picture change trip: renaming folders is measured"
+        qtbot.waitUntil(lambda: all("usage" in t for t in process_group.tasks))
+        pydive_repository.statistics.flush()
+        locations = pydive_repository.statistics.by_storage_location()
+        assert sum(location["tasks"] for location in locations) == 2, test
+
+    def test_repository_change_trip_folder_nested(self, pydive_repository, qtbot):
+        test = "Picture change trip: trip renamed to a nested trip"
+        process_group = pydive_repository.change_trip_pictures(
+            test, os.path.join("2023", "Korea"), "Korea", None
+        )
+        qtbot.waitUntil(lambda: "Korea" not in pydive_repository.trips)
+
+        task_types = [t["type"] for t in process_group.tasks]
+        assert task_types == ["change_trip_folder"] * 2, test
+        new_files = [
+            os.path.join("Temporary", "2023", "Korea", "IMG030.CR2"),
+            os.path.join("Archive", "2023", "Korea", "IMG030_RT.jpg"),
+        ]
+        should_not_exist = [
+            os.path.join("Temporary", "Korea", ""),
+            os.path.join("Temporary", "Korea", "IMG030.CR2"),
+            os.path.join("Archive", "Korea", ""),
+            os.path.join("Archive", "Korea", "IMG030_RT.jpg"),
+        ]
+        self.helper_check_paths(test, new_files, should_not_exist)
+
+        test = "Picture change trip: folders containing nested trips are not renamed"
+        nested_file = os.path.join(pytest.BASE_FOLDER, "Temporary", "Sweden", "Gozo")
+        os.makedirs(nested_file)
+        nested_file = os.path.join(nested_file, "IMG060.CR2")
+        with open(nested_file, "w") as file:
+            file.write("Nested trip")
+        pydive_repository.load_pictures()
+        nested_trip = os.path.join("Sweden", "Gozo")
+        assert nested_trip in pydive_repository.trips, test
+
+        process_group = pydive_repository.change_trip_pictures(
+            test, "Norway", "Sweden", None
+        )
+        qtbot.waitUntil(lambda: "Sweden" not in pydive_repository.trips)
+        ProcessScheduler.global_instance().wait_for_done()
+
+        # Archive is renamed at once, Temporary picture by picture
+        task_types = [t["type"] for t in process_group.tasks]
+        assert task_types.count("change_trip_folder") == 1, test
+        assert task_types.count("change_trip") == 4, test
+        assert os.path.exists(nested_file), test
+        picture = pydive_repository.trips[nested_trip]["IMG060"].pictures[""][0]
+        assert picture.path == nested_file, test
+        os.remove(nested_file)
+
     def test_repository_change_trip_no_parameter(self, pydive_repository):
         test = "Picture change trip: no parameter provided"
         target_trip = "Korea"
@@ -1012,6 +2169,28 @@ class TestRepository:
             len(pydive_repository.picture_groups) == nb_groups_before_deletion - 1
         ), "picture_group deletion when pictures are removed"
 
+    def test_trips_index_maintained(self, pydive_repository, pydive_db):
+        trips = pydive_repository.trips
+        picture_group = pydive_repository.picture_group_get("Georgia", "IMG011_convert")
+        assert picture_group is trips["Georgia"]["IMG011_convert"], "Trips: lookup"
+        assert pydive_repository.picture_group_get("Georgia", "IMG999") is None
+
+        test = "Trips: group rename is reflected"
+        locations = pydive_db.storagelocations_get_picture_folders()
+        categories = pydive_db.categories_get()
+        path = os.path.join(pytest.BASE_FOLDER, "Temporary", "Georgia", "IMG011.CR2")
+        picture_group.add_picture(Picture(locations, categories, path))
+        assert "IMG011_convert" not in trips["Georgia"], test
+        assert pydive_repository.picture_group_get("Georgia", "IMG011") is picture_group
+
+        test = "Trips: group deletion is reflected"
+        picture_group = pydive_repository.trips["Korea"]["IMG030"]
+        for conversion_type in list(picture_group.pictures):
+            for picture in list(picture_group.pictures[conversion_type]):
+                picture_group.remove_picture(picture)
+        assert "Korea" not in pydive_repository.trips, test
+        assert pydive_repository.trips is trips, test
+
     def test_picture_group_name_change(self, pydive_repository, pydive_db):
         # Adding a picture that is more "basic" than an existing group
         # Situation: group 'IMG011_convert' exists, now we find picture IMG011.CR2
@@ -6,6 +6,9 @@ from PyQt5 import QtCore
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(os.path.join(BASE_DIR, "pydive"))
 
+from models.repository_scheduler import ProcessScheduler
+from models.repository_cache import ConversionCache
+
 
 # This requires actual image files, which are heavy & take time to process
 # Hence the separate test class
@@ -16,7 +19,7 @@ class TestRepositoryGeneration:
         yield
 
     def helper_check_paths(self, test, should_exist=[], should_not_exist=[]):
-        QtCore.QThreadPool.globalInstance().waitForDone()
+        ProcessScheduler.global_instance().wait_for_done()
         # Add "should exist" to "all_files" so they get deleted later
         self.all_files += should_exist
         self.all_files = list(set(self.all_files))
@@ -299,6 +302,172 @@ class TestRepositoryGeneration:
 
         self.helper_check_paths(test)
 
+    def test_repo_generate_conversion_cache(
+        self, pydive_db, pydive_repository, qtbot, tmp_path
+    ):
+        test = "Picture generate: the conversion is stored in the cache"
+        pydive_repository.conversion_cache = ConversionCache(str(tmp_path))
+        pydive_repository.conversion_cache.fingerprints = pydive_repository.fingerprints
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        picture_group = pydive_repository.trips["Malta"]["IMG001"]
+        target_file = os.path.join(
+            pytest.BASE_FOLDER, "Archive", "Malta", "IMG001_DT.jpg"
+        )
+
+        pydive_repository.generate_pictures(
+            test, target_location, ["DT"], None, None, picture_group
+        )
+        process_group = pydive_repository.process_groups[-1]
+        qtbot.waitUntil(lambda: process_group.count_completed == 1)
+        assert len(os.listdir(tmp_path)) == 1, test
+        with open(target_file, "rb") as file:
+            converted = file.read()
+
+        test = "Picture generate: the source's fingerprint is stored for the next conversions"
+        source_file = process_group.tasks[0]["picture"].path
+        assert pydive_db.fingerprints_get([source_file]), test
+
+        test = "Picture generate: the conversion is taken from the cache"
+        os.remove(target_file)
+        pydive_repository.generate_pictures(
+            test, target_location, ["DT"], None, None, picture_group
+        )
+        process_group = pydive_repository.process_groups[-1]
+        qtbot.waitUntil(lambda: process_group.count_completed == 1)
+        task = process_group.tasks[0]
+        assert "Converted picture found in cache" in task["output"], test
+        assert process_group.count_errors == 0, test
+        with open(target_file, "rb") as file:
+            assert file.read() == converted, test
+
+        new_files = [
+            os.path.join("Archive", "Malta", "IMG001_DT.jpg"),
+        ]
+        self.helper_check_paths(test, new_files)
+
+    def test_repo_generate_statistics(self, pydive_db, pydive_repository, qtbot):
+        test = "Picture generate: the resources used by conversions are stored"
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        method = pydive_db.conversionmethods_get_by_suffix("DT")
+        picture_group = pydive_repository.trips["Malta"]["IMG001"]
+
+        pydive_repository.generate_pictures(
+            test, target_location, ["DT"], None, None, picture_group
+        )
+        process_group = pydive_repository.process_groups[-1]
+        qtbot.waitUntil(lambda: process_group.count_completed == 1)
+        task = process_group.tasks[0]
+        qtbot.waitUntil(lambda: "usage" in task)
+        assert task["usage"]["wall_time"] > 0, test
+        assert task["usage"]["peak_memory"] > 0, test
+        source_size = os.path.getsize(task["picture"].path)
+        assert task["usage"]["bytes_read"] == source_size, test
+
+        test = "Picture generate: statistics are grouped by conversion method"
+        statistics = pydive_repository.statistics.by_conversion_method()
+        assert len(statistics) == 1, test
+        assert statistics[0]["conversion_method_id"] == method.id, test
+        assert statistics[0]["tasks"] == 1, test
+        assert statistics[0]["errors"] == 0, test
+        assert statistics[0]["wall_time"] > 0, test
+        assert statistics[0]["cpu_time"] > 0, test
+
+        test = "Picture generate: statistics are grouped by storage location"
+        statistics = {
+            location["location_id"]: location
+            for location in pydive_repository.statistics.by_storage_location()
+        }
+        source_location = task["picture"].location
+        assert statistics[source_location.id]["bytes_read"] == source_size, test
+        assert statistics[target_location.id]["bytes_written"] > 0, test
+
+    def test_repo_generate_batch(self, pydive_db, pydive_repository, qtbot, tmp_path):
+        test = "Picture generate: batch conversion methods run a single command"
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        conversion_method = pydive_db.conversionmethods_get_by_suffix("DT")
+        runs_file = os.path.join(tmp_path, "runs.txt")
+        conversion_method.command = (
+            f"echo run >> {runs_file}; for f in %SOURCE_FILES%; do"
+            ' n=$(basename "$f"); cp "$f" %TARGET_FOLDER%/"${n%.*}.jpg"; done'
+        )
+
+        process_group = pydive_repository.generate_pictures(
+            test, target_location, [conversion_method], None, "Malta"
+        )
+        qtbot.waitUntil(lambda: process_group.count_completed == 2)
+        assert process_group.count_errors == 0, test
+        with open(runs_file, "r") as file:
+            assert file.read() == "run\n", test
+        target_folder = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta")
+        assert not [
+            f for f in os.listdir(target_folder) if f.startswith(".pydive_")
+        ], test
+
+        new_files = [
+            os.path.join("Archive", "Malta", "IMG001_DT.jpg"),
+            os.path.join("Archive", "Malta", "IMG002_DT.jpg"),
+        ]
+        self.helper_check_paths(test, new_files)
+
+        test = "Picture generate: batch conversion errors are reported per picture"
+        for path in new_files:
+            os.remove(os.path.join(pytest.BASE_FOLDER, path))
+        conversion_method.command = (
+            'for f in %SOURCE_FILES%; do n=$(basename "$f"); case $n in'
+            ' IMG002*) ;; *) cp "$f" %TARGET_FOLDER%/"${n%.*}.jpg";; esac; done'
+        )
+        process_group = pydive_repository.generate_pictures(
+            test, target_location, [conversion_method], None, "Malta"
+        )
+        qtbot.waitUntil(lambda: process_group.count_completed == 2)
+        errors = {
+            task["picture_group"].name: task.get("error")
+            for task in process_group.tasks
+        }
+        assert process_group.count_errors == 1, test
+        assert errors == {"IMG001": None, "IMG002": "Error during conversion"}, test
+        assert "Converted picture not found" in process_group.error_details[0], test
+
+        new_files = [
+            os.path.join("Archive", "Malta", "IMG001_DT.jpg"),
+        ]
+        should_not_exist = [
+            os.path.join("Archive", "Malta", "IMG002_DT.jpg"),
+        ]
+        self.helper_check_paths(test, new_files, should_not_exist)
+
+    def test_repo_generate_worker_folder(
+        self, pydive_db, pydive_repository, qtbot, tmp_path, monkeypatch
+    ):
+        test = "Picture generate: conversions get their own worker folder"
+        monkeypatch.setattr(
+            ProcessScheduler.global_instance(), "worker_root", str(tmp_path)
+        )
+        target_location = pydive_db.storagelocation_get_by_name("Archive")
+        conversion_method = pydive_db.conversionmethods_get_by_suffix("DT")
+        runs_file = os.path.join(tmp_path, "runs.txt")
+        conversion_method.command = (
+            "cp %SOURCE_FILE% %TARGET_FILE% && cd %WORKER_FOLDER%"
+            f" && pwd >> {runs_file}"
+        )
+
+        process_group = pydive_repository.generate_pictures(
+            test, target_location, [conversion_method], None, "Malta"
+        )
+        qtbot.waitUntil(lambda: process_group.count_completed == 2)
+        assert process_group.count_errors == 0, test
+        with open(runs_file, "r") as file:
+            folders = file.read().splitlines()
+        assert len(folders) == 2, test
+        for folder in folders:
+            assert folder.startswith(str(tmp_path)), test
+
+        new_files = [
+            os.path.join("Archive", "Malta", "IMG001_DT.jpg"),
+            os.path.join("Archive", "Malta", "IMG002_DT.jpg"),
+        ]
+        self.helper_check_paths(test, new_files)
+
     def test_repo_generate_no_source_file(self, pydive_db, pydive_repository):
         test = "Picture generate: no source file available in chosen location"
         target_location = pydive_db.storagelocation_get_by_name("Archive")
@@ -11,6 +11,8 @@ sys.path.append(os.path.join(BASE_DIR, "pydive"))
 from controllers.pictures import PictureDisplay
 from controllers.widgets.iconbutton import IconButton
 import models.repository
+import controllers.mainwindow
+from models.repository_scheduler import ProcessScheduler
 
 
 class TestUiPictures:
@@ -23,9 +25,11 @@ class TestUiPictures:
     }
 
     @pytest.fixture
-    def pydive_pictures(self, pydive_mainwindow, pydive_real_pictures):
+    def pydive_pictures(self, pydive_mainwindow, pydive_real_pictures, qtbot):
         pydive_mainwindow.display_tab("Pictures")
-        pydive_mainwindow.controllers["Pictures"].on_load_pictures()
+        controller = pydive_mainwindow.controllers["Pictures"]
+        with qtbot.waitSignal(controller.loader.loadFinished, timeout=10000):
+            controller.on_load_pictures()
         self.all_files = pydive_real_pictures
 
         yield pydive_mainwindow.layout.currentWidget()
@@ -196,7 +200,7 @@ class TestUiPictures:
         widget.wheelEvent(wheelEvent)
 
     def helper_check_paths(self, test, should_exist=[], should_not_exist=[]):
-        QtCore.QThreadPool.globalInstance().waitForDone()
+        ProcessScheduler.global_instance().wait_for_done()
         # Add "should exist" to "all_files"
         self.all_files += should_exist
         self.all_files = list(set(self.all_files))
@@ -347,11 +351,37 @@ class TestUiPictures:
             path_label.text() == folders[0].path
         ), "Path field displays the expected data"
 
-    def test_pictures_display_tree_load_pictures(self, pydive_ui, qtbot):
+    def test_pictures_lazy_repository(self, pydive_db, pydive_real_pictures, qtbot):
+        self.all_files = pydive_real_pictures
+        repository = models.repository.Repository(pydive_db, lazy=True)
+        mainwindow = controllers.mainwindow.MainWindow(pydive_db, repository)
+        controller = mainwindow.controllers["Pictures"]
+
+        test = "Lazy repository: no picture is loaded at startup"
+        assert repository.picture_groups == [], test
+
+        test = "Lazy repository: pictures are loaded when the screen is displayed"
+        with qtbot.waitSignal(controller.loader.loadFinished, timeout=10000):
+            mainwindow.display_tab("Pictures")
+        assert len(repository.trips["Malta"]) == 2, test
+        assert controller.ui["picture_tree"].topLevelItemCount() == 7, test
+
+        test = "Lazy repository: pictures are loaded only once"
+        mainwindow.display_tab("Settings")
+        mainwindow.display_tab("Pictures")
+        assert not controller.loader.loading, test
+        controller.watcher.stop()
+
+    def test_pictures_display_tree_load_pictures(
+        self, pydive_ui, pydive_mainwindow, qtbot
+    ):
+        loader = pydive_mainwindow.controllers["Pictures"].loader
         # Load pictures
-        qtbot.mouseClick(pydive_ui("load_pictures"), Qt.LeftButton)
+        with qtbot.waitSignal(loader.loadFinished, timeout=10000):
+            qtbot.mouseClick(pydive_ui("load_pictures"), Qt.LeftButton)
         # Second time to test refresh of already-displayed data
-        qtbot.mouseClick(pydive_ui("load_pictures"), Qt.LeftButton)
+        with qtbot.waitSignal(loader.loadFinished, timeout=10000):
+            qtbot.mouseClick(pydive_ui("load_pictures"), Qt.LeftButton)
 
         # Check display - Tree has the right number of columns
         assert (
@@ -517,6 +547,12 @@ class TestUiPictures:
         qtbot.mouseClick(pydive_ui("tasks_bar"), Qt.LeftButton)
 
     def test_pictures_process_groups_multiple_errors(self, pydive_ui, qtbot, qapp):
+        # Archived pictures differ from the temporary ones: copies are in conflict
+        for name in ["IMG001.CR2", "IMG002.CR2"]:
+            path = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta", name)
+            with open(path, "w") as file:
+                file.write("Archived version")
+
         # Trigger a copy (to get proper display)
         action_name = "Copy all images from Temporary to Archive"
         self.trigger_action(pydive_ui, pydive_ui("tree_Malta"), action_name)
@@ -534,7 +570,7 @@ class TestUiPictures:
                 dialog_ui.layout(), QtWidgets.QVBoxLayout
             ), "ProcessGroup layout is QVBoxLayout"
             assert (
-                dialog_ui.layout().count() == 2
+                dialog_ui.layout().count() == 6
             ), "ProcessGroup has correct number of items"
             dialog_label = dialog_ui.layout().itemAt(0).widget()
             dialog_table = dialog_ui.layout().itemAt(1).widget()
@@ -582,6 +618,12 @@ class TestUiPictures:
         self.helper_check_paths(action_name, new_files)
 
     def test_pictures_process_groups_one_error(self, pydive_ui, qtbot, qapp):
+        # Archived pictures differ from the temporary ones: copies are in conflict
+        for name in ["IMG001.CR2"]:
+            path = os.path.join(pytest.BASE_FOLDER, "Archive", "Malta", name)
+            with open(path, "w") as file:
+                file.write("Archived version")
+
         # Trigger a copy (to get proper display)
         action_name = "Copy all images from Temporary to Archive"
         self.trigger_action(pydive_ui, pydive_ui("tree_Malta_001"), action_name)
@@ -751,9 +793,11 @@ class TestUiPictures:
             dialog.close()
 
         # Slow down the action, so that cancel can happen (simple "cp" goes too fast)
-        conversion_method = pydive_db.conversionmethods_get_by_suffix("DT")
-        conversion_method.command = "sleep 1 ; cp %SOURCE_FILE% %TARGET_FILE%"
-        pydive_db.session.add(conversion_method)
+        # Both methods use the same program, so the second conversion waits for the first one
+        for suffix in ["DT", "RT"]:
+            conversion_method = pydive_db.conversionmethods_get_by_suffix(suffix)
+            conversion_method.command = "sleep 1 ; cp %SOURCE_FILE% %TARGET_FILE%"
+            pydive_db.session.add(conversion_method)
         pydive_db.session.commit()
 
         # Trigger action
@@ -976,9 +1020,12 @@ class TestUiPictures:
         monkeypatch.setattr(
             QtWidgets.QInputDialog, "getText", lambda *args: ("Italy", True)
         )
-        signals = [picture_group.pictureRemoved, picture_group.pictureRemoved]
-        with qtbot.waitSignals(signals, timeout=2000):
+        # Trip folders are renamed: pictures are moved in bulk (without pictureRemoved)
+        with qtbot.waitSignal(picture_group.pictureGroupDeleted, timeout=2000):
             self.trigger_action(pydive_ui, trip_item, action_name)
+        qtbot.waitUntil(
+            lambda: len(pydive_ui("tree").findItems("Italy", Qt.MatchExactly)) > 0
+        )
 
         # Check files have been created & models updated
         new_files = [
@@ -1005,7 +1052,8 @@ class TestUiPictures:
         monkeypatch.setattr(
             QtWidgets.QInputDialog, "getText", lambda *args: ("Georgia", True)
         )
-        signals = [picture_group.pictureRemoved, picture_group.pictureRemoved]
+        # The last picture may be removed by the repository reload (without pictureRemoved)
+        signals = [picture_group.pictureRemoved, picture_group.pictureGroupDeleted]
         with qtbot.waitSignals(signals, timeout=2000):
             self.trigger_action(pydive_ui, trip_item, action_name)
 
@@ -1597,6 +1645,48 @@ class TestUiPictures:
         selection = pydive_ui("tree").selectedItems()[0]
         assert selection == pydive_ui("tree_Malta_001"), "Selection has not changed"
 
+    def test_pictures_offer_resume(
+        self, pydive_ui, pydive_mainwindow, pydive_db, qtbot, monkeypatch
+    ):
+        controller = pydive_mainwindow.controllers["Pictures"]
+        repository = controller.repository
+        task = {
+            "position": 0,
+            "type": "remove",
+            "status": "Queued",
+            "source_path": os.path.join(pytest.BASE_FOLDER, "Temporary", "IMG999.CR2"),
+        }
+
+        # User refuses: interrupted tasks are forgotten
+        pydive_db.journal_add("Interrupted", 0, [task])
+        monkeypatch.setattr(
+            QtWidgets.QMessageBox, "exec", lambda *args: QtWidgets.QMessageBox.No
+        )
+        controller.offer_resume()
+        assert pydive_db.journal_get() == [], "Refused tasks are forgotten"
+        assert repository.process_groups == [], "Refused tasks are not resumed"
+
+        # User accepts: the process group is resumed (the file is already deleted)
+        pydive_db.journal_add("Interrupted", 0, [task])
+        monkeypatch.setattr(
+            QtWidgets.QMessageBox, "exec", lambda *args: QtWidgets.QMessageBox.Yes
+        )
+        controller.offer_resume()
+        assert len(repository.process_groups) == 1, "Tasks are resumed"
+        process_group = repository.process_groups[0]
+        assert process_group.label == "Interrupted", "Tasks are resumed"
+        assert process_group.tasks[0]["skipped"], "Tasks already done are skipped"
+        assert (
+            pydive_ui("tasks_label").text() == "In-progress tasks: 0"
+        ), "Progress is displayed"
+
+        # Without interrupted tasks, nothing is displayed
+        monkeypatch.setattr(QtWidgets.QMessageBox, "exec", self.fail_on_call)
+        controller.offer_resume()
+
+    def fail_on_call(self, *args):
+        raise AssertionError("Unexpected call")
+
 
 if __name__ == "__main__":
     pytest.main(["-s", __file__])
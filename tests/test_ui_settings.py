@@ -50,9 +50,9 @@ class TestUiSettings:
             "Category": "file",
         }
         self.grid_size = {
-            "Location": (7, 5),
+            "Location": (7, 6),
             "Divelog": (2, 5),
-            "Method": (4, 7),
+            "Method": (4, 9),
             "Category": (4, 6),
         }
 
@@ -95,6 +95,12 @@ class TestUiSettings:
                 "command_change": {
                     "Method": 5,
                 },
+                "timeout_wrapper_layout": {
+                    "Method": 6,
+                },
+                "timeout_change": {
+                    "Method": 7,
+                },
                 "icon_button": {
                     "Category": 5,
                 },
@@ -173,6 +179,7 @@ class TestUiSettings:
                 "new_path",
                 "new_suffix",
                 "new_command",
+                "new_timeout",
                 "new_relative_path",
                 "new_icon",
             ]:
@@ -182,7 +189,7 @@ class TestUiSettings:
             elif element == "delete":
                 if self.tested_section == "Divelog":
                     raise ValueError(f"{self.tested_section} has no delete button")
-                columns = {"Location": 4, "Method": 6, "Category": 5}
+                columns = {"Location": 4, "Method": 8, "Category": 5}
                 column = columns[self.tested_section]
                 return get_ui("list_layout").itemAtPosition(1, column).widget()
 
@@ -195,7 +202,7 @@ class TestUiSettings:
             elif element == "new_save":
                 if self.tested_section == "Divelog":
                     raise ValueError(f"{self.tested_section} has no delete button")
-                columns = {"Location": 4, "Method": 6, "Category": 5}
+                columns = {"Location": 4, "Method": 8, "Category": 5}
                 column = columns[self.tested_section]
                 return get_ui("list_layout").itemAtPosition(row, column).widget()
 
@@ -659,10 +666,11 @@ class TestUiSettings:
             error = wrapper.layout().itemAt(1)
             assert error is None, f"{section} - {field} error is hidden"
 
-        # Check Delete display
+        # Check Delete display (picture folders end with the hard links column)
+        delete_column = 4 if section == "Location" else grid_size[1] - 1
         delete_widget = (
             pydive_ui("list_layout")
-            .itemAtPosition(grid_size[0] - 1, grid_size[1] - 1)
+            .itemAtPosition(grid_size[0] - 1, delete_column)
             .widget()
         )
         assert isinstance(delete_widget, IconButton), "Delete button is a IconButton"
@@ -765,6 +773,52 @@ class TestUiSettings:
             == "Max length for category icon is 250 characters"
         ), "Category - Icon error gets displayed"
 
+    def test_settings_location_list_edit_hardlinks(self, pydive_ui, pydive_db, qtbot):
+        self.tested_section = "Location"
+        item = self.items["Location"]
+
+        checkbox = pydive_ui("list_layout").itemAtPosition(1, 5).widget()
+        assert isinstance(
+            checkbox, QtWidgets.QCheckBox
+        ), "Location - Hard links field type"
+        assert not checkbox.isChecked(), "Location - Hard links are disabled by default"
+
+        checkbox.setChecked(True)
+        pydive_db.session.expire_all()
+        assert item.hardlinks, "Location - Hard links updated in database"
+
+    def test_settings_method_list_edit_timeout(self, pydive_ui, pydive_db, qtbot):
+        self.tested_section = "Method"
+        item = self.items["Method"]
+
+        test = "Method - Timeout is empty when the default timeout is used"
+        assert isinstance(pydive_ui("timeout_field"), QtWidgets.QLabel), test
+        assert pydive_ui("timeout_field").text() == "", test
+
+        test = "Method - Timeout is updated in database & on display"
+        qtbot.mouseClick(pydive_ui("timeout_change"), Qt.LeftButton)
+        pydive_ui("timeout_field").setText("600")
+        qtbot.mouseClick(pydive_ui("timeout_change"), Qt.LeftButton)
+        assert item.timeout == 600, test
+        assert pydive_ui("timeout_field").text() == "600", test
+
+        test = "Method - Invalid timeouts display an error"
+        for value, error in [
+            ("ten", "Conversion method timeout must be a number of seconds"),
+            ("0", "Conversion method timeout must be positive"),
+        ]:
+            qtbot.mouseClick(pydive_ui("timeout_change"), Qt.LeftButton)
+            pydive_ui("timeout_field").setText(value)
+            qtbot.mouseClick(pydive_ui("timeout_change"), Qt.LeftButton)
+            assert pydive_ui("timeout_error").text() == error, test
+            assert item.timeout == 600, test
+
+        test = "Method - An empty timeout uses the default timeout"
+        pydive_ui("timeout_field").setText("")
+        qtbot.mouseClick(pydive_ui("timeout_change"), Qt.LeftButton)
+        assert item.timeout is None, test
+        assert pydive_ui("timeout_field").text() == "", test
+
 
 if __name__ == "__main__":
     pytest.main(["-s", __file__])